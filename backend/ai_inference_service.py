@@ -1,24 +1,36 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import Depends, FastAPI, File, Form, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
-from ultralytics import YOLO
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 import cv2
 import numpy as np
 import base64
 import io
 import os
+import sys
 import logging
 import asyncio
 import threading
 import time
 import json
 import websockets
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import uvicorn
 
+from frame_cache import FrameResultCache
+from inference_scheduler import BatchScheduler, InferenceQueueFull, InferenceWorkerPool
+from mjpeg_stream import MEDIA_TYPE as MJPEG_MEDIA_TYPE, MJPEGStreamManager
+
+# Shared AI modules (preprocessing, model tooling) live in ai_module/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ai_module'))
+from annotation import AnnotationRenderer, encode_jpeg
+from letterbox import letterbox, scale_boxes
+from model_registry import model_registry
+from tiling import merge_tiles, tile_crops
+
 # Load environment variables
 load_dotenv()
 
@@ -45,14 +57,36 @@ app.add_middleware(
 # Configuration
 PORT = int(os.getenv('PORT', 5800))
 MODEL_PATH = os.getenv('MODEL_PATH', '/app/yolov8n.pt')
+# 'auto' picks the runtime from MODEL_PATH: .pt -> ultralytics, .onnx -> onnx, *_openvino_model -> openvino
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'auto')
+INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', 0)) or None  # runtime default when unset
 BACKEND_URL = os.getenv('BACKEND_URL', 'http://backend:5000')
 WEBSOCKET_URL = os.getenv('WEBSOCKET_URL', 'ws://backend:8080')
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 8))
+BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', 5))
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', 1))
+INFERENCE_QUEUE_SIZE = int(os.getenv('INFERENCE_QUEUE_SIZE', 64))
+BATCH_IMAGE_SIZE = int(os.getenv('BATCH_IMAGE_SIZE', 640))
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 16))
+DECODE_WORKERS = int(os.getenv('DECODE_WORKERS', os.cpu_count() or 4))
+# Bind immediately and load the model in the background; /ready reports when it can serve
+LAZY_MODEL_LOAD = os.getenv('LAZY_MODEL_LOAD', 'false').lower() in ('1', 'true', 'yes')
+WARMUP_RUNS = int(os.getenv('WARMUP_RUNS', 1))  # dummy inferences per model instance before serving
+# Detection cache for near-identical frames from static cameras (0 entries disables it)
+FRAME_CACHE_SIZE = int(os.getenv('FRAME_CACHE_SIZE', 0))
+FRAME_CACHE_TTL = float(os.getenv('FRAME_CACHE_TTL', 2.0))
+FRAME_CACHE_MAX_DISTANCE = int(os.getenv('FRAME_CACHE_MAX_DISTANCE', 0))  # dHash bits allowed to differ
+MJPEG_QUALITY = int(os.getenv('MJPEG_QUALITY', 80))
+MJPEG_IDLE_TIMEOUT = float(os.getenv('MJPEG_IDLE_TIMEOUT', 60))  # seconds a stream outlives its ingest and viewers
 
 # Pydantic models for request/response
 class DetectionRequest(BaseModel):
     image: str  # base64 encoded image
     drone_id: str = None
     timestamp: float = None
+    describe: bool = True  # include human-readable descriptions
+    tile_size: Optional[int] = None  # tiled inference for high-resolution frames
+    tile_overlap: float = 0.2
 
 class DetectionResponse(BaseModel):
     success: bool
@@ -62,6 +96,12 @@ class DetectionResponse(BaseModel):
 
 class BatchAnalysisRequest(BaseModel):
     images: List[str]  # List of base64 encoded images
+    describe: bool = True
+
+class ModelSwapRequest(BaseModel):
+    model_path: str
+    backend: Optional[str] = None  # defaults to INFERENCE_BACKEND
+    warmup_runs: int = 1
 
 class ThreatAlert(BaseModel):
     drone_id: str
@@ -87,25 +127,167 @@ COCO_CLASSES = [
     "book", "clock", "vase", "scissors", "teddy bear", "hair drier", "toothbrush"
 ]
 
+# Base threat level for military-relevant classes (everything else is 'low')
+MILITARY_ASSET_THREATS = {
+    'person': 'medium',
+    'car': 'low',
+    'truck': 'medium',
+    'airplane': 'high',
+    'helicopter': 'high',
+    'boat': 'medium',
+    'motorcycle': 'low'
+}
+
+# Lookup tables for vectorized post-processing, indexed by class id
+THREAT_LEVEL_NAMES = np.array(['low', 'medium', 'high'], dtype=object)
+CLASS_NAME_LOOKUP = np.array(COCO_CLASSES, dtype=object)
+CLASS_THREAT_LOOKUP = np.array(
+    [['low', 'medium', 'high'].index(MILITARY_ASSET_THREATS.get(name.lower(), 'low')) for name in COCO_CLASSES],
+    dtype=np.int8
+)
+
+def decode_image_bytes(image_bytes):
+    """Decode an encoded image (JPEG, PNG, ...) straight into a BGR numpy frame"""
+    frame = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Could not decode image data")
+    return frame
+
+class FrameDecoder:
+    """Decode binary frame payloads into BGR numpy frames without PIL
+    
+    Encoded payloads ('jpeg', 'png') go through cv2.imdecode. Raw payloads
+    ('rgb', 'bgr') need width and height: raw BGR is wrapped without copying
+    and raw RGB is converted in one pass. With reuse_buffer the RGB conversion
+    writes into a buffer kept across frames, so only use it where each frame's
+    result is awaited before the next frame is decoded (e.g. one WebSocket).
+    """
+    ENCODED_FORMATS = ('jpeg', 'jpg', 'png', 'encoded')
+    RAW_FORMATS = ('rgb', 'bgr')
+    
+    def __init__(self, frame_format='jpeg', width=None, height=None, reuse_buffer=False):
+        self.reuse_buffer = reuse_buffer
+        self.buffer = None
+        self.configure(frame_format, width, height)
+    
+    def configure(self, frame_format, width=None, height=None):
+        """Set the payload format for subsequent frames"""
+        frame_format = (frame_format or 'jpeg').lower()
+        if frame_format not in self.ENCODED_FORMATS + self.RAW_FORMATS:
+            raise ValueError(f"Unsupported frame format: {frame_format}")
+        if frame_format in self.RAW_FORMATS and (not width or not height):
+            raise ValueError(f"Raw {frame_format} frames require width and height")
+        self.frame_format = frame_format
+        self.width = int(width) if width else None
+        self.height = int(height) if height else None
+    
+    def decode(self, data):
+        """Decode one payload into a BGR frame"""
+        if self.frame_format in self.ENCODED_FORMATS:
+            return decode_image_bytes(data)
+        
+        expected_size = self.width * self.height * 3
+        if len(data) != expected_size:
+            raise ValueError(
+                f"Raw frame has {len(data)} bytes, expected {expected_size} "
+                f"for {self.width}x{self.height} {self.frame_format}"
+            )
+        # Zero-copy view over the received bytes
+        frame = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)
+        if self.frame_format == 'bgr':
+            return frame
+        
+        if self.reuse_buffer:
+            if self.buffer is None or self.buffer.shape != frame.shape:
+                self.buffer = np.empty_like(frame)
+            return cv2.cvtColor(frame, cv2.COLOR_RGB2BGR, dst=self.buffer)
+        return cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+
 class AIInferenceService:
     def __init__(self):
         self.model = None
-        self.load_model()
+        self.loop = None  # Event loop serving the API, set on startup
+        self.ready = False  # model loaded and warmed up
+        self.load_error = None
+        self.load_time = None
+        self._worker_replicas = 0
+        self._worker_model_lock = threading.Lock()
+        self.worker_pool = InferenceWorkerPool(self.create_worker_model, workers=INFERENCE_WORKERS)
+        self.scheduler = BatchScheduler(
+            self.predict_arrays,
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS,
+            executor=self.worker_pool,
+            max_queue_size=INFERENCE_QUEUE_SIZE
+        )
+        # cv2 decoding and resizing release the GIL, so a thread pool decodes in parallel
+        self.decode_pool = ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix='frame-decoder')
+        self.frame_cache = FrameResultCache(
+            max_size=FRAME_CACHE_SIZE,
+            ttl=FRAME_CACHE_TTL,
+            max_distance=FRAME_CACHE_MAX_DISTANCE
+        )
         self.backend_ws = None
+    
+    def initialize(self):
+        """Load and warm up the model, then connect to the backend (blocking)
+        
+        Runs on startup, either before the app accepts requests or, with
+        LAZY_MODEL_LOAD, in the background while /ready reports 503.
+        """
+        start_time = time.perf_counter()
+        try:
+            self.load_model()
+            self.warmup_model()
+        except Exception as e:
+            self.load_error = str(getattr(e, 'detail', e))
+            raise
+        self.load_time = time.perf_counter() - start_time
+        self.ready = True
+        logger.info(f"AI inference service ready in {self.load_time:.2f}s")
+        # Backend frames only start flowing once the model can serve them
         self.setup_backend_websocket()
     
     def load_model(self):
-        """Load YOLOv8 model"""
+        """Load YOLOv8 model with the configured inference backend"""
         try:
             logger.info(f"Loading YOLOv8 model from {MODEL_PATH}")
-            self.model = YOLO(MODEL_PATH)
-            logger.info("YOLOv8 model loaded successfully")
+            # The registry shares the weights with any other module in this process
+            model_registry.configure(threads=INFERENCE_THREADS)
+            model_registry.register('detector', MODEL_PATH, INFERENCE_BACKEND)
+            self.model = model_registry.acquire('detector')
+            logger.info(f"YOLOv8 model loaded successfully ({self.model.name} backend)")
             global model
             model = self.model
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Model loading failed: {str(e)}")
     
+    def warmup_model(self):
+        """Run warm-up inferences so the first real request doesn't pay JIT/allocation costs"""
+        if WARMUP_RUNS <= 0:
+            return
+        model_registry.warmup('detector', runs=WARMUP_RUNS)
+        if not self.model.thread_safe:
+            # Every other worker gets its own replica; load and warm those up front too
+            for replica in range(1, INFERENCE_WORKERS):
+                model_registry.warmup('detector', replica, WARMUP_RUNS)
+    
+    def create_worker_model(self):
+        """Create the model instance owned by an inference worker thread"""
+        # Thread-safe backends (ONNX Runtime) serve every worker from one session
+        if self.model is not None and self.model.thread_safe:
+            return self.model
+        
+        # Otherwise the first worker reuses the model loaded at startup (replica 0),
+        # the rest get their own registry replica
+        with self._worker_model_lock:
+            replica = self._worker_replicas
+            self._worker_replicas += 1
+        if replica:
+            logger.info(f"Loading additional YOLOv8 model instance from {MODEL_PATH}")
+        return model_registry.acquire('detector', replica=replica)
+    
     def setup_backend_websocket(self):
         """Setup WebSocket connection to backend"""
         def run_websocket():
@@ -115,8 +297,12 @@ class AIInferenceService:
                 def on_message(ws, message):
                     try:
                         data = json.loads(message)
-                        if data.get('type') == 'detection_request':
-                            asyncio.create_task(self.process_detection_request(data))
+                        if data.get('type') == 'detection_request' and self.loop is not None:
+                            # Messages arrive on the websocket-client thread, so hand
+                            # them to the API event loop where the batcher runs
+                            asyncio.run_coroutine_threadsafe(
+                                self.process_detection_request(data), self.loop
+                            )
                     except Exception as e:
                         logger.error(f"WebSocket message error: {str(e)}")
                 
@@ -161,11 +347,14 @@ class AIInferenceService:
             
             if image_data:
                 # Decode base64 image
-                image_bytes = base64.b64decode(image_data)
-                image = Image.open(io.BytesIO(image_bytes))
+                frame = decode_image_bytes(base64.b64decode(image_data))
                 
                 # Perform detection
-                results = self.detect_objects(image)
+                try:
+                    results = await self.detect_frame_async(frame, drone_id=drone_id)
+                except InferenceQueueFull:
+                    logger.warning(f"Dropping detection request from drone {drone_id}: inference queue full")
+                    return
                 
                 # Send results back via WebSocket
                 if self.backend_ws:
@@ -180,58 +369,233 @@ class AIInferenceService:
         except Exception as e:
             logger.error(f"Detection request processing error: {str(e)}")
     
-    def detect_objects(self, image):
-        """Perform object detection on image"""
+    @staticmethod
+    def to_frame(image):
+        """Convert a PIL image to a BGR numpy frame"""
+        # Normalize channels so one RGBA/grayscale upload can't break a whole batch
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        # YOLOv8 treats numpy input as BGR, like frames from cv2.imdecode
+        return np.array(image)[:, :, ::-1]
+    
+    def detect_objects(self, image, describe=True, drone_id=None):
+        """Perform object detection on a single image"""
+        frame = self.to_frame(image)
+        cache_key, detections = self.lookup_cached(frame, drone_id)
+        if detections is None:
+            detections = self.detect_batch([frame])[0]
+            self.store_cached(cache_key, detections)
+        return self.add_descriptions(detections) if describe else detections
+    
+    async def detect_objects_async(self, image, describe=True, drone_id=None, tile_size=None, tile_overlap=0.2):
+        """Perform object detection on a PIL image through the micro-batching scheduler"""
+        return await self.detect_frame_async(
+            self.to_frame(image), describe=describe, drone_id=drone_id,
+            tile_size=tile_size, tile_overlap=tile_overlap
+        )
+    
+    async def detect_frame_async(self, frame, describe=True, drone_id=None, tile_size=None, tile_overlap=0.2):
+        """Perform object detection on a BGR frame through the micro-batching scheduler
+        
+        Frames matching a cached frame from the same drone skip inference. With
+        tile_size set the frame is detected in overlapping tiles instead; the
+        tiles are queued and batched like frames and count against the queue
+        limit. Raises InferenceQueueFull when the service is saturated and
+        ValueError for invalid tile parameters.
+        """
+        tiles, crops = tile_crops(frame, tile_size, tile_overlap) if tile_size else (None, [frame])
         try:
-            # Convert PIL image to numpy array
-            img_array = np.array(image)
-            
-            # Run YOLOv8 inference
-            results = self.model(img_array)
-            
-            detections = []
-            for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        # Extract detection information
-                        x1, y1, x2, y2 = box.xyxy[0].tolist()
-                        confidence = float(box.conf[0])
-                        class_id = int(box.cls[0])
-                        class_name = COCO_CLASSES[class_id] if class_id < len(COCO_CLASSES) else str(class_id)
-                        
-                        # Military asset classification
-                        threat_level = self.classify_threat_level(class_name, confidence)
-                        
-                        detection = {
-                            'bbox': [x1, y1, x2, y2],
-                            'confidence': confidence,
-                            'class_id': class_id,
-                            'class_name': class_name,
-                            'threat_level': threat_level,
-                            'description': self.generate_description(class_name, confidence)
-                        }
-                        detections.append(detection)
-            
-            return detections
+            cache_key, detections = self.lookup_cached(frame, drone_id, (tile_size, tile_overlap) if tiles else None)
+            if detections is None:
+                if tiles:
+                    data = merge_tiles(tiles, await self.scheduler.submit_many(crops))
+                else:
+                    data = await self.scheduler.submit(frame)
+                detections = self.detections_from_array(data)
+                self.store_cached(cache_key, detections)
+            return self.add_descriptions(detections) if describe else detections
+        except InferenceQueueFull:
+            raise
+        except Exception as e:
+            logger.error(f"Object detection error: {str(e)}")
+            return []
+    
+    def lookup_cached(self, frame, drone_id=None, tiling=None):
+        """Return (cache key, cached detections or None); the key is None when caching is off"""
+        if not self.frame_cache.enabled:
+            return None, None
+        cache_key = self.frame_cache.key(frame, drone_id, tiling)
+        return cache_key, self.frame_cache.get(cache_key)
+    
+    def store_cached(self, cache_key, detections):
+        if cache_key is not None:
+            self.frame_cache.put(cache_key, detections)
+    
+    def detect_batch(self, frames):
+        """Perform object detection on a batch of frames in one forward pass
+        
+        Returns a list of detection lists, one per frame. Inside the worker
+        pool each thread uses its own model instance.
+        """
+        try:
+            return [self.detections_from_array(data) for data in self.predict_arrays(frames)]
             
         except Exception as e:
             logger.error(f"Object detection error: {str(e)}")
+            return [[] for _ in frames]
+    
+    @property
+    def current_model(self):
+        """Model owned by the calling worker thread, or the startup model outside the pool"""
+        return self.worker_pool.model or self.model
+    
+    def predict_arrays(self, frames):
+        """Run one forward pass and return an (N, 6) x1, y1, x2, y2, conf, cls array per frame"""
+        return self.current_model.predict(frames)
+    
+    def prepare_batch_image(self, image_data, tensor, slot):
+        """Decode a base64 image and letterbox it into one slot of a batch tensor
+        
+        Runs on the decode pool. Returns the metadata needed to map boxes back.
+        """
+        start_time = time.perf_counter()
+        frame = decode_image_bytes(base64.b64decode(image_data))
+        decoded_time = time.perf_counter()
+        _, ratio, pad = letterbox(frame, tensor.shape[1], out=tensor[slot])
+        return {
+            'shape': frame.shape,
+            'ratio': ratio,
+            'pad': pad,
+            'decode_time': decoded_time - start_time,
+            'preprocess_time': time.perf_counter() - decoded_time
+        }
+    
+    def detect_letterboxed(self, tensor):
+        """Run one forward pass over an (N, S, S, 3) letterboxed batch tensor (runs on the worker pool)"""
+        return self.current_model.predict_letterboxed(tensor)
+    
+    async def analyze_batch(self, images, describe=True):
+        """Analyze many base64 images with parallel decoding and chunked batched inference
+        
+        Images are decoded and letterboxed in parallel into one tensor per chunk
+        of BATCH_CHUNK_SIZE images, and each chunk runs as a single forward pass.
+        Chunks are pipelined: later chunks decode while earlier ones infer.
+        
+        Returns:
+            tuple: (per-image results in input order, stage timings in ms).
+            Stage timings are summed over images/chunks; total_ms is wall-clock.
+        """
+        loop = asyncio.get_running_loop()
+        start_time = time.perf_counter()
+        results = [None] * len(images)
+        timings = {'decode_ms': 0.0, 'preprocess_ms': 0.0, 'inference_ms': 0.0, 'postprocess_ms': 0.0}
+        # Bound the number of chunk tensors held in memory at once
+        chunk_slots = asyncio.Semaphore(self.worker_pool.workers + 1)
+        
+        def failed(index, error):
+            return {'image_index': index, 'error': str(error), 'detections': [], 'count': 0}
+        
+        async def process_chunk(first):
+            async with chunk_slots:
+                indices = list(range(first, min(first + BATCH_CHUNK_SIZE, len(images))))
+                tensor = np.empty((len(indices), BATCH_IMAGE_SIZE, BATCH_IMAGE_SIZE, 3), dtype=np.uint8)
+                prepared = await asyncio.gather(*[
+                    loop.run_in_executor(self.decode_pool, self.prepare_batch_image, images[index], tensor, slot)
+                    for slot, index in enumerate(indices)
+                ], return_exceptions=True)
+                
+                valid = []
+                for slot, (index, meta) in enumerate(zip(indices, prepared)):
+                    if isinstance(meta, Exception):
+                        results[index] = failed(index, meta)
+                        continue
+                    timings['decode_ms'] += meta['decode_time'] * 1000
+                    timings['preprocess_ms'] += meta['preprocess_time'] * 1000
+                    valid.append((slot, index, meta))
+                if not valid:
+                    return
+                if len(valid) < len(indices):
+                    tensor = tensor[[slot for slot, _, _ in valid]]
+                
+                inference_start = time.perf_counter()
+                try:
+                    arrays = await loop.run_in_executor(self.worker_pool, self.detect_letterboxed, tensor)
+                except Exception as e:
+                    logger.error(f"Batch chunk inference error: {str(e)}")
+                    for _, index, _ in valid:
+                        results[index] = failed(index, e)
+                    return
+                timings['inference_ms'] += (time.perf_counter() - inference_start) * 1000
+                
+                postprocess_start = time.perf_counter()
+                for (_, index, meta), data in zip(valid, arrays):
+                    data = scale_boxes(np.array(data, dtype=np.float32), meta['ratio'], meta['pad'], meta['shape'])
+                    detections = self.detections_from_array(data, describe=describe)
+                    results[index] = {
+                        'image_index': index,
+                        'detections': detections,
+                        'count': len(detections)
+                    }
+                timings['postprocess_ms'] += (time.perf_counter() - postprocess_start) * 1000
+        
+        await asyncio.gather(*[process_chunk(first) for first in range(0, len(images), BATCH_CHUNK_SIZE)])
+        
+        timings['total_ms'] = (time.perf_counter() - start_time) * 1000
+        return results, timings
+    
+    def detections_from_array(self, data, describe=False):
+        """Build detection dictionaries from an (N, 6) array of x1, y1, x2, y2, conf, cls rows
+        
+        Class names and threat levels come from precomputed lookup tables;
+        descriptions are only generated when requested.
+        """
+        if len(data) == 0:
             return []
+        
+        confidences = data[:, 4]
+        class_ids = data[:, 5].astype(np.int64)
+        known = (class_ids >= 0) & (class_ids < len(COCO_CLASSES))
+        lookup_ids = np.where(known, class_ids, 0)
+        
+        class_names = np.where(known, CLASS_NAME_LOOKUP[lookup_ids], class_ids.astype(str).astype(object))
+        
+        # Base threat per class, raised one level for confident detections
+        threat_codes = np.where(known, CLASS_THREAT_LOOKUP[lookup_ids], 0)
+        threat_codes = np.minimum(threat_codes + (confidences > 0.8), 2)
+        threat_levels = THREAT_LEVEL_NAMES[threat_codes]
+        
+        detections = [
+            {
+                'bbox': bbox,
+                'confidence': confidence,
+                'class_id': class_id,
+                'class_name': class_name,
+                'threat_level': threat_level
+            }
+            for bbox, confidence, class_id, class_name, threat_level in zip(
+                data[:, :4].tolist(),
+                confidences.tolist(),
+                class_ids.tolist(),
+                class_names.tolist(),
+                threat_levels.tolist()
+            )
+        ]
+        
+        if describe:
+            self.add_descriptions(detections)
+        return detections
+    
+    def add_descriptions(self, detections):
+        """Attach human-readable descriptions to detections in place"""
+        for detection in detections:
+            detection['description'] = self.generate_description(
+                detection['class_name'], detection['confidence']
+            )
+        return detections
     
     def classify_threat_level(self, class_name, confidence):
         """Classify threat level based on detected object"""
-        military_assets = {
-            'person': 'medium',
-            'car': 'low',
-            'truck': 'medium',
-            'airplane': 'high',
-            'helicopter': 'high',
-            'boat': 'medium',
-            'motorcycle': 'low'
-        }
-        
-        base_threat = military_assets.get(class_name.lower(), 'low')
+        base_threat = MILITARY_ASSET_THREATS.get(class_name.lower(), 'low')
         
         # Adjust threat level based on confidence
         if confidence > 0.8:
@@ -271,19 +635,52 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+# Fonts and label sprites are loaded once and shared by every annotated output
+annotation_renderer = AnnotationRenderer(font_size=18)
+
+# Annotated MJPEG streams by drone id
+stream_manager = MJPEGStreamManager(annotation_renderer, quality=MJPEG_QUALITY, idle_timeout=MJPEG_IDLE_TIMEOUT)
+
+def service_busy_error(e):
+    """HTTP error returned when the inference queue is saturated"""
+    return HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '1'})
+
+def require_model():
+    """Dependency rejecting requests until the model is loaded and warmed up"""
+    if not ai_service.ready:
+        detail = f"Model failed to load: {ai_service.load_error}" if ai_service.load_error else "Model is loading"
+        raise HTTPException(status_code=503, detail=detail, headers={'Retry-After': '5'})
+
 # API Endpoints
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness check: the process is up and serving HTTP, whether or not the model is loaded"""
     return {
         'status': 'healthy',
         'service': 'ai_inference_fastapi',
         'model_loaded': ai_service.model is not None,
+        'ready': ai_service.ready,
         'timestamp': time.time()
     }
 
-@app.post("/detect", response_model=DetectionResponse)
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: 200 once the model is loaded and warmed up, 503 before"""
+    if ai_service.ready:
+        status, status_code = 'ready', 200
+    elif ai_service.load_error:
+        status, status_code = 'failed', 503
+    else:
+        status, status_code = 'loading', 503
+    return JSONResponse(status_code=status_code, content={
+        'status': status,
+        'error': ai_service.load_error,
+        'load_time': ai_service.load_time,
+        'timestamp': time.time()
+    })
+
+@app.post("/detect", response_model=DetectionResponse, dependencies=[Depends(require_model)])
 async def detect_objects_endpoint(request: DetectionRequest):
     """Object detection endpoint"""
     try:
@@ -291,11 +688,13 @@ async def detect_objects_endpoint(request: DetectionRequest):
             raise HTTPException(status_code=400, detail="No image data provided")
         
         # Decode base64 image
-        image_bytes = base64.b64decode(request.image)
-        image = Image.open(io.BytesIO(image_bytes))
+        frame = decode_image_bytes(base64.b64decode(request.image))
         
         # Perform detection
-        results = ai_service.detect_objects(image)
+        results = await ai_service.detect_frame_async(
+            frame, describe=request.describe, drone_id=request.drone_id,
+            tile_size=request.tile_size, tile_overlap=request.tile_overlap
+        )
         
         return DetectionResponse(
             success=True,
@@ -304,63 +703,105 @@ async def detect_objects_endpoint(request: DetectionRequest):
             timestamp=time.time()
         )
         
+    except HTTPException:
+        raise
+    except InferenceQueueFull as e:
+        raise service_busy_error(e)
+    except ValueError as e:
+        # Undecodable frame or invalid tile parameters
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Detection endpoint error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/analyze")
-async def analyze_with_image(file: UploadFile = File(...), return_image: bool = False):
+@app.post("/detect/binary", response_model=DetectionResponse, dependencies=[Depends(require_model)])
+async def detect_binary_endpoint(
+    file: UploadFile = File(...),
+    frame_format: str = Form('jpeg'),
+    width: int = Form(None),
+    height: int = Form(None),
+    drone_id: str = Form(None),
+    describe: bool = Form(True),
+    tile_size: int = Form(None),
+    tile_overlap: float = Form(0.2)
+):
+    """Object detection on a binary frame (encoded JPEG/PNG or raw RGB/BGR) sent as multipart"""
+    try:
+        try:
+            decoder = FrameDecoder(frame_format, width, height)
+            frame = decoder.decode(await file.read())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # Perform detection
+        results = await ai_service.detect_frame_async(
+            frame, describe=describe, drone_id=drone_id,
+            tile_size=tile_size, tile_overlap=tile_overlap
+        )
+        
+        return DetectionResponse(
+            success=True,
+            detections=results,
+            count=len(results),
+            timestamp=time.time()
+        )
+        
+    except HTTPException:
+        raise
+    except InferenceQueueFull as e:
+        raise service_busy_error(e)
+    except ValueError as e:
+        # Undecodable frame or invalid tile parameters
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Binary detection endpoint error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/analyze", dependencies=[Depends(require_model)])
+async def analyze_with_image(file: UploadFile = File(...), return_image: bool = False, describe: bool = True,
+                             drone_id: Optional[str] = None, tile_size: Optional[int] = None,
+                             tile_overlap: float = 0.2):
     """Analyze uploaded image file with optional annotated image return"""
     try:
         image_bytes = await file.read()
         image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
         
         # Perform detection
-        results = ai_service.detect_objects(image)
+        results = await ai_service.detect_objects_async(
+            image, describe=describe, drone_id=drone_id,
+            tile_size=tile_size, tile_overlap=tile_overlap
+        )
         
         if return_image:
-            # Draw bounding boxes on image
-            draw = ImageDraw.Draw(image)
-            font = None
-            try:
-                font = ImageFont.truetype("arial.ttf", 18)
-            except:
-                font = None
-
-            for detection in results:
-                bbox = detection['bbox']
-                class_name = detection['class_name']
-                confidence = detection['confidence']
-                
-                # Draw bounding box
-                draw.rectangle(bbox, outline="red", width=2)
-                label = f"{class_name} {confidence:.2f}"
-                
-                if font:
-                    draw.text((bbox[0], bbox[1] - 20), label, fill="red", font=font)
-                else:
-                    draw.text((bbox[0], bbox[1] - 20), label, fill="red")
-
+            # Draw bounding boxes on a reused buffer; nothing awaits before it is
+            # encoded, so no other request can draw on it meanwhile
+            annotated = annotation_renderer.begin(ai_service.to_frame(image))
+            annotation_renderer.draw_detections(annotated, results)
+            
             # Return annotated image
-            buf = io.BytesIO()
-            image.save(buf, format="JPEG")
-            buf.seek(0)
-            return StreamingResponse(buf, media_type="image/jpeg")
+            return StreamingResponse(io.BytesIO(encode_jpeg(annotated)), media_type="image/jpeg")
 
         return {"detections": results, "count": len(results)}
         
+    except InferenceQueueFull as e:
+        raise service_busy_error(e)
+    except ValueError as e:
+        # Undecodable frame or invalid tile parameters
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Analyze endpoint error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/model/info")
+@app.get("/model/info", dependencies=[Depends(require_model)])
 async def model_info():
     """Get model information"""
     try:
         if ai_service.model:
             return {
-                'model_path': MODEL_PATH,
+                'model_path': ai_service.model.model_path,
                 'model_type': 'YOLOv8',
+                'backend': ai_service.model.info(),
+                'registry': model_registry.get_stats(),
                 'classes': COCO_CLASSES,
                 'num_classes': len(COCO_CLASSES)
             }
@@ -369,41 +810,51 @@ async def model_info():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/analyze/batch")
+@app.post("/model/swap", dependencies=[Depends(require_model)])
+async def swap_model(request: ModelSwapRequest):
+    """Hot-swap the detector to new weights without restarting the service"""
+    if not os.path.exists(request.model_path):
+        raise HTTPException(status_code=400, detail=f"Model not found: {request.model_path}")
+    try:
+        # Loading blocks, so keep it off the event loop; in-flight batches finish on the old model
+        await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: model_registry.swap(
+                'detector', request.model_path,
+                backend=request.backend or INFERENCE_BACKEND,
+                warmup_runs=request.warmup_runs
+            )
+        )
+    except Exception as e:
+        logger.error(f"Model swap error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Model swap failed: {str(e)}")
+    # Cached detections came from the old weights
+    ai_service.frame_cache.clear()
+    return {
+        'model_path': ai_service.model.model_path,
+        'backend': ai_service.model.info(),
+        'timestamp': time.time()
+    }
+
+@app.post("/analyze/batch", dependencies=[Depends(require_model)])
 async def batch_analysis(request: BatchAnalysisRequest):
     """Batch analysis endpoint for multiple images"""
     try:
         if not request.images:
             raise HTTPException(status_code=400, detail="No images provided")
         
-        results = []
-        for i, image_data in enumerate(request.images):
-            try:
-                # Decode and process each image
-                image_bytes = base64.b64decode(image_data)
-                image = Image.open(io.BytesIO(image_bytes))
-                
-                detections = ai_service.detect_objects(image)
-                results.append({
-                    'image_index': i,
-                    'detections': detections,
-                    'count': len(detections)
-                })
-            except Exception as e:
-                results.append({
-                    'image_index': i,
-                    'error': str(e),
-                    'detections': [],
-                    'count': 0
-                })
+        results, timings = await ai_service.analyze_batch(request.images, describe=request.describe)
         
         return {
             'success': True,
             'results': results,
             'total_images': len(request.images),
+            'timings': timings,
             'timestamp': time.time()
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Batch analysis error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -415,44 +866,212 @@ async def get_stats():
         'service': 'ai_inference_fastapi',
         'status': 'running',
         'model_loaded': ai_service.model is not None,
+        'ready': ai_service.ready,
+        'model_load_time': ai_service.load_time,
+        'inference_backend': ai_service.model.name if ai_service.model else None,
         'backend_ws_connected': ai_service.backend_ws is not None,
+        'batching': ai_service.scheduler.get_stats(),
+        'frame_cache': ai_service.frame_cache.get_stats(),
+        'streams': stream_manager.get_stats(),
+        'annotation': annotation_renderer.get_stats(),
         'port': PORT,
         'timestamp': time.time()
     }
 
+async def send_ws_detections(websocket: WebSocket, frame, describe=True, drone_id=None, stream=None):
+    """Run detection on a frame and reply on the WebSocket
+    
+    With a stream, the annotated frame is also pushed to its MJPEG viewers.
+    """
+    if not ai_service.ready:
+        await websocket.send_text(json.dumps({
+            'type': 'error',
+            'error': 'not_ready',
+            'detail': ai_service.load_error or 'Model is loading',
+            'timestamp': time.time()
+        }))
+        return
+    try:
+        results = await ai_service.detect_frame_async(frame, describe=describe, drone_id=drone_id)
+    except InferenceQueueFull as e:
+        await websocket.send_text(json.dumps({
+            'type': 'error',
+            'error': 'busy',
+            'detail': str(e),
+            'timestamp': time.time()
+        }))
+        return
+    
+    if stream is not None:
+        stream.publish(frame, results)
+    
+    response = {
+        'type': 'detection_results',
+        'results': results,
+        'timestamp': time.time()
+    }
+    await websocket.send_text(json.dumps(response))
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time communication"""
+    """WebSocket endpoint for real-time communication
+    
+    Accepts base64 JSON detection requests as text messages and raw frames as
+    binary messages. Binary frames are JPEG/PNG by default; send a
+    {"type": "frame_format", "format": "rgb", "width": W, "height": H}
+    message to switch the connection to raw frames ("describe": false in that
+    message drops descriptions from binary frame results, "drone_id" tags the
+    connection's frames for the frame cache).
+    """
     await manager.connect(websocket)
+    decoder = FrameDecoder(reuse_buffer=True)
+    describe_binary = True
+    binary_drone_id = None
     try:
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            data = await websocket.receive()
+            if data['type'] == 'websocket.disconnect':
+                raise WebSocketDisconnect(data.get('code', 1000))
+            
+            if data.get('bytes') is not None:
+                # Binary frame ingestion
+                try:
+                    frame = decoder.decode(data['bytes'])
+                except ValueError as e:
+                    await websocket.send_text(json.dumps({
+                        'type': 'error',
+                        'error': 'invalid_frame',
+                        'detail': str(e),
+                        'timestamp': time.time()
+                    }))
+                    continue
+                await send_ws_detections(websocket, frame, describe=describe_binary, drone_id=binary_drone_id)
+                continue
+            
+            message = json.loads(data['text'])
             
-            if message.get('type') == 'detection_request':
+            if message.get('type') == 'frame_format':
+                # Configure binary frame format for this connection
+                try:
+                    decoder.configure(message.get('format'), message.get('width'), message.get('height'))
+                    describe_binary = bool(message.get('describe', True))
+                    binary_drone_id = message.get('drone_id', binary_drone_id)
+                    reply = {'type': 'frame_format_ack', 'format': decoder.frame_format}
+                except ValueError as e:
+                    reply = {'type': 'error', 'error': 'invalid_format', 'detail': str(e)}
+                reply['timestamp'] = time.time()
+                await websocket.send_text(json.dumps(reply))
+            
+            elif message.get('type') == 'detection_request':
                 # Process detection request
                 image_data = message.get('image')
                 if image_data:
-                    image_bytes = base64.b64decode(image_data)
-                    image = Image.open(io.BytesIO(image_bytes))
-                    results = ai_service.detect_objects(image)
-                    
-                    response = {
-                        'type': 'detection_results',
-                        'results': results,
-                        'timestamp': time.time()
-                    }
-                    await websocket.send_text(json.dumps(response))
+                    frame = decode_image_bytes(base64.b64decode(image_data))
+                    await send_ws_detections(websocket, frame, describe=message.get('describe', True),
+                                             drone_id=message.get('drone_id'))
             
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
+@app.websocket("/stream/{drone_id}/ingest")
+async def stream_ingest(websocket: WebSocket, drone_id: str):
+    """Continuous frame ingest for a drone's annotated MJPEG stream
+    
+    Binary messages are frames, JPEG/PNG by default or raw after a
+    {"type": "frame_format", ...} message as on /ws. Each frame is detected,
+    annotated and pushed to the viewers of /stream/{drone_id}/mjpeg; the
+    detection results are sent back as on /ws.
+    """
+    await websocket.accept()
+    stream = stream_manager.open(drone_id)
+    try:
+        decoder = FrameDecoder(reuse_buffer=True)
+        describe = False
+        while True:
+            data = await websocket.receive()
+            if data['type'] == 'websocket.disconnect':
+                return
+        
+            if data.get('bytes') is not None:
+                try:
+                    frame = decoder.decode(data['bytes'])
+                except ValueError as e:
+                    await websocket.send_text(json.dumps({
+                        'type': 'error',
+                        'error': 'invalid_frame',
+                        'detail': str(e),
+                        'timestamp': time.time()
+                    }))
+                    continue
+                await send_ws_detections(websocket, frame, describe=describe, drone_id=drone_id, stream=stream)
+                continue
+        
+            message = json.loads(data['text'])
+            if message.get('type') == 'frame_format':
+                try:
+                    decoder.configure(message.get('format'), message.get('width'), message.get('height'))
+                    describe = bool(message.get('describe', False))
+                    reply = {'type': 'frame_format_ack', 'format': decoder.frame_format}
+                except ValueError as e:
+                    reply = {'type': 'error', 'error': 'invalid_format', 'detail': str(e)}
+                reply['timestamp'] = time.time()
+                await websocket.send_text(json.dumps(reply))
+    finally:
+        stream_manager.close(stream)
+
+@app.get("/stream/{drone_id}/mjpeg")
+async def stream_mjpeg(drone_id: str):
+    """Live annotated video of a drone as multipart/x-mixed-replace JPEG frames
+    
+    The stream exists once the drone has connected to /stream/{drone_id}/ingest
+    (404 before that). It is removed MJPEG_IDLE_TIMEOUT seconds after its
+    ingest and viewers are gone, so viewers stay connected while a drone
+    reconnects.
+    """
+    stream = stream_manager.get(drone_id)
+    if stream is None:
+        raise HTTPException(status_code=404, detail=f"No stream for drone {drone_id}")
+    return StreamingResponse(
+        stream.frames(),
+        media_type=MJPEG_MEDIA_TYPE,
+        headers={'Cache-Control': 'no-cache, no-store', 'Pragma': 'no-cache'}
+    )
+
+@app.get("/streams")
+async def list_streams():
+    """Active MJPEG streams with viewer and encoder statistics"""
+    return {
+        'streams': stream_manager.get_stats(),
+        'timestamp': time.time()
+    }
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
     logger.info(f"FastAPI AI Inference Service starting on port {PORT}")
     logger.info(f"Model path: {MODEL_PATH}")
     logger.info(f"Backend URL: {BACKEND_URL}")
+    ai_service.loop = asyncio.get_running_loop()
+    ai_service.scheduler.start()
+    if LAZY_MODEL_LOAD:
+        # Accept connections right away; liveness (/health) passes while /ready waits for the model
+        logger.info("Loading model in the background (LAZY_MODEL_LOAD)")
+        asyncio.create_task(load_model_in_background())
+    else:
+        await ai_service.loop.run_in_executor(None, ai_service.initialize)
+
+async def load_model_in_background():
+    try:
+        await ai_service.loop.run_in_executor(None, ai_service.initialize)
+    except Exception as e:
+        logger.error(f"Background model load failed: {str(e)}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    stream_manager.stop()
+    await ai_service.scheduler.stop()
+    ai_service.worker_pool.shutdown(wait=False)
+    ai_service.decode_pool.shutdown(wait=False)
 
 # Main execution
 if __name__ == "__main__":
@@ -1,10 +1,8 @@
 import numpy as np
 import cv2
-from ultralytics import YOLO
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import DBSCAN
-from filterpy.kalman import KalmanFilter, ExtendedKalmanFilter
+from filterpy.kalman import ExtendedKalmanFilter
 import joblib
 import os
 from datetime import datetime, timedelta
@@ -12,24 +10,91 @@ import json
 import threading
 import time
 import random
+from collections import Counter
+
+from annotation import AnnotationRenderer, PREDICTION_COLOR, threat_color
+from event_scheduler import EventScheduler
+from instrumentation import instrumentation
+from kalman_bank import KalmanBank
+from model_registry import model_registry
+from motion_gate import MotionGate, REGIONS, REUSE, merge_boxes
+from spatial_index import SpatialGrid, alignment_groups
+from threat_patterns import ThreatPatternStats
+from threat_table import ThreatTable
+from tiling import tiled_predict
+from track_store import TrackStore, TrackWindow, movement_statistics
+from track_lifecycle import TrackLifecycle, array_bytes
+from trajectory import predict_trajectories
+from tracking import associate, create_box_filter, predict_box, state_to_box, update_box
 
 class AdvancedMilitaryAI:
-    def __init__(self):
-        # Main object detection model
-        self.model = YOLO("yolov8m.pt")
+    def __init__(self, motion_gating=None):
+        """
+        Args:
+            motion_gating: Gate visual detection on scene changes (see detect_visual);
+                off unless enabled here or with AI_MOTION_GATING=1
+        """
+        # Main object detection model, chosen in load_models and loaded on first use
+        self.model = None
         # Specialized models for military applications
         self.thermal_model = None  # Will be initialized if thermal data is provided
         self.behavior_classifier = None
         self.threat_predictor = None
         
         # Tracking and sensor fusion
-        self.tracked_objects = {}
-        self.kalman_filters = {}  # For object trajectory prediction
+        self.kalman_filters = {}  # Box filters of tracks (tracker_mode 'kalman')
+        self.obstacle_bank = KalmanBank(dim=3)  # Batched filters for obstacle path prediction
         self.scaler = StandardScaler()
         
-        # Enhanced tracking history for behavioral analysis
-        self.tracking_history = {}  # Dictionary to store tracking history for each object
-        self.max_history_length = 30  # Maximum number of history entries per object
+        # Track association: 'iou' matches detections against each track's last
+        # box; 'kalman' matches against constant-velocity Kalman predictions and
+        # gives unmatched tracks a second pass over low-confidence detections
+        self.tracker_mode = 'iou'
+        self.track_high_threshold = 0.4  # detections at or above this can start tracks
+        self.track_low_threshold = 0.1  # below this, detections are ignored in 'kalman' mode
+        
+        # Enhanced tracking history for behavioral analysis, in per-track ring buffers
+        self.max_history_length = 100  # Maximum number of history entries per object
+        # The tracker updates per-track state while the background threat assessment
+        # reads it; both hold track_lock (shared by the store and the lifecycle)
+        self.track_lock = threading.RLock()
+        self.track_store = TrackStore(capacity=self.max_history_length, lock=self.track_lock)
+        self.prediction_model = 'cv'  # future positions: 'cv' constant velocity, 'ca' constant acceleration
+        
+        # Grid index over the latest track positions for formation detection;
+        # objects closer than formation_radius (pixels) are neighbours
+        self.formation_radius = 100.0
+        self.spatial_index = SpatialGrid(cell_size=self.formation_radius)
+        
+        # Per-kind lifecycles evict an id's state from every structure of its id space
+        # together, by loss, TTL and a cap on ids and estimated memory. Track ids (the
+        # tracker's) key track_store, kalman_filters, spatial_index and active_tracks;
+        # obstacle ids (callers of predict_obstacle_paths) key obstacle_bank. The id
+        # spaces are separate, so an obstacle and a track with the same id never keep
+        # each other alive or evict each other, and obstacles don't count toward the
+        # track cap
+        self.track_lifecycle = TrackLifecycle(ttl=300.0, max_tracks=2000, max_memory_bytes=64 * 1024 * 1024,
+                                              lock=self.track_lock)
+        self.track_lifecycle.register(
+            'track_store', self.track_store.remove,
+            lambda key: self.track_store.row_bytes() if key in self.track_store else 0
+        )
+        self.track_lifecycle.register(
+            'kalman_filters', lambda key: self.kalman_filters.pop(key, None),
+            lambda key: array_bytes(self.kalman_filters[key]) if key in self.kalman_filters else 0
+        )
+        self.track_lifecycle.register('spatial_index', self.spatial_index.remove)
+        self.track_lifecycle.register('active_tracks', self.drop_active_track)
+        
+        # obstacle_lock is held by the obstacle lifecycle while evicting and by
+        # predict_obstacle_paths from eviction through the rollout
+        self.obstacle_lock = threading.RLock()
+        self.obstacle_lifecycle = TrackLifecycle(ttl=300.0, max_tracks=1000, max_memory_bytes=16 * 1024 * 1024,
+                                                 lock=self.obstacle_lock)
+        self.obstacle_lifecycle.register(
+            'obstacle_bank', self.obstacle_bank.remove,
+            lambda key: self.obstacle_bank.entry_bytes() if key in self.obstacle_bank else 0
+        )
         
         # Multi-sensor fusion components
         self.sensor_data = {
@@ -57,12 +122,43 @@ class AdvancedMilitaryAI:
             'thermal': 40.0  # degrees C
         }
         
+        # Memoized threat scoring with contextual rules compiled per context
+        self.threat_table = ThreatTable()
+        
         # Visualization buffer for tracked objects
         self.latest_visualization = None
+        self.renderer = AnnotationRenderer()
+        
+        # Motion gating: per-stream scene change detection decides whether
+        # a frame needs the detector, only its changed regions, or nothing.
+        # Opt-in, since a gated frame reuses or partly reuses earlier detections
+        if motion_gating is None:
+            motion_gating = os.getenv('AI_MOTION_GATING', '0').lower() in ('1', 'true', 'yes')
+        self.motion_gating = motion_gating
+        self.motion_gates = {}  # stream_id -> MotionGate
+        self.stream_detections = {}  # stream_id -> last visual detections (N, 6)
+        
+        # Tiled inference for high-resolution frames (None runs whole frames)
+        self.tile_size = None
+        self.tile_overlap = 0.2
         
         # Load pre-trained models
         self.load_models()
         
+        # Threat assessment state, filled by the background thread
+        self.threat_history = []
+        self.position_history = []
+        # Per-type threat pattern statistics, updated as assessments are appended;
+        # their window is much longer than threat_history's last 50 entries
+        self.threat_pattern_stats = ThreatPatternStats(window=1000)
+        self.last_full_analysis = time.time()
+        self.analysis_interval = 5  # Seconds between full threat analyses
+        self.min_analysis_spacing = 0.5  # Seconds between analyses triggered by new tracks
+        
+        # Background work is event driven: sensor updates and new tracks notify
+        # the scheduler, periodic tasks run on its timer wheel
+        self.threat_scheduler = EventScheduler(coalesce_window=0.02, on_error=self.report_assessment_error)
+        
         # Start background threads for continuous processing
         self.running = True
         threading.Thread(target=self.continuous_threat_assessment, daemon=True).start()
@@ -78,17 +174,22 @@ class AdvancedMilitaryAI:
                 
             # Load thermal detection model if available
             if os.path.exists('models/thermal_yolov8.pt'):
-                self.thermal_model = YOLO('models/thermal_yolov8.pt')
+                self.thermal_model = model_registry.acquire('models/thermal_yolov8.pt', lazy=True)
             
-            # Load specialized military object detection model if available
-            if os.path.exists('models/military_yolov8.pt'):
-                self.model = YOLO('models/military_yolov8.pt')
-                
         except Exception as e:
             print(f"Error loading models: {e}")
             print("Using default classifiers.")
             self.behavior_classifier = RandomForestClassifier(n_estimators=100)
             self.threat_predictor = RandomForestClassifier(n_estimators=100)
+        
+        # Prefer the specialized military detector over the default weights. The
+        # registry shares them with other modules in the process and only loads
+        # the chosen one, on first use.
+        if self.model is None:
+            if os.path.exists('models/military_yolov8.pt'):
+                self.model = model_registry.acquire('models/military_yolov8.pt', lazy=True)
+            else:
+                self.model = model_registry.acquire('yolov8m.pt', lazy=True)
     
     def analyze_behavior(self, detections, frame_history):
         """Analyze behavioral patterns of detected objects"""
@@ -109,7 +210,9 @@ class AdvancedMilitaryAI:
         
         Args:
             current_threats: List of current threat objects
-            historical_data: Historical threat data for pattern analysis
+            historical_data: Historical threat data for pattern analysis, a list
+                of assessments or the running ThreatPatternStats (read in O(1)
+                per threat type instead of re-scanning the history)
             
         Returns:
             List of threat predictions with escalation probabilities and recommendations
@@ -176,73 +279,22 @@ class AdvancedMilitaryAI:
         """Analyze historical threat data to identify patterns
         
         Args:
-            historical_data: List of historical threat assessments
+            historical_data: List of historical threat assessments, or the
+                incrementally maintained ThreatPatternStats
             
         Returns:
             Dictionary of threat patterns by type
         """
+        if isinstance(historical_data, ThreatPatternStats):
+            return historical_data.patterns()
         if not historical_data:
             return {}
         
-        # Extract all threats from historical data
-        all_threats = []
-        for history in historical_data:
-            if 'threats' in history:
-                all_threats.extend([(threat, history.get('timestamp', 0)) 
-                                   for threat in history['threats']])
-        
-        # Group threats by type
-        threats_by_type = {}
-        for threat, timestamp in all_threats:
-            threat_type = threat.get('type', 'unknown')
-            if threat_type not in threats_by_type:
-                threats_by_type[threat_type] = []
-            threats_by_type[threat_type].append((threat, timestamp))
-        
-        # Analyze patterns for each threat type
-        patterns = {}
-        for threat_type, threats in threats_by_type.items():
-            if len(threats) < 2:
-                continue
-                
-            # Sort by timestamp if available
-            threats.sort(key=lambda x: x[1] if isinstance(x[1], (int, float)) else 0)
-            
-            # Calculate escalation rate (how often threats of this type escalate)
-            escalation_count = 0
-            for i in range(1, len(threats)):
-                prev_level = threats[i-1][0].get('threat_level', 'LOW')
-                curr_level = threats[i][0].get('threat_level', 'LOW')
-                
-                # Check if threat level increased
-                threat_levels = ['LOW', 'MEDIUM', 'HIGH']
-                if threat_levels.index(curr_level) > threat_levels.index(prev_level):
-                    escalation_count += 1
-            
-            escalation_rate = escalation_count / (len(threats) - 1) if len(threats) > 1 else 0
-            
-            # Calculate persistence (how long threats of this type typically last)
-            # For simulation, we'll use the number of consecutive detections as a proxy
-            persistence = min(1.0, len(threats) / 10)  # Normalize to 0-1 range
-            
-            # Calculate average threat level
-            threat_level_values = {'LOW': 0, 'MEDIUM': 1, 'HIGH': 2}
-            avg_threat_level = sum(threat_level_values.get(t[0].get('threat_level', 'LOW'), 0) 
-                                   for t in threats) / len(threats)
-            
-            # Store pattern data
-            patterns[threat_type] = {
-                'count': len(threats),
-                'escalation_rate': escalation_rate,
-                'persistence': persistence,
-                'avg_threat_level': avg_threat_level,
-                'last_seen': threats[-1][1]
-            }
-        
-        return patterns
+        # One pass over the history; threats of a type keep their history order
+        return ThreatPatternStats.from_history(historical_data).patterns()
     
     def multi_object_tracking(self, detections, frame_id):
-        """Track multiple objects across frames using IoU-based matching and Kalman filtering
+        """Track multiple objects across frames using optimal IoU-based matching and Kalman filtering
         
         Args:
             detections: List of current frame detections
@@ -267,36 +319,23 @@ class AdvancedMilitaryAI:
             det_id = detection['id']
             current_detections[det_id] = detection
         
-        # Match existing tracks to new detections using IoU
-        matched_tracks = {}
-        unmatched_detections = list(current_detections.keys())
+        detection_ids = list(current_detections.keys())
+        if self.tracker_mode == 'kalman':
+            matched_tracks, unmatched_detections = self.associate_kalman(current_detections, detection_ids)
+        else:
+            # Match existing tracks to new detections with an optimal assignment on
+            # the track x detection IoU matrix (pairs with IoU <= 0.3 are gated out)
+            track_ids = [track_id for track_id, track_info in self.active_tracks.items() if 'bbox' in track_info]
+            matches, _, unmatched = associate(
+                [self.active_tracks[track_id]['bbox'] for track_id in track_ids],
+                [current_detections[det_id]['bounding_box'] for det_id in detection_ids],
+                min_iou=0.3
+            )
+            matched_tracks = {track_ids[t]: detection_ids[d] for t, d in matches.tolist()}
+            unmatched_detections = [detection_ids[d] for d in unmatched.tolist()]
         
-        # For each existing track, find the best matching detection
-        for track_id, track_info in self.active_tracks.items():
-            best_match = None
-            best_iou = 0.3  # Minimum IoU threshold for matching
-            
-            # Get the last known bounding box for this track
-            if 'bbox' in track_info:
-                track_bbox = track_info['bbox']
-                
-                # Compare with each detection
-                for det_id in unmatched_detections:
-                    det_bbox = current_detections[det_id]['bounding_box']
-                    
-                    # Calculate IoU between track and detection
-                    iou = self.calculate_iou(track_bbox, det_bbox)
-                    
-                    # If this is the best match so far, update
-                    if iou > best_iou:
-                        best_iou = iou
-                        best_match = det_id
-            
-            # If we found a match, update the track
-            if best_match:
-                matched_tracks[track_id] = best_match
-                unmatched_detections.remove(best_match)
-                
+        for track_id in self.active_tracks:
+            if track_id in matched_tracks:
                 # Reset missed frames counter
                 self.track_missed_frames[track_id] = 0
             else:
@@ -323,8 +362,12 @@ class AdvancedMilitaryAI:
                 if key not in ['id', 'bounding_box', 'type', 'confidence', 'threat_level', 'source']:
                     self.active_tracks[track_id][key] = value
             
+            if self.tracker_mode == 'kalman':
+                self.update_track_filter(track_id, detection['bounding_box'])
+            
             # Add to current tracks output
             current_tracks[track_id] = self.active_tracks[track_id]
+            self.track_lifecycle.touch(track_id)
             
             # Update track age
             self.track_age[track_id] = self.track_age.get(track_id, 0) + 1
@@ -353,12 +396,20 @@ class AdvancedMilitaryAI:
                 if key not in ['id', 'bounding_box', 'type', 'confidence', 'threat_level', 'source']:
                     self.active_tracks[track_id][key] = value
             
+            if self.tracker_mode == 'kalman':
+                self.update_track_filter(track_id, detection['bounding_box'])
+            
             # Initialize track age and missed frames
             self.track_age[track_id] = 1
             self.track_missed_frames[track_id] = 0
             
             # Add to current tracks output
             current_tracks[track_id] = self.active_tracks[track_id]
+            self.track_lifecycle.touch(track_id)
+        
+        # New tracks may be new threats: wake the threat assessment
+        if unmatched_detections:
+            self.threat_scheduler.notify('tracks')
         
         # Remove tracks that have been missing for too long
         max_missed_frames = 30  # Maximum number of frames a track can be missing
@@ -368,16 +419,94 @@ class AdvancedMilitaryAI:
             if missed_frames > max_missed_frames:
                 tracks_to_remove.append(track_id)
         
+        # Lost tracks leave every per-track structure at once (history and filter included)
         for track_id in tracks_to_remove:
-            if track_id in self.active_tracks:
-                del self.active_tracks[track_id]
-            if track_id in self.track_age:
-                del self.track_age[track_id]
-            if track_id in self.track_missed_frames:
-                del self.track_missed_frames[track_id]
+            self.track_lifecycle.forget(track_id)
+        self.track_lifecycle.sweep()
         
         return current_tracks
     
+    def drop_active_track(self, track_id):
+        """Remove a track from the tracker's own dicts"""
+        for name in ('active_tracks', 'track_age', 'track_missed_frames'):
+            getattr(self, name, {}).pop(track_id, None)
+    
+    def get_track_lifecycle_stats(self):
+        """Tracked ids, evictions by reason and estimated per-track memory (obstacles separately)"""
+        stats = self.track_lifecycle.get_stats()
+        stats['track_store'] = self.track_store.get_stats()
+        stats['kalman_filters'] = len(self.kalman_filters)
+        stats['obstacles'] = self.obstacle_lifecycle.get_stats()
+        stats['obstacle_bank'] = self.obstacle_bank.get_stats()
+        return stats
+    
+    def get_threat_scheduler_stats(self):
+        """Events, coalescing, handler runs and event latency of the threat assessment thread"""
+        stats = self.threat_scheduler.get_stats()
+        stats['last_full_analysis'] = self.last_full_analysis
+        stats['threat_patterns'] = self.threat_pattern_stats.get_stats()
+        return stats
+    
+    def associate_kalman(self, current_detections, detection_ids):
+        """Match tracks to detections on Kalman-predicted boxes (SORT/ByteTrack-style)
+        
+        Every track's filter is advanced one frame first. High-confidence
+        detections are matched to the predicted boxes, then tracks still
+        unmatched get a second pass against low-confidence detections (partly
+        occluded or blurred objects), which keep tracks alive but never start
+        new ones.
+        
+        Returns:
+            tuple: (dict of track_id -> det_id, unmatched high-confidence det_ids)
+        """
+        track_ids = []
+        predicted_boxes = []
+        for track_id, track_info in self.active_tracks.items():
+            if 'bbox' not in track_info:
+                continue
+            kf = self.kalman_filters.get(track_id)
+            if kf is None:
+                kf = self.kalman_filters[track_id] = create_box_filter(track_info['bbox'])
+            predicted_box = predict_box(kf)
+            track_info['predicted_bbox'] = predicted_box
+            track_ids.append(track_id)
+            predicted_boxes.append(predicted_box)
+        
+        high_ids = [det_id for det_id in detection_ids
+                    if current_detections[det_id]['confidence'] >= self.track_high_threshold]
+        low_ids = [det_id for det_id in detection_ids
+                   if self.track_low_threshold <= current_detections[det_id]['confidence'] < self.track_high_threshold]
+        
+        matches, unmatched_tracks, unmatched_high = associate(
+            predicted_boxes,
+            [current_detections[det_id]['bounding_box'] for det_id in high_ids],
+            min_iou=0.3
+        )
+        matched_tracks = {track_ids[t]: high_ids[d] for t, d in matches.tolist()}
+        
+        # Second pass: a stricter gate, since low-confidence boxes are less reliable
+        if low_ids and len(unmatched_tracks):
+            low_matches, _, _ = associate(
+                [predicted_boxes[t] for t in unmatched_tracks],
+                [current_detections[det_id]['bounding_box'] for det_id in low_ids],
+                min_iou=0.5
+            )
+            for t, d in low_matches.tolist():
+                matched_tracks[track_ids[unmatched_tracks[t]]] = low_ids[d]
+        
+        return matched_tracks, [high_ids[d] for d in unmatched_high.tolist()]
+    
+    def update_track_filter(self, track_id, bbox):
+        """Correct (or start) a track's Kalman filter with its matched box"""
+        kf = self.kalman_filters.get(track_id)
+        if kf is None:
+            kf = self.kalman_filters[track_id] = create_box_filter(bbox)
+        else:
+            update_box(kf, bbox)
+        track = self.active_tracks[track_id]
+        track['filtered_bbox'] = state_to_box(kf.x)
+        track['box_velocity'] = [float(kf.x[4, 0]), float(kf.x[5, 0])]  # pixels per frame
+    
     def calculate_iou(self, bbox1, bbox2):
         """Calculate Intersection over Union (IoU) between two bounding boxes
         
@@ -441,11 +570,21 @@ class AdvancedMilitaryAI:
     
     def predict_escalation(self, threat, historical_data):
         """Predict threat escalation probability"""
+        # Behavior and weapon systems on the same 0-100 scale as the numeric factors
+        behavior_scores = {
+            'stationary': 0,
+            'moving': 10,
+            'fleeing': 20,
+            'circling': 40,
+            'approaching': 60,
+            'erratic': 70,
+            'aggressive': 100
+        }
         escalation_factors = {
-            'speed': threat.get('speed', 0),
-            'proximity': threat.get('proximity', 100),
-            'behavior': threat.get('behavior', 'normal'),
-            'weapon_systems': threat.get('weapon_systems', False)
+            'speed': float(threat.get('speed') or 0),
+            'proximity': float(threat.get('proximity', 100)),
+            'behavior': behavior_scores.get(threat.get('behavior'), 0),  # 'normal' or unknown
+            'weapon_systems': 100 if threat.get('weapon_systems', False) else 0
         }
         # Simplified escalation prediction
         escalation_score = sum(escalation_factors.values()) / len(escalation_factors)
@@ -472,207 +611,200 @@ class AdvancedMilitaryAI:
     
     # Note: The assign_track_id method is no longer needed as track ID assignment is handled in multi_object_tracking
     
-    # Note: This legacy update_track_history method is kept for backward compatibility
-    # but the main tracking history is now managed by the update_track_history method defined later
-    def update_track_history(self, track_id, detection, frame_id):
-        """Legacy method for updating tracking history for an object
-        
-        This method is maintained for backward compatibility with existing code.
-        New code should use the enhanced tracking history management.
-        
-        Args:
-            track_id: Unique identifier for the tracked object
-            detection: Detection data for the object
-            frame_id: Current frame identifier or timestamp
-            
-        Returns:
-            List of historical tracking data for the object
-        """
-        if track_id not in self.tracked_objects:
-            self.tracked_objects[track_id] = []
-        
-        # Create history entry with more comprehensive data
-        history_entry = {
-            'frame_id': frame_id,
-            'bbox': detection['bounding_box'],
-            'timestamp': datetime.now().isoformat(),
-            'type': detection.get('type', 'unknown'),
-            'confidence': detection.get('confidence', 0.0),
-            'threat_level': detection.get('threat_level', 'LOW'),
-            'source': detection.get('source', 'visual')
-        }
-        
-        self.tracked_objects[track_id].append(history_entry)
-        
-        # Keep only last 30 frames
-        if len(self.tracked_objects[track_id]) > 30:
-            self.tracked_objects[track_id] = self.tracked_objects[track_id][-30:]
-        
-        return self.tracked_objects[track_id]
-
-def continuous_threat_assessment(self):
+    def continuous_threat_assessment(self):
         """Background thread for continuous threat assessment with advanced analytics
         
-        This method runs in a separate thread and continuously:
-        1. Processes sensor data using sensor fusion
-        2. Detects and analyzes potential threats
+        This method runs in a separate thread and, driven by events rather
+        than a polling sleep:
+        1. Processes sensor data using sensor fusion whenever a sensor updates
+        2. Detects and analyzes potential threats (periodically, and soon after
+           new tracks appear)
         3. Predicts threat evolution over time
         4. Monitors for environmental events
         5. Maintains a threat history for pattern analysis
         6. Visualizes tracked objects with threat levels
+        
+        Work runs on self.threat_scheduler: update_sensor_data and the tracker
+        notify it, bursts of notifications are coalesced into one run, and the
+        periodic tasks sit on its timer wheel. The thread sleeps while nothing
+        is due.
         """
-        # Initialize threat history storage and visualization buffer
-        self.threat_history = []
-        self.last_full_analysis = time.time()
-        self.analysis_interval = 5  # Seconds between full threat analyses
-        self.latest_visualization = None  # Buffer for visualization frame
+        scheduler = self.threat_scheduler
+        scheduler.on('sensor', self.process_sensor_update)
+        scheduler.on('tracks', self.on_new_tracks)
         
-        while self.running:
-            try:
-                # Simulate continuous processing with adaptive sleep
-                # Sleep less when threats are detected
-                threat_level = self.get_current_threat_level()
-                adaptive_sleep = max(0.2, 1.0 - (threat_level * 0.8))
-                time.sleep(adaptive_sleep)
-                
-                current_time = time.time()
-                
-                # Process any pending sensor data with sensor fusion
-                if any(self.sensor_data.values()):
-                    fused_data = self.fuse_sensor_data()
-                    # Store fused position data for trajectory analysis
-                    if hasattr(self, 'position_history'):
-                        self.position_history.append({
-                            'timestamp': current_time,
-                            'position': fused_data['position'],
-                            'uncertainty': fused_data['uncertainty'][:3]
-                        })
-                    else:
-                        self.position_history = [{
-                            'timestamp': current_time,
-                            'position': fused_data['position'],
-                            'uncertainty': fused_data['uncertainty'][:3]
-                        }]
-                    
-                    # Limit history size
-                    if len(self.position_history) > 100:
-                        self.position_history = self.position_history[-100:]
+        # Full threat analysis at regular intervals
+        scheduler.every('threat_analysis', lambda: self.analysis_interval, self.run_threat_analysis)
+        
+        # Event checks and swarm updates run more often when threats are detected
+        adaptive_interval = lambda: max(0.2, 1.0 - (self.get_current_threat_level() * 0.8))
+        scheduler.every('event_checks', adaptive_interval, self.run_event_checks)
+        scheduler.every('swarm_sync', adaptive_interval, self.sync_swarm_threats)
+        
+        scheduler.run()
+    
+    def stop_threat_assessment(self):
+        """Stop the background threat assessment thread"""
+        self.running = False
+        self.threat_scheduler.stop()
+    
+    def report_assessment_error(self, task, error):
+        print(f"Error in continuous threat assessment ({task}): {error}")
+    
+    def process_sensor_update(self):
+        """Fuse the latest sensor data and refresh the tracking visualization"""
+        if not any(value is not None for value in self.sensor_data.values()):
+            return
+        current_time = time.time()
+        fused_data = self.fuse_sensor_data()
+        # Store fused position data for trajectory analysis
+        self.position_history.append({
+            'timestamp': current_time,
+            'position': fused_data['position'],
+            'uncertainty': fused_data['uncertainty'][:3]
+        })
+        
+        # Limit history size
+        if len(self.position_history) > 100:
+            self.position_history = self.position_history[-100:]
+        
+        # Process video frame with tracking visualization if available
+        if 'frame' in fused_data and hasattr(self, 'active_tracks') and self.active_tracks:
+            # Convert active_tracks to format for visualization (under the track lock,
+            # so the tracker state and track history are read as one snapshot)
+            with self.track_lock:
+                tracked_objects = {}
+                stored_ids = [track_id for track_id in self.active_tracks if track_id in self.track_store]
+                behaviors = self.classify_behaviors(stored_ids)
+                predictions = self.predict_track_paths(stored_ids)
+                for track_id, track_data in self.active_tracks.items():
+                    # Skip tracks without bounding boxes
+                    if 'bbox' not in track_data:
+                        continue
                     
-                    # Process video frame with tracking visualization if available
-                    if 'frame' in fused_data and hasattr(self, 'active_tracks') and self.active_tracks:
-                        # Convert active_tracks to format for visualization
-                        tracked_objects = {}
-                        for track_id, track_data in self.active_tracks.items():
-                            # Skip tracks without bounding boxes
-                            if 'bbox' not in track_data:
-                                continue
-                                
-                            # Prepare object data for visualization
-                            obj = {
-                                'bbox': track_data.get('bbox'),
-                                'type': track_data.get('type', 'unknown'),
-                                'threat_level': track_data.get('threat_level', 'LOW'),
-                                'confidence': track_data.get('confidence', 0)
-                            }
-                            
-                            # Add behavior if available
-                            if hasattr(self, 'tracking_history') and track_id in self.tracking_history:
-                                track_history = self.tracking_history[track_id]
-                                if len(track_history) >= 3:
-                                    # Classify behavior based on tracking history
-                                    behavior = self.classify_threat_behavior(track_history)
-                                    obj['behavior'] = behavior
-                                    
-                                    # Add predicted positions
-                                    predicted_positions = self.predict_future_positions(track_history)
-                                    if predicted_positions:
-                                        obj['predicted_positions'] = predicted_positions
-                            
-                            tracked_objects[track_id] = obj
-                        
-                        # Visualize tracked objects on frame
-                        if tracked_objects and 'frame' in fused_data:
-                            vis_frame = self.visualize_tracked_objects(fused_data['frame'], tracked_objects)
-                            
-                            # Store visualized frame for external access
-                            self.latest_visualization = vis_frame
+                    # Prepare object data for visualization
+                    obj = {
+                        'bbox': track_data.get('bbox'),
+                        'type': track_data.get('type', 'unknown'),
+                        'threat_level': track_data.get('threat_level', 'LOW'),
+                        'confidence': track_data.get('confidence', 0)
+                    }
                 
-                # Perform full threat analysis at regular intervals
-                if current_time - self.last_full_analysis > self.analysis_interval:
-                    self.last_full_analysis = current_time
+                    # Add behavior if available
+                    if self.track_store.length(track_id) >= 3:
+                        obj['behavior'] = behaviors[track_id]
                     
-                    # Analyze current threats based on recent detections
-                    current_threats = self.analyze_current_threats()
-                    
-                    # Predict how threats might evolve
-                    if current_threats:
-                        threat_predictions = self.predict_threat_evolution(
-                            current_threats, 
-                            self.threat_history
-                        )
-                        
-                        # Store predictions for later validation
-                        self.threat_history.append({
-                            'timestamp': current_time,
-                            'threats': current_threats,
-                            'predictions': threat_predictions
-                        })
-                        
-                        # Limit history size
-                        if len(self.threat_history) > 50:
-                            self.threat_history = self.threat_history[-50:]
-                        
-                        # Generate alerts for high-priority threats
-                        self.generate_threat_alerts(threat_predictions)
+                        # Add predicted positions and their uncertainty
+                        if track_id in predictions:
+                            obj['predicted_positions'] = predictions[track_id]['positions']
+                            obj['prediction_uncertainty'] = predictions[track_id]['uncertainty']
                 
-                # Check for environmental events if event detection is active
-                if self.event_detection_active:
-                    event = self.check_for_events()
-                    if event:
-                        # Log the event and adjust threat assessment
-                        self.process_detected_event(event)
-                        
-                # Update swarm with latest threat information if in swarm mode
-                if self.swarm_state['drones'] and len(self.swarm_state['drones']) > 1:
-                    self.share_threat_data_with_swarm()
-                    
-            except Exception as e:
-                print(f"Error in continuous threat assessment: {e}")
-                # Brief pause after error before retrying
-                time.sleep(0.5)
+                    tracked_objects[track_id] = obj
+            
+            # Visualize tracked objects on frame
+            if tracked_objects and 'frame' in fused_data:
+                vis_frame = self.visualize_tracked_objects(fused_data['frame'], tracked_objects)
+                
+                # Store visualized frame for external access
+                self.latest_visualization = vis_frame
+    
+    def on_new_tracks(self):
+        """Bring the next full threat analysis forward when new tracks appear
+        
+        It runs at most once per min_analysis_spacing, so a burst of new
+        tracks costs one analysis instead of one per frame.
+        """
+        since_last = time.time() - self.last_full_analysis
+        self.threat_scheduler.defer('threat_analysis', max(0.0, self.min_analysis_spacing - since_last))
     
-    def classify_threat_realtime(self, frame, thermal_frame=None, radar_data=None, lidar_data=None, acoustic_data=None):
+    def run_threat_analysis(self):
+        """Analyze current threats, predict their evolution and raise alerts"""
+        current_time = time.time()
+        self.last_full_analysis = current_time
+        
+        # Analyze current threats based on recent detections
+        current_threats = self.analyze_current_threats()
+        
+        # Predict how threats might evolve
+        if current_threats:
+            threat_predictions = self.predict_threat_evolution(
+                current_threats, 
+                self.threat_pattern_stats
+            )
+            
+            # Store predictions for later validation
+            self.threat_history.append({
+                'timestamp': current_time,
+                'threats': current_threats,
+                'predictions': threat_predictions
+            })
+            self.threat_pattern_stats.add(current_threats, current_time)
+            
+            # Limit history size
+            if len(self.threat_history) > 50:
+                self.threat_history = self.threat_history[-50:]
+            
+            # Generate alerts for high-priority threats
+            self.generate_threat_alerts(threat_predictions)
+    
+    def run_event_checks(self):
+        """Check for environmental events if event detection is active"""
+        if self.event_detection_active:
+            event = self.check_for_events()
+            if event:
+                # Log the event and adjust threat assessment
+                self.process_detected_event(event)
+    
+    def sync_swarm_threats(self):
+        """Update swarm with latest threat information if in swarm mode"""
+        if self.swarm_state['drones'] and len(self.swarm_state['drones']) > 1:
+            self.share_threat_data_with_swarm()
+    
+    def classify_threat_realtime(self, frame, thermal_frame=None, radar_data=None, lidar_data=None, acoustic_data=None,
+                                 stream_id='default', tile_size=None, tile_overlap=None):
         """Real-time threat classification using multi-sensor fusion and behavioral analysis
         
+        The latency of each stage is recorded in instrumentation (instrumentation.py)
+        while it is enabled.
+        
         Args:
             frame: RGB camera frame
             thermal_frame: Optional thermal imaging frame
             radar_data: Optional radar detection data
             lidar_data: Optional LiDAR point cloud data
             acoustic_data: Optional acoustic sensor data
+            stream_id: Camera stream the frame belongs to (for motion gating)
+            tile_size: Detect in overlapping tiles of this size (defaults to self.tile_size)
+            tile_overlap: Fraction of overlap between tiles (defaults to self.tile_overlap)
             
         Returns:
             List of detections with threat classifications and behavioral analysis
         """
-        # Process visual frame with YOLOv8
-        visual_results = self.model(frame, verbose=False)
+        started = instrumentation.clock()
+        
+        # Process visual frame with YOLOv8 (skipped or restricted to changed regions by motion gating)
+        with instrumentation.span('visual_detection'):
+            visual_results = self.detect_visual(frame, stream_id, tile_size, tile_overlap)
         
         # Process thermal frame if available
         thermal_results = None
         if thermal_frame is not None and self.thermal_model is not None:
-            thermal_results = self.thermal_model(thermal_frame, verbose=False)
+            with instrumentation.span('thermal_detection'):
+                thermal_results = self.thermal_model.predict([thermal_frame])[0]
         
         # Combine detections
         detections = []
         timestamp = time.time()
+        stage_started = instrumentation.clock()
         
         # Process visual detections
-        for i, detection in enumerate(visual_results[0].boxes.data):
+        # Initial threat levels for the whole frame (will be refined after tracking and behavior analysis)
+        visual_names = [self.model.names[int(detection[5])] for detection in visual_results]
+        visual_levels = self.determine_threat_levels(visual_names, [float(detection[4]) for detection in visual_results])
+        for i, detection in enumerate(visual_results):
             x1, y1, x2, y2, conf, cls = detection
-            class_name = visual_results[0].names[int(cls)]
-            
-            # Initial threat level (will be refined after tracking and behavior analysis)
-            threat_level = self.determine_threat_level(class_name, float(conf))
+            class_name = visual_names[i]
+            threat_level = visual_levels[i]
             
             detections.append({
                 'id': f"obj_{i}_{timestamp}",  # Include timestamp for uniqueness
@@ -686,12 +818,15 @@ def continuous_threat_assessment(self):
         
         # Process thermal detections if available
         if thermal_results is not None:
-            for i, detection in enumerate(thermal_results[0].boxes.data):
+            # Initial threat levels (will be refined after tracking and behavior analysis)
+            thermal_names = [self.thermal_model.names[int(detection[5])] for detection in thermal_results]
+            thermal_levels = self.determine_threat_levels(
+                thermal_names, [float(detection[4]) for detection in thermal_results], sources='thermal'
+            )
+            for i, detection in enumerate(thermal_results):
                 x1, y1, x2, y2, conf, cls = detection
-                class_name = thermal_results[0].names[int(cls)]
-                
-                # Initial threat level (will be refined after tracking and behavior analysis)
-                threat_level = self.determine_threat_level(class_name, float(conf), source='thermal')
+                class_name = thermal_names[i]
+                threat_level = thermal_levels[i]
                 
                 detections.append({
                     'id': f"thermal_{i}_{timestamp}",  # Include timestamp for uniqueness
@@ -703,8 +838,11 @@ def continuous_threat_assessment(self):
                     'timestamp': timestamp
                 })
         
+        instrumentation.record_since('image_detection_conversion', stage_started)
+        
         # Process radar data if available
         if radar_data is not None:
+            stage_started = instrumentation.clock()
             for i, detection in enumerate(radar_data):
                 # Radar typically provides position, velocity, and sometimes classification
                 position = detection.get('position', [0, 0, 0])
@@ -729,9 +867,11 @@ def continuous_threat_assessment(self):
                     'source': 'radar',
                     'timestamp': timestamp
                 })
+            instrumentation.record_since('radar_conversion', stage_started)
         
         # Process LiDAR data if available
         if lidar_data is not None:
+            stage_started = instrumentation.clock()
             for i, detection in enumerate(lidar_data):
                 position = detection.get('position', [0, 0, 0])
                 dimensions = detection.get('dimensions', [1, 1, 1])  # Width, height, depth
@@ -754,9 +894,11 @@ def continuous_threat_assessment(self):
                     'source': 'lidar',
                     'timestamp': timestamp
                 })
+            instrumentation.record_since('lidar_conversion', stage_started)
         
         # Process acoustic data if available
         if acoustic_data is not None:
+            stage_started = instrumentation.clock()
             for i, detection in enumerate(acoustic_data):
                 direction = detection.get('direction', [0, 0])  # Direction vector
                 intensity = detection.get('intensity', 0.5)
@@ -783,18 +925,113 @@ def continuous_threat_assessment(self):
                     'source': 'acoustic',
                     'timestamp': timestamp
                 })
+            instrumentation.record_since('acoustic_conversion', stage_started)
         
         # Track objects across frames
-        tracked_detections = self.multi_object_tracking(detections, int(timestamp))
+        with instrumentation.span('multi_object_tracking'), self.track_lock:
+            tracked_detections = self.multi_object_tracking(detections, int(timestamp))
         
         # Update tracking history for all objects
-        self.update_track_history(tracked_detections)
+        with instrumentation.span('update_track_history'), self.track_lock:
+            self.update_track_history(tracked_detections)
         
         # Enhance threat assessment with behavioral analysis
-        enhanced_detections = self.enhance_threat_assessment(tracked_detections)
+        with instrumentation.span('enhance_threat_assessment'):
+            enhanced_detections = self.enhance_threat_assessment(tracked_detections)
         
+        instrumentation.record_since('classify_threat_realtime', started)
         return enhanced_detections
     
+    def detect_visual(self, frame, stream_id='default', tile_size=None, tile_overlap=None):
+        """Run YOLOv8 on a frame as far as the stream's motion gate requires
+        
+        Whole frames are always detected unless motion_gating is on. With it,
+        unchanged scenes reuse the previous detections (the tracker keeps their
+        track IDs), localized changes are re-detected on crops of the changed
+        regions, and anything else runs on the full frame.
+        
+        Returns:
+            np.ndarray: (N, 6) detections as x1, y1, x2, y2, confidence, class_id
+        """
+        if not self.motion_gating:
+            return self.detect_full_frame(frame, tile_size, tile_overlap)
+        
+        gate = self.motion_gates.get(stream_id)
+        if gate is None:
+            gate = self.motion_gates[stream_id] = MotionGate()
+        previous = self.stream_detections.get(stream_id)
+        
+        decision = gate.update(frame)
+        if previous is not None and decision.action == REUSE:
+            return previous
+        if previous is not None and decision.action == REGIONS:
+            results, regions = self.detect_changed_regions(frame, decision.regions, previous)
+            gate.commit_regions(regions)
+        else:
+            results = self.detect_full_frame(frame, tile_size, tile_overlap)
+        
+        self.stream_detections[stream_id] = results
+        return results
+    
+    def detect_full_frame(self, frame, tile_size=None, tile_overlap=None):
+        """Run YOLOv8 on a whole frame, tiled when a tile size is configured"""
+        tile_size = tile_size or self.tile_size
+        if tile_size:
+            overlap = self.tile_overlap if tile_overlap is None else tile_overlap
+            return tiled_predict(self.model, frame, tile_size, overlap)
+        return self.model.predict([frame])[0]
+    
+    def detect_changed_regions(self, frame, regions, previous):
+        """Re-detect only the changed regions of a frame, keeping detections elsewhere
+        
+        Returns:
+            tuple: (merged (N, 6) detections, regions actually re-detected)
+        """
+        boxes = previous[:, :4]
+        
+        def overlapping(region):
+            return ((boxes[:, 0] < region[2]) & (boxes[:, 2] > region[0]) &
+                    (boxes[:, 1] < region[3]) & (boxes[:, 3] > region[1]))
+        
+        # Objects touching a changed region are re-detected whole, so grow the
+        # regions to cover them (a couple of passes settles chained overlaps)
+        height, width = frame.shape[:2]
+        for _ in range(3):
+            grown = []
+            for region in regions:
+                overlap = overlapping(region)
+                if overlap.any():
+                    region = [
+                        max(0, min(region[0], int(boxes[overlap, 0].min()))),
+                        max(0, min(region[1], int(boxes[overlap, 1].min()))),
+                        min(width, max(region[2], int(np.ceil(boxes[overlap, 2].max())))),
+                        min(height, max(region[3], int(np.ceil(boxes[overlap, 3].max()))))
+                    ]
+                grown.append(region)
+            grown = merge_boxes(grown)
+            if grown == regions:
+                break
+            regions = grown
+        
+        keep = np.ones(len(previous), dtype=bool)
+        for region in regions:
+            keep &= ~overlapping(region)
+        
+        # All crops go through the detector as one batch
+        crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+        region_results = self.model.predict(crops)
+        merged = [previous[keep]]
+        for (x1, y1, _, _), data in zip(regions, region_results):
+            data = np.array(data, dtype=np.float32, copy=True)
+            data[:, [0, 2]] += x1
+            data[:, [1, 3]] += y1
+            merged.append(data)
+        return np.concatenate(merged, axis=0), regions
+    
+    def get_motion_gating_stats(self):
+        """Per-stream motion gating decisions"""
+        return {stream_id: gate.get_stats() for stream_id, gate in self.motion_gates.items()}
+    
     def enhance_threat_assessment(self, tracked_detections):
         """Enhance threat assessment with behavioral analysis and pattern detection
         
@@ -834,13 +1071,14 @@ def continuous_threat_assessment(self):
                 'max_direction_change': movement.get('max_direction_change', 0)
             }
         
+        # Classify behavior and predict future positions for all tracks at once
+        track_ids = list(tracked_detections.keys())
+        behaviors = self.classify_behaviors(track_ids)
+        predictions = self.predict_track_paths(track_ids)
+        
         # Enhance each tracked detection
         for track_id, detection in tracked_detections.items():
-            # Get track history for behavior classification
-            track_history = self.get_track_history(track_id)
-            
-            # Classify behavior based on movement patterns
-            behavior = self.classify_threat_behavior(track_history, detection)
+            behavior = behaviors[track_id]
             
             # Determine movement pattern
             movement_pattern = 'linear'  # Default
@@ -875,29 +1113,27 @@ def continuous_threat_assessment(self):
             detection['behavior'] = behavior
             detection['movement_pattern'] = movement_pattern
             
-            # Refine threat level with behavior and movement pattern
-            class_name = detection.get('type', 'unknown')
-            confidence = detection.get('confidence', 0.5)
-            source = detection.get('source', 'visual')
-            
-            # Update threat level with behavior and movement pattern information
-            refined_threat_level = self.determine_threat_level(
-                class_name, 
-                confidence, 
-                source, 
-                behavior, 
-                movement_pattern
-            )
-            
-            detection['threat_level'] = refined_threat_level
-            
             # Add prediction of future position if we have enough tracking history
-            if track_history and len(track_history) >= 3:
-                future_positions = self.predict_future_positions(track_history)
-                detection['predicted_positions'] = future_positions
+            if self.track_store.length(track_id) >= 3:
+                prediction = predictions.get(track_id)
+                detection['predicted_positions'] = prediction['positions'] if prediction else []
+                if prediction:
+                    detection['prediction_uncertainty'] = prediction['uncertainty']
             
             enhanced_detections[track_id] = detection
         
+        # Refine threat levels with behavior and movement pattern information, for all tracks at once
+        detections = list(enhanced_detections.values())
+        refined_threat_levels = self.determine_threat_levels(
+            [detection.get('type', 'unknown') for detection in detections],
+            [detection.get('confidence', 0.5) for detection in detections],
+            [detection.get('source', 'visual') for detection in detections],
+            [detection['behavior'] for detection in detections],
+            [detection['movement_pattern'] for detection in detections]
+        )
+        for detection, refined_threat_level in zip(detections, refined_threat_levels):
+            detection['threat_level'] = refined_threat_level
+        
         return enhanced_detections
     
     def update_track_history(self, tracked_detections):
@@ -906,37 +1142,24 @@ def continuous_threat_assessment(self):
         Args:
             tracked_detections: Dictionary of currently tracked objects
         """
-        # Initialize tracking history dictionary if it doesn't exist
-        if not hasattr(self, 'tracking_history'):
-            self.tracking_history = {}
-        
         # Current timestamp
         timestamp = time.time()
         
-        # Update history for each tracked object
-        for track_id, detection in tracked_detections.items():
-            # Create entry for this object if it doesn't exist
-            if track_id not in self.tracking_history:
-                self.tracking_history[track_id] = []
-            
-            # Add current detection to history
-            history_entry = {
-                'timestamp': timestamp,
-                'bbox': detection.get('bounding_box'),
-                'position': detection.get('position'),
-                'velocity': detection.get('velocity'),
-                'type': detection.get('type'),
-                'confidence': detection.get('confidence'),
-                'threat_level': detection.get('threat_level'),
-                'source': detection.get('source')
-            }
-            
-            self.tracking_history[track_id].append(history_entry)
-            
-            # Limit history size to prevent memory issues
-            max_history = 100  # Keep last 100 positions
-            if len(self.tracking_history[track_id]) > max_history:
-                self.tracking_history[track_id] = self.tracking_history[track_id][-max_history:]
+        # Append the current observation of every object to its ring buffer in one batch
+        detections = list(tracked_detections.values())
+        for track_id in tracked_detections:
+            self.track_lifecycle.touch(track_id)
+        self.track_store.extend(
+            timestamp,
+            list(tracked_detections.keys()),
+            [detection.get('bbox', detection.get('bounding_box')) for detection in detections],
+            positions=[detection.get('position') for detection in detections],
+            velocities=[detection.get('velocity') for detection in detections],
+            confidences=[detection.get('confidence') for detection in detections],
+            class_names=[detection.get('type') for detection in detections],
+            threat_levels=[detection.get('threat_level') for detection in detections],
+            sources=[detection.get('source') for detection in detections]
+        )
     
     def get_track_history(self, object_id, max_history=20):
         """Get tracking history for a specific object
@@ -946,85 +1169,79 @@ def continuous_threat_assessment(self):
             max_history: Maximum number of historical entries to return
             
         Returns:
-            list: Historical tracking data for the object
+            TrackWindow: Historical tracking data for the object, oldest first
+            (empty list if the object has no history)
         """
-        # Initialize tracking history dictionary if it doesn't exist
-        if not hasattr(self, 'tracking_history'):
-            self.tracking_history = {}
-        
-        # Return history for this object (empty list if none exists)
-        return self.tracking_history.get(object_id, [])[-max_history:]
+        window = self.track_store.window(object_id, max_history)
+        return window if window is not None else []
     
-    def predict_future_positions(self, track_history, time_horizon=5, steps=10):
+    @staticmethod
+    def as_track_window(track_history):
+        """Accept a TrackWindow or a legacy list of history dicts"""
+        if isinstance(track_history, TrackWindow):
+            return track_history
+        return TrackWindow.from_entries(list(track_history or []))
+    
+    def predict_future_positions(self, track_history, time_horizon=5, steps=10, model=None):
         """Predict future positions of an object based on its tracking history
         
         Args:
             track_history: Historical tracking data for the object
             time_horizon: Time in seconds to predict into the future
             steps: Number of prediction steps
+            model: 'cv' or 'ca' motion model (defaults to self.prediction_model)
             
         Returns:
             list: Predicted future positions [(x1,y1,t1), (x2,y2,t2), ...]
         """
+        track_history = self.as_track_window(track_history)
         if len(track_history) < 3:
             return []
         
-        # Extract position and timestamp data
-        positions = []
-        timestamps = []
-        
-        for entry in track_history[-10:]:  # Use last 10 entries for prediction
-            if 'bbox' in entry and entry['bbox']:
-                bbox = entry['bbox']
-                center_x = (bbox[0] + bbox[2]) / 2
-                center_y = (bbox[1] + bbox[3]) / 2
-                positions.append((center_x, center_y))
-                timestamps.append(entry['timestamp'])
-            elif 'position' in entry and entry['position']:
-                pos = entry['position']
-                positions.append((pos[0], pos[1]))
-                timestamps.append(entry['timestamp'])
-        
-        if len(positions) < 3:
-            return []
+        # Box centres (or positions for tracks without boxes) of the last 10 entries
+        recent = track_history[-10:]
+        positions = recent.centers(use_position=True).astype(np.float64)
+        valid = ~np.isnan(positions).any(axis=1) & ~np.isnan(recent.timestamps)
         
-        # Calculate average velocity from recent positions
-        recent_velocities = []
-        for i in range(1, len(positions)):
-            dt = timestamps[i] - timestamps[i-1]
-            if dt > 0:  # Avoid division by zero
-                dx = positions[i][0] - positions[i-1][0]
-                dy = positions[i][1] - positions[i-1][1]
-                vx = dx / dt
-                vy = dy / dt
-                recent_velocities.append((vx, vy))
-        
-        if not recent_velocities:
+        prediction = predict_trajectories(
+            positions[valid][None], recent.timestamps[valid][None], time_horizon, steps,
+            model or self.prediction_model
+        )
+        if not prediction['valid'][0]:
             return []
+        return [
+            (float(x), float(y), float(t))
+            for (x, y), t in zip(prediction['positions'][0], prediction['times'][0])
+        ]
+    
+    def predict_track_paths(self, track_ids, time_horizon=5, steps=10, model=None):
+        """Predict future positions of many stored tracks in one vectorized pass
         
-        # Calculate average velocity
-        avg_vx = sum(v[0] for v in recent_velocities) / len(recent_velocities)
-        avg_vy = sum(v[1] for v in recent_velocities) / len(recent_velocities)
-        
-        # Get last known position and timestamp
-        last_pos = positions[-1]
-        last_time = timestamps[-1]
-        
-        # Predict future positions
-        future_positions = []
-        time_step = time_horizon / steps
-        
-        for i in range(1, steps + 1):
-            future_time = last_time + (i * time_step)
-            dt = future_time - last_time
-            
-            # Linear prediction
-            future_x = last_pos[0] + (avg_vx * dt)
-            future_y = last_pos[1] + (avg_vy * dt)
+        Args:
+            track_ids: Tracks to predict
+            time_horizon: Time in seconds to predict into the future
+            steps: Number of prediction steps
+            model: 'cv' or 'ca' motion model (defaults to self.prediction_model)
             
-            future_positions.append((future_x, future_y, future_time))
-        
-        return future_positions
+        Returns:
+            dict: track_id -> {'positions': [[x, y, t], ...], 'uncertainty': [radius, ...]}
+            for tracks with enough history
+        """
+        with self.track_lock:
+            track_ids = [track_id for track_id in track_ids if self.track_store.length(track_id) >= 3]
+            if not track_ids:
+                return {}
+            centers, timestamps = self.track_store.recent_centers(track_ids, 10, use_position=True)
+        prediction = predict_trajectories(centers, timestamps, time_horizon, steps, model or self.prediction_model)
+        
+        # Convert to Python lists in one go: (x, y, t) points and radii per track
+        valid = np.flatnonzero(prediction['valid'])
+        points = np.concatenate([prediction['positions'], prediction['times'][..., None]], axis=-1)[valid].tolist()
+        radii = prediction['radius'][valid].tolist()
+        return {
+            track_ids[i]: {'positions': track_points, 'uncertainty': track_radii}
+            for i, track_points, track_radii in zip(valid, points, radii)
+        }
     
     def visualize_tracked_objects(self, frame, tracked_objects, show_predictions=True, show_history=True):
         """Visualize tracked objects with threat levels and predictions
@@ -1036,16 +1253,17 @@ def continuous_threat_assessment(self):
             show_history: Whether to show tracking history
             
         Returns:
-            frame: Annotated video frame
+            frame: Annotated video frame. It is one of the renderer's reused
+            buffers, valid until the next-but-one call; copy it to keep it.
         """
-        # Create a copy of the frame for drawing
-        vis_frame = frame.copy()
-        
-        # Define colors for different threat levels
-        colors = {
-            'HIGH': (0, 0, 255),    # Red
-            'MEDIUM': (0, 165, 255), # Orange
-            'LOW': (0, 255, 0)       # Green
+        # Draw on a reused buffer instead of a fresh copy of the frame
+        vis_frame = self.renderer.begin(frame)
+        
+        # Line thickness for different threat levels
+        thicknesses = {
+            'HIGH': 3,
+            'MEDIUM': 2,
+            'LOW': 1
         }
         
         # Draw each tracked object
@@ -1059,80 +1277,55 @@ def continuous_threat_assessment(self):
             
             # Get threat level and corresponding color
             threat_level = obj.get('threat_level', 'LOW')
-            color = colors.get(threat_level, (255, 255, 255))  # Default to white
+            color = threat_color(threat_level)
             
             # Draw bounding box with thickness based on threat level
-            thickness = 1
-            if threat_level == 'MEDIUM':
-                thickness = 2
-            elif threat_level == 'HIGH':
-                thickness = 3
-                
-            cv2.rectangle(vis_frame, (x1, y1), (x2, y2), color, thickness)
+            self.renderer.draw_box(vis_frame, bbox, color, thicknesses.get(threat_level, 1))
             
-            # Draw object type and track ID
+            # Draw object type and track ID (label sprites are cached per text and color)
             obj_type = obj.get('type', 'unknown')
-            label = f"{obj_type} ({track_id}) - {threat_level}"
-            cv2.putText(vis_frame, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            self.renderer.draw_label(vis_frame, f"{obj_type} ({track_id}) - {threat_level}", x1, y1, color)
             
-            # Draw behavior if available
-            if 'behavior' in obj:
-                behavior_label = f"Behavior: {obj['behavior']}"
-                cv2.putText(vis_frame, behavior_label, (x1, y2+15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-            
-            # Draw movement pattern if available
-            if 'movement_pattern' in obj:
-                pattern_label = f"Pattern: {obj['movement_pattern']}"
-                cv2.putText(vis_frame, pattern_label, (x1, y2+30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+            # Draw behavior and movement pattern below the box if available
+            label_y = y2 + 2
+            for key, title in (('behavior', 'Behavior'), ('movement_pattern', 'Pattern')):
+                if key in obj:
+                    self.renderer.draw_label(vis_frame, f"{title}: {obj[key]}", x1, label_y, color, above=False)
+                    label_y += self.renderer.sprite(f"{title}: {obj[key]}", color).shape[0]
             
             # Draw tracking history if available and requested
-            if show_history and hasattr(self, 'tracking_history') and track_id in self.tracking_history:
-                history = self.tracking_history[track_id][-10:]  # Last 10 positions
+            history = self.track_store.window(track_id, 10) if show_history else None  # Last 10 positions
+            if history is not None:
+                centers = history.centers()
+                centers = centers[~np.isnan(centers).any(axis=1)].astype(np.int32)
                 
                 # Draw history as a trail of points
-                for i in range(1, len(history)):
-                    if 'bbox' in history[i] and 'bbox' in history[i-1]:
-                        # Calculate centers
-                        bbox1 = history[i-1]['bbox']
-                        bbox2 = history[i]['bbox']
-                        
-                        center1 = (int((bbox1[0] + bbox1[2]) / 2), int((bbox1[1] + bbox1[3]) / 2))
-                        center2 = (int((bbox2[0] + bbox2[2]) / 2), int((bbox2[1] + bbox2[3]) / 2))
-                        
-                        # Draw line between consecutive positions
-                        cv2.line(vis_frame, center1, center2, color, 1)
-                        
-                        # Draw point at each position
-                        cv2.circle(vis_frame, center2, 2, color, -1)
+                if len(centers) > 1:
+                    cv2.polylines(vis_frame, [centers], False, color, 1)
+                    for center in centers[1:]:
+                        cv2.circle(vis_frame, (int(center[0]), int(center[1])), 2, color, -1)
             
             # Draw predicted future positions if available and requested
             if show_predictions and 'predicted_positions' in obj:
                 predictions = obj['predicted_positions']
                 
-                # Get current center position
-                center_x = int((x1 + x2) / 2)
-                center_y = int((y1 + y2) / 2)
-                current_pos = (center_x, center_y)
+                uncertainty = obj.get('prediction_uncertainty') or [0] * len(predictions)
                 
-                # Draw predictions as a line with points
-                for i, (pred_x, pred_y, _) in enumerate(predictions):
+                # Draw predictions as a dashed line from the current center through each point,
+                # with the uncertainty radius around each point (the cone widens with time)
+                previous_pos = (int((x1 + x2) / 2), int((y1 + y2) / 2))
+                for (pred_x, pred_y, _), radius in zip(predictions, uncertainty):
                     pred_pos = (int(pred_x), int(pred_y))
-                    
-                    # Draw line from current position to first prediction,
-                    # or from previous prediction to current prediction
-                    if i == 0:
-                        cv2.line(vis_frame, current_pos, pred_pos, (255, 0, 255), 1, cv2.LINE_DASH)
-                    else:
-                        prev_pos = (int(predictions[i-1][0]), int(predictions[i-1][1]))
-                        cv2.line(vis_frame, prev_pos, pred_pos, (255, 0, 255), 1, cv2.LINE_DASH)
-                    
-                    # Draw point at predicted position
-                    cv2.circle(vis_frame, pred_pos, 3, (255, 0, 255), -1)
+                    self.renderer.draw_dashed_line(vis_frame, previous_pos, pred_pos, PREDICTION_COLOR, 1)
+                    cv2.circle(vis_frame, pred_pos, 3, PREDICTION_COLOR, -1)
+                    if radius >= 4:
+                        cv2.circle(vis_frame, pred_pos, int(radius), PREDICTION_COLOR, 1)
+                    previous_pos = pred_pos
         
         # Add legend for threat levels
-        legend_y = 30
-        for level, color in colors.items():
-            cv2.putText(vis_frame, f"{level} Threat", (10, legend_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        legend_y = 10
+        for level in ('HIGH', 'MEDIUM', 'LOW'):
+            self.renderer.draw_label(vis_frame, f"{level} Threat", 10, legend_y, threat_color(level), above=False)
             legend_y += 20
         
         return vis_frame
@@ -1167,6 +1360,10 @@ def continuous_threat_assessment(self):
     def determine_threat_level(self, class_name, confidence, source='visual', behavior=None, movement_pattern=None):
         """Determine threat level based on class, confidence, behavior, and movement patterns
         
+        Scores come from the compiled threat table (threat_table.py): the
+        multipliers of each class/source/behavior/pattern combination are
+        memoized and the contextual rules are compiled per context.
+        
         Args:
             class_name: Detected object class
             confidence: Detection confidence score
@@ -1177,76 +1374,39 @@ def continuous_threat_assessment(self):
         Returns:
             str: Threat level ('LOW', 'MEDIUM', 'HIGH')
         """
-        # Military-specific threat classification
-        high_threat_classes = ['tank', 'military_vehicle', 'armed_person', 'missile', 'aircraft', 'drone', 'weapon']
-        medium_threat_classes = ['person', 'vehicle', 'truck', 'boat', 'helicopter']
-        low_threat_classes = ['civilian', 'animal', 'bicycle', 'car']
-        
-        # Base threat score calculation
-        threat_score = 0.0
-        
-        # 1. Class-based scoring
-        if class_name in high_threat_classes:
-            threat_score += 0.7
-        elif class_name in medium_threat_classes:
-            threat_score += 0.4
-        elif class_name in low_threat_classes:
-            threat_score += 0.1
-        else:
-            threat_score += 0.2  # Unknown classes get a moderate-low score
-        
-        # 2. Confidence adjustment
-        confidence_factor = min(1.0, confidence)
-        threat_score *= (0.5 + 0.5 * confidence_factor)  # Scale by confidence, but maintain at least 50% of base score
-        
-        # 3. Source-based adjustment
-        source_multipliers = {
-            'visual': 1.0,
-            'thermal': 1.2,  # Thermal detections are more significant
-            'radar': 1.1,    # Radar detections are also more significant
-            'lidar': 1.0,
-            'acoustic': 0.9   # Acoustic detections are less reliable
-        }
-        threat_score *= source_multipliers.get(source, 1.0)
-        
-        # 4. Behavior-based adjustment
-        if behavior is not None:
-            behavior_multipliers = {
-                'stationary': 0.8,
-                'moving': 1.0,
-                'approaching': 1.3,
-                'fleeing': 1.1,
-                'circling': 1.2,
-                'erratic': 1.4,
-                'aggressive': 1.6
-            }
-            threat_score *= behavior_multipliers.get(behavior, 1.0)
-        
-        # 5. Movement pattern adjustment
-        if movement_pattern is not None:
-            pattern_multipliers = {
-                'linear': 1.0,
-                'random': 0.9,
-                'circular': 1.1,
-                'zigzag': 1.3,  # Evasive movement
-                'coordinated': 1.5  # Coordinated with other objects
-            }
-            threat_score *= pattern_multipliers.get(movement_pattern, 1.0)
-        
-        # 6. Apply contextual adjustments from class-specific rules
-        threat_score = self.apply_contextual_threat_rules(class_name, threat_score)
+        self.refresh_threat_context()
+        return self.threat_table.level(class_name, confidence, source, behavior, movement_pattern)
+    
+    def determine_threat_levels(self, class_names, confidences, sources='visual', behaviors=None, movement_patterns=None):
+        """Threat levels of a whole frame of detections in one vectorized pass
         
-        # Convert final score to threat level
-        if threat_score >= 0.7:
-            return 'HIGH'
-        elif threat_score >= 0.4:
-            return 'MEDIUM'
-        else:
-            return 'LOW'
+        Args:
+            class_names: Detected object classes
+            confidences: Detection confidence scores
+            sources: Detection source, one for all or one per detection
+            behaviors: Optional behavior classification(s), one for all or one per detection
+            movement_patterns: Optional movement pattern(s), one for all or one per detection
+            
+        Returns:
+            list: Threat levels, identical to determine_threat_level per detection
+        """
+        self.refresh_threat_context()
+        return self.threat_table.levels(class_names, confidences, sources, behaviors, movement_patterns)
+    
+    def refresh_threat_context(self):
+        """Recompile the contextual threat rules if time of day, mission or environment changed"""
+        self.threat_table.set_context(
+            self.threat_table.night_time(),
+            self.swarm_state.get('mission_status', 'idle'),
+            getattr(self, 'environment_context', None)
+        )
     
     def apply_contextual_threat_rules(self, class_name, base_score):
         """Apply contextual rules to adjust threat scores based on specific object types
         
+        Night time, the mission context and the environment context adjust
+        the scores of specific classes; see threat_table.contextual_steps.
+        
         Args:
             class_name: Object class name
             base_score: Initial threat score
@@ -1254,61 +1414,10 @@ def continuous_threat_assessment(self):
         Returns:
             float: Adjusted threat score
         """
-        # Time-based factors (e.g., night time might increase certain threat scores)
-        current_hour = datetime.now().hour
-        night_time = current_hour < 6 or current_hour > 20
-        
-        # Get current mission context if available
-        mission_context = self.swarm_state.get('mission_status', 'idle')
-        
-        # Apply class-specific contextual rules
-        if class_name == 'person':
-            # Person at night is more suspicious
-            if night_time:
-                base_score *= 1.2
-            
-            # In high-security missions, unknown persons are higher threats
-            if mission_context in ['high_security', 'restricted_area']:
-                base_score *= 1.3
-                
-        elif class_name == 'vehicle':
-            # Vehicles at night in certain contexts are more suspicious
-            if night_time and mission_context in ['border_patrol', 'high_security']:
-                base_score *= 1.3
-                
-        elif class_name == 'drone':
-            # Enemy drones are always high threat in any context
-            base_score = max(base_score, 0.7)
-            
-            # In no-fly zones, any drone is high threat
-            if mission_context in ['no_fly_zone', 'restricted_airspace']:
-                base_score = max(base_score, 0.8)
-                
-        elif class_name == 'aircraft':
-            # Low-flying aircraft in restricted areas are higher threat
-            if mission_context in ['restricted_airspace', 'high_security']:
-                base_score *= 1.4
-        
-        # Apply environmental context if available
-        if hasattr(self, 'environment_context'):
-            env_context = self.environment_context
-            
-            # In urban environments, reduce threat level of common objects
-            if env_context == 'urban' and class_name in ['person', 'car', 'bicycle']:
-                base_score *= 0.8
-                
-            # In military zones, increase threat level of all objects
-            elif env_context == 'military_zone':
-                base_score *= 1.2
-                
-            # In border areas, increase threat level of vehicles and groups
-            elif env_context == 'border' and class_name in ['vehicle', 'truck', 'group']:
-                base_score *= 1.3
-        
-        # Cap the final score at 1.0
-        return min(1.0, base_score)
+        self.refresh_threat_context()
+        return self.threat_table.apply_context(class_name, base_score)
     
-    def classify_threat_behavior(self, track_history, current_detection):
+    def classify_threat_behavior(self, track_history, current_detection=None):
         """Classify the behavior of a tracked threat based on its movement history
         
         Args:
@@ -1318,82 +1427,67 @@ def continuous_threat_assessment(self):
         Returns:
             str: Behavior classification
         """
-        if not track_history or len(track_history) < 3:
+        track_history = self.as_track_window(track_history)
+        if len(track_history) < 3:
             return None
         
-        # Extract position history
-        positions = []
-        for track in track_history[-10:]:  # Use up to 10 most recent positions
-            if 'bbox' in track:
-                bbox = track['bbox']
-                center_x = (bbox[0] + bbox[2]) / 2
-                center_y = (bbox[1] + bbox[3]) / 2
-                positions.append((center_x, center_y))
-        
-        if len(positions) < 3:
-            return None
+        # Box centres of up to 10 most recent positions
+        positions = track_history[-10:].centers().astype(np.float64)
+        positions = positions[~np.isnan(positions).any(axis=1)]
+        return self.classify_movement(positions[None])[0]
+    
+    def classify_behaviors(self, track_ids):
+        """classify_threat_behavior for many stored tracks in one vectorized pass
         
-        # Calculate velocities between consecutive positions
-        velocities = []
-        for i in range(1, len(positions)):
-            p1 = positions[i-1]
-            p2 = positions[i]
-            dx = p2[0] - p1[0]
-            dy = p2[1] - p1[1]
-            velocities.append((dx, dy))
-        
-        # Calculate speed and direction changes
-        speeds = [np.sqrt(vx**2 + vy**2) for vx, vy in velocities]
-        avg_speed = sum(speeds) / len(speeds)
-        
-        # Calculate direction changes
-        direction_changes = []
-        for i in range(1, len(velocities)):
-            v1 = velocities[i-1]
-            v2 = velocities[i]
-            
-            # Calculate angle between vectors
-            dot_product = v1[0]*v2[0] + v1[1]*v2[1]
-            mag1 = np.sqrt(v1[0]**2 + v1[1]**2)
-            mag2 = np.sqrt(v2[0]**2 + v2[1]**2)
-            
-            if mag1 > 0 and mag2 > 0:  # Avoid division by zero
-                cos_angle = dot_product / (mag1 * mag2)
-                # Clamp to avoid numerical errors
-                cos_angle = max(-1, min(1, cos_angle))
-                angle_rad = np.arccos(cos_angle)
-                direction_changes.append(np.degrees(angle_rad))
-        
-        avg_direction_change = sum(direction_changes) / max(1, len(direction_changes))
-        max_direction_change = max(direction_changes) if direction_changes else 0
-        
-        # Check if object is approaching our position (simplified)
-        approaching = False
+        Returns:
+            dict: track_id -> behavior (None for tracks with too little history)
+        """
+        behaviors = dict.fromkeys(track_ids)
+        with self.track_lock:
+            eligible = [track_id for track_id in track_ids if self.track_store.length(track_id) >= 3]
+            if eligible:
+                centers, _ = self.track_store.recent_centers(eligible, 10)
+        if eligible:
+            behaviors.update(zip(eligible, self.classify_movement(centers)))
+        return behaviors
+    
+    def classify_movement(self, centers):
+        """Behavior of each (T, L, 2) centre sequence, None with fewer than 3 valid points"""
+        stats = movement_statistics(centers)
+        length = centers.shape[1]
+        
+        # Check if each object is approaching our position (simplified): the
+        # distance from its first to its last position shrank by over 10
+        approaching = np.zeros(len(centers), dtype=bool)
         if hasattr(self, 'position_history') and self.position_history:
-            our_position = self.position_history[-1]['position'][:2]  # x, y coordinates
-            
-            # Calculate distance to our position for first and last object position
-            first_dist = np.sqrt((positions[0][0] - our_position[0])**2 + (positions[0][1] - our_position[1])**2)
-            last_dist = np.sqrt((positions[-1][0] - our_position[0])**2 + (positions[-1][1] - our_position[1])**2)
-            
-            # If distance is decreasing, object is approaching
-            approaching = last_dist < first_dist and (first_dist - last_dist) > 10
+            our_position = np.asarray(self.position_history[-1]['position'][:2], dtype=np.float64)  # x, y coordinates
+            first = centers[np.arange(len(centers)), np.minimum(length - stats['points'], length - 1)]
+            first_dist = np.linalg.norm(first - our_position, axis=1)
+            last_dist = np.linalg.norm(centers[:, -1] - our_position, axis=1)
+            approaching = (last_dist < first_dist) & ((first_dist - last_dist) > 10)
         
         # Classify behavior based on movement patterns
-        if avg_speed < 1.0:
-            behavior = 'stationary'
-        elif approaching:
-            behavior = 'approaching'
-        elif avg_direction_change > 45 or max_direction_change > 90:
-            behavior = 'erratic'
-        elif avg_direction_change > 20:
-            behavior = 'circling'
-        elif avg_speed > 20:
-            behavior = 'fleeing' if not approaching else 'aggressive'
-        else:
-            behavior = 'moving'
+        behaviors = []
+        for points, avg_speed, avg_direction_change, max_direction_change, is_approaching in zip(
+                stats['points'], stats['avg_speed'], stats['avg_direction_change'],
+                stats['max_direction_change'], approaching):
+            if points < 3:
+                behavior = None
+            elif avg_speed < 1.0:
+                behavior = 'stationary'
+            elif is_approaching:
+                behavior = 'approaching'
+            elif avg_direction_change > 45 or max_direction_change > 90:
+                behavior = 'erratic'
+            elif avg_direction_change > 20:
+                behavior = 'circling'
+            elif avg_speed > 20:
+                behavior = 'fleeing'
+            else:
+                behavior = 'moving'
+            behaviors.append(behavior)
         
-        return behavior
+        return behaviors
     
     def target_handoff(self, current_drone_id, target_id, target_location, target_metadata):
         """Autonomous target handoff to nearest drone with better view
@@ -1530,6 +1624,7 @@ def continuous_threat_assessment(self):
         """
         if sensor_type in self.sensor_data:
             self.sensor_data[sensor_type] = data
+            self.threat_scheduler.notify('sensor')
             return True
         return False
     
@@ -1556,7 +1651,7 @@ def continuous_threat_assessment(self):
             return {'event': 'coordinated_threat', 'threats': coordinated_threats, 'timestamp': time.time()}
         
         # Check for rapid movement patterns
-        if hasattr(self, 'tracked_objects') and self.tracked_objects:
+        if len(self.track_store):
             rapid_movements = self.detect_rapid_movements()
             if rapid_movements:
                 return {'event': 'rapid_movement', 'movements': rapid_movements, 'timestamp': time.time()}
@@ -1569,40 +1664,35 @@ def continuous_threat_assessment(self):
         Returns:
             list: Coordinated threat groups if detected, empty list otherwise
         """
-        if not hasattr(self, 'tracked_objects') or not self.tracked_objects:
-            return []
-        
         # Need at least 3 tracked objects to detect coordination
-        if len(self.tracked_objects) < 3:
+        track_ids = self.track_store.track_ids()
+        if len(track_ids) < 3:
             return []
         
-        # Extract recent positions for each tracked object
+        # Extract recent positions (box centres of the last 3 points) for each tracked object
         object_positions = {}
         object_velocities = {}
         current_time = time.time()
         
-        for track_id, track_data in self.tracked_objects.items():
-            if not isinstance(track_data, list) or len(track_data) < 3:
-                continue
-                
-            # Get recent positions (last 3 points)
-            recent_positions = []
-            for point in track_data[-3:]:
-                if 'bbox' in point:
-                    # Calculate center point of bounding box
-                    bbox = point['bbox']
-                    center_x = (bbox[0] + bbox[2]) / 2
-                    center_y = (bbox[1] + bbox[3]) / 2
-                    recent_positions.append((center_x, center_y))
-            
-            if len(recent_positions) >= 2:
-                object_positions[track_id] = recent_positions
-                
-                # Calculate velocity vector (from second-to-last to last position)
-                p1 = recent_positions[-2]
-                p2 = recent_positions[-1]
-                velocity = (p2[0] - p1[0], p2[1] - p1[1])
-                object_velocities[track_id] = velocity
+        # Ids are filtered and read under one hold of the track lock, so none is evicted in between
+        with self.track_lock:
+            track_ids = [track_id for track_id in track_ids if self.track_store.length(track_id) >= 3]
+            if track_ids:
+                centers, _ = self.track_store.recent_centers(track_ids, 3)
+        if track_ids:
+            # Valid points are compacted to the end, so two valid points means the second-to-last is set
+            usable = ~np.isnan(centers[:, -2]).any(axis=-1)
+            centers = centers[usable]
+            valid = ~np.isnan(centers).any(axis=-1)
+            # Velocity vector from second-to-last to last position
+            velocities = (centers[:, -1] - centers[:, -2]).tolist()
+            usable_ids = [track_id for track_id, ok in zip(track_ids, usable.tolist()) if ok]
+            for track_id, recent_positions, recent_valid, velocity in zip(
+                    usable_ids, centers.tolist(), valid.tolist(), velocities):
+                object_positions[track_id] = [
+                    tuple(position) for position, ok in zip(recent_positions, recent_valid) if ok
+                ]
+                object_velocities[track_id] = tuple(velocity)
         
         # Need at least 3 objects with valid positions
         if len(object_positions) < 3:
@@ -1617,13 +1707,18 @@ def continuous_threat_assessment(self):
         # Combine formation and velocity information
         coordinated_groups = []
         
+        # Aligned group of each object, so formation overlaps are counted in one pass
+        aligned_group_of = {member: index for index, group in enumerate(aligned_groups) for member in group}
+        
         # If objects are both in formation and moving in aligned directions
-        for formation in formations:
+        aligned_formations = set()
+        for formation_index, formation in enumerate(formations):
             # Check if majority of formation members are also velocity-aligned
-            for aligned_group in aligned_groups:
-                common_members = set(formation).intersection(set(aligned_group))
-                if len(common_members) >= min(2, len(formation) // 2):
+            common_counts = Counter(aligned_group_of[member] for member in formation if member in aligned_group_of)
+            for group_index in sorted(common_counts):
+                if common_counts[group_index] >= min(2, len(formation) // 2):
                     # This is likely a coordinated group
+                    aligned_formations.add(formation_index)
                     coordinated_groups.append({
                         'members': list(formation),
                         'formation_type': 'linear' if len(formation) > 3 else 'cluster',
@@ -1632,9 +1727,10 @@ def continuous_threat_assessment(self):
                         'detection_time': current_time
                     })
         
-        # Also include large formations even without aligned movement
-        for formation in formations:
-            if len(formation) >= 4 and not any(set(formation).issubset(set(g['members'])) for g in coordinated_groups):
+        # Also include large formations even without aligned movement (formations
+        # are disjoint, so one is only covered by a group made from itself)
+        for formation_index, formation in enumerate(formations):
+            if len(formation) >= 4 and formation_index not in aligned_formations:
                 coordinated_groups.append({
                     'members': list(formation),
                     'formation_type': 'large_formation',
@@ -1648,43 +1744,31 @@ def continuous_threat_assessment(self):
     def detect_formations(self, object_positions):
         """Detect if objects are moving in formation patterns
         
+        Objects within formation_radius of each other, directly or through a
+        chain of neighbours, form one formation (DBSCAN with min_samples=2).
+        Neighbours come from the incrementally updated grid index.
+        
         Args:
             object_positions: Dictionary of object IDs to position lists
             
         Returns:
             list: Groups of objects in formations
         """
-        # Extract the latest position for each object
-        latest_positions = {obj_id: positions[-1] for obj_id, positions in object_positions.items()}
-        
-        # Convert to format suitable for clustering
-        points = np.array(list(latest_positions.values()))
-        ids = list(latest_positions.keys())
-        
-        # Use DBSCAN to find clusters (formations)
-        if len(points) >= 3:  # Need at least 3 points for meaningful clustering
-            try:
-                # Normalize points to avoid scale issues
-                scaler = StandardScaler()
-                scaled_points = scaler.fit_transform(points)
-                
-                # Run DBSCAN clustering
-                clustering = DBSCAN(eps=0.5, min_samples=2).fit(scaled_points)
-                
-                # Extract clusters (ignoring noise points labeled as -1)
-                formations = []
-                for cluster_id in set(clustering.labels_):
-                    if cluster_id != -1:  # Ignore noise points
-                        cluster_indices = np.where(clustering.labels_ == cluster_id)[0]
-                        if len(cluster_indices) >= 2:  # At least 2 objects in formation
-                            formation = [ids[i] for i in cluster_indices]
-                            formations.append(formation)
-                
-                return formations
-            except Exception as e:
-                print(f"Error in formation detection: {e}")
+        # Need at least 3 points for meaningful clustering
+        if len(object_positions) < 3:
+            return []
         
-        return []
+        # Move the latest position of each object in the grid (only objects
+        # crossing a cell border actually change buckets). The track lifecycle
+        # removes evicted ids from the grid under track_lock, so the grid is
+        # updated and read under it too, and ids evicted since object_positions
+        # was read are not put back
+        with self.track_lock:
+            ids = [object_id for object_id in object_positions if object_id in self.track_store]
+            if len(ids) < 3:
+                return []
+            self.spatial_index.update(ids, [object_positions[object_id][-1] for object_id in ids])
+            return self.spatial_index.clusters(self.formation_radius, ids=set(ids))
     
     def detect_velocity_alignment(self, object_velocities):
         """Detect if objects are moving in the same direction
@@ -1698,56 +1782,10 @@ def continuous_threat_assessment(self):
         if len(object_velocities) < 2:
             return []
         
-        # Function to calculate angle between two velocity vectors
-        def angle_between(v1, v2):
-            dot_product = v1[0]*v2[0] + v1[1]*v2[1]
-            mag1 = np.sqrt(v1[0]**2 + v1[1]**2)
-            mag2 = np.sqrt(v2[0]**2 + v2[1]**2)
-            
-            # Avoid division by zero
-            if mag1 == 0 or mag2 == 0:
-                return 90  # Perpendicular by default
-                
-            cos_angle = dot_product / (mag1 * mag2)
-            # Clamp to avoid numerical errors
-            cos_angle = max(-1, min(1, cos_angle))
-            angle_rad = np.arccos(cos_angle)
-            return np.degrees(angle_rad)
-        
-        # Find groups of objects moving in similar directions
-        aligned_groups = []
-        processed_ids = set()
-        
-        for obj_id, velocity in object_velocities.items():
-            if obj_id in processed_ids:
-                continue
-                
-            # Skip objects that are nearly stationary
-            speed = np.sqrt(velocity[0]**2 + velocity[1]**2)
-            if speed < 0.5:  # Minimum speed threshold
-                continue
-                
-            # Find objects moving in similar direction
-            aligned_with_current = [obj_id]
-            
-            for other_id, other_velocity in object_velocities.items():
-                if other_id == obj_id or other_id in processed_ids:
-                    continue
-                    
-                other_speed = np.sqrt(other_velocity[0]**2 + other_velocity[1]**2)
-                if other_speed < 0.5:  # Skip nearly stationary objects
-                    continue
-                    
-                # Check if directions are aligned (angle less than 30 degrees)
-                if angle_between(velocity, other_velocity) < 30:
-                    aligned_with_current.append(other_id)
-            
-            # If we found at least one other object moving in the same direction
-            if len(aligned_with_current) > 1:
-                aligned_groups.append(aligned_with_current)
-                processed_ids.update(aligned_with_current)
-        
-        return aligned_groups
+        # Objects within 30 degrees of each other's direction, from one cosine matrix
+        return alignment_groups(
+            list(object_velocities.keys()), list(object_velocities.values()), max_angle=30.0, min_speed=0.5
+        )
     
     def detect_rapid_movements(self):
         """Detect rapid or evasive movements in tracked objects
@@ -1757,72 +1795,35 @@ def continuous_threat_assessment(self):
         """
         rapid_movements = []
         
-        for track_id, track_data in self.tracked_objects.items():
-            if not isinstance(track_data, list) or len(track_data) < 4:
-                continue
-                
-            # Extract recent positions
-            recent_positions = []
-            for point in track_data[-4:]:
-                if 'bbox' in point:
-                    bbox = point['bbox']
-                    center_x = (bbox[0] + bbox[2]) / 2
-                    center_y = (bbox[1] + bbox[3]) / 2
-                    recent_positions.append((center_x, center_y))
-            
-            if len(recent_positions) < 4:
-                continue
-                
-            # Calculate speeds between consecutive points
-            speeds = []
-            for i in range(1, len(recent_positions)):
-                p1 = recent_positions[i-1]
-                p2 = recent_positions[i]
-                distance = np.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
-                speeds.append(distance)
-            
-            # Calculate acceleration (change in speed)
-            accelerations = [speeds[i] - speeds[i-1] for i in range(1, len(speeds))]
-            
-            # Calculate direction changes
-            direction_changes = []
-            for i in range(2, len(recent_positions)):
-                v1 = (recent_positions[i-1][0] - recent_positions[i-2][0], 
-                      recent_positions[i-1][1] - recent_positions[i-2][1])
-                v2 = (recent_positions[i][0] - recent_positions[i-1][0], 
-                      recent_positions[i][1] - recent_positions[i-1][1])
-                
-                # Calculate angle between vectors
-                dot_product = v1[0]*v2[0] + v1[1]*v2[1]
-                mag1 = np.sqrt(v1[0]**2 + v1[1]**2)
-                mag2 = np.sqrt(v2[0]**2 + v2[1]**2)
-                
-                if mag1 > 0 and mag2 > 0:  # Avoid division by zero
-                    cos_angle = dot_product / (mag1 * mag2)
-                    # Clamp to avoid numerical errors
-                    cos_angle = max(-1, min(1, cos_angle))
-                    angle_rad = np.arccos(cos_angle)
-                    direction_changes.append(np.degrees(angle_rad))
-            
-            # Detect rapid movement patterns
-            max_speed = max(speeds) if speeds else 0
-            max_acceleration = max(abs(a) for a in accelerations) if accelerations else 0
-            max_direction_change = max(direction_changes) if direction_changes else 0
-            
-            # Thresholds for rapid movement detection
-            if (max_speed > 20 or max_acceleration > 10 or max_direction_change > 60):
-                # Extract object type from track_id
-                object_type = track_id.split('_')[1] if '_' in track_id else 'unknown'
-                
-                rapid_movements.append({
-                    'id': track_id,
-                    'type': object_type,
-                    'max_speed': max_speed,
-                    'max_acceleration': max_acceleration,
-                    'max_direction_change': max_direction_change,
-                    'evasive_pattern': max_direction_change > 60,
-                    'detection_time': time.time()
-                })
+        # Box centres of the last 4 points of every track with enough history
+        with self.track_lock:
+            track_ids = [track_id for track_id in self.track_store.track_ids() if self.track_store.length(track_id) >= 4]
+            if not track_ids:
+                return rapid_movements
+            centers, _ = self.track_store.recent_centers(track_ids, 4)
+        
+        # Speeds between consecutive points, acceleration (change in speed) and
+        # direction changes for all tracks at once
+        stats = movement_statistics(centers)
+        
+        # Thresholds for rapid movement detection
+        rapid = (stats['points'] == 4) & (
+            (stats['max_speed'] > 20) | (stats['max_acceleration'] > 10) | (stats['max_direction_change'] > 60)
+        )
+        
+        detection_time = time.time()
+        for i in np.flatnonzero(rapid):
+            track_id = track_ids[i]
+            max_direction_change = float(stats['max_direction_change'][i])
+            rapid_movements.append({
+                'id': track_id,
+                'type': (self.track_store.latest(track_id) or {}).get('type') or 'unknown',
+                'max_speed': float(stats['max_speed'][i]),
+                'max_acceleration': float(stats['max_acceleration'][i]),
+                'max_direction_change': max_direction_change,
+                'evasive_pattern': max_direction_change > 60,
+                'detection_time': detection_time
+            })
         
         return rapid_movements
     
@@ -1838,47 +1839,42 @@ def continuous_threat_assessment(self):
         Returns:
             List of predicted future positions
         """
-        # Initialize Kalman filter for this obstacle if not exists
-        if obstacle_id not in self.kalman_filters:
-            kf = KalmanFilter(dim_x=6, dim_z=3)  # State: [x, y, z, vx, vy, vz]
-            kf.x = np.array([*current_position, *current_velocity])  # Initial state
-            kf.F = np.array([  # State transition matrix
-                [1., 0., 0., 1., 0., 0.],
-                [0., 1., 0., 0., 1., 0.],
-                [0., 0., 1., 0., 0., 1.],
-                [0., 0., 0., 1., 0., 0.],
-                [0., 0., 0., 0., 1., 0.],
-                [0., 0., 0., 0., 0., 1.]
-            ])
-            kf.H = np.array([  # Measurement function
-                [1., 0., 0., 0., 0., 0.],
-                [0., 1., 0., 0., 0., 0.],
-                [0., 0., 1., 0., 0., 0.]
-            ])
-            kf.P *= 1000.  # Initial uncertainty
-            kf.R = np.eye(3) * 0.1  # Measurement uncertainty
-            kf.Q = np.eye(6) * 0.01  # Process uncertainty
-            self.kalman_filters[obstacle_id] = kf
-        else:
-            # Update existing filter with new measurement
-            kf = self.kalman_filters[obstacle_id]
-            kf.predict()
-            kf.update(np.array(current_position))
-        
-        # Predict future positions
-        future_positions = []
-        state = kf.x.copy()
-        dt = 0.5  # Time step for prediction (seconds)
-        steps = int(time_horizon / dt)
-        
-        for _ in range(steps):
-            # Simple linear prediction
-            state[0] += state[3] * dt  # x += vx * dt
-            state[1] += state[4] * dt  # y += vy * dt
-            state[2] += state[5] * dt  # z += vz * dt
-            future_positions.append(state[:3].copy())
-        
-        return future_positions
+        paths = self.predict_obstacle_paths({obstacle_id: (current_position, current_velocity)}, time_horizon)
+        return list(paths[obstacle_id])
+    
+    def predict_obstacle_paths(self, obstacles, time_horizon=5.0):
+        """Predict future paths of many moving obstacles in one batched Kalman step
+        
+        Args:
+            obstacles: Dictionary of obstacle ID -> ([x, y, z] position, [vx, vy, vz] velocity)
+            time_horizon: How many seconds to predict ahead
+            
+        Returns:
+            dict: Obstacle ID -> (steps, 3) array of predicted positions, 0.5 s apart
+        """
+        obstacle_ids = list(obstacles)
+        positions = np.array([obstacles[obstacle_id][0] for obstacle_id in obstacle_ids], dtype=np.float64).reshape(-1, 3)
+        velocities = np.array([obstacles[obstacle_id][1] for obstacle_id in obstacle_ids], dtype=np.float64).reshape(-1, 3)
+        
+        # Held until the rollout: an eviction in between would free and reuse rows
+        with self.obstacle_lock:
+            # Filters of obstacles that stop being reported are evicted by the
+            # obstacle lifecycle instead of kept forever
+            for obstacle_id in obstacle_ids:
+                self.obstacle_lifecycle.touch(obstacle_id)
+            self.obstacle_lifecycle.sweep()
+        
+            # New obstacles start from the reported state; known ones are predicted
+            # one step and corrected with the reported position
+            known = np.array([obstacle_id in self.obstacle_bank for obstacle_id in obstacle_ids], dtype=bool)
+            rows = self.obstacle_bank.rows(obstacle_ids, positions, velocities)
+            if known.any():
+                self.obstacle_bank.predict(rows[known])
+                self.obstacle_bank.update(rows[known], positions[known])
+        
+            # Constant-velocity rollout, 0.5 s per step
+            paths = self.obstacle_bank.rollout(rows, time_horizon, dt=0.5)
+        return dict(zip(obstacle_ids, paths))
 
     def get_current_threat_level(self):
         """Calculate the current overall threat level based on recent detections
@@ -1927,30 +1923,27 @@ def continuous_threat_assessment(self):
         current_threats = []
         
         # Use tracked objects if available
-        if hasattr(self, 'tracked_objects') and self.tracked_objects:
-            for track_id, track_data in self.tracked_objects.items():
-                if not track_data:
-                    continue
-                    
-                # Get the most recent tracking data
-                recent_track = track_data[-1] if isinstance(track_data, list) else track_data
-                
-                # Extract object type from track_id (simplified)
-                object_type = track_id.split('_')[1] if '_' in track_id else 'unknown'
-                
-                # Determine threat level based on object type
-                threat_level = self.determine_threat_level(object_type, 0.8)
-                
-                # Create threat object
-                threat = {
-                    'id': track_id,
-                    'type': object_type,
-                    'position': recent_track.get('bbox', [0, 0, 100, 100]),
-                    'threat_level': threat_level,
-                    'timestamp': datetime.now().isoformat()
-                }
-                
-                current_threats.append(threat)
+        for track_id in self.track_store.track_ids():
+            # Get the most recent tracking data
+            recent_track = self.track_store.latest(track_id)
+            if recent_track is None:
+                continue
+            
+            object_type = recent_track.get('type') or 'unknown'
+            
+            # Determine threat level based on object type
+            threat_level = self.determine_threat_level(object_type, 0.8)
+            
+            # Create threat object
+            threat = {
+                'id': track_id,
+                'type': object_type,
+                'position': recent_track.get('bbox') or [0, 0, 100, 100],
+                'threat_level': threat_level,
+                'timestamp': datetime.now().isoformat()
+            }
+            
+            current_threats.append(threat)
         
         # If no tracked objects, generate some simulated threats for testing
         if not current_threats and random.random() < 0.3:  # 30% chance of random threat
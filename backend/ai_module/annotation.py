@@ -0,0 +1,212 @@
+"""
+Annotation renderer for annotated frames (API images, MJPEG streams and the
+AdvancedMilitaryAI visualization).
+
+Text is the expensive part of annotating a frame, so labels are rendered once
+per (text, colour) into small BGR sprites with a font loaded at start-up and
+then copied onto frames with a numpy slice assignment. Parts that change
+from frame to frame, like confidences, are drawn after the label from
+per-character glyph sprites, so one label sprite serves every confidence.
+Frames are drawn on reused buffers instead of fresh copies.
+"""
+
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Tried in order; PIL's built-in bitmap font is the last resort
+FONT_CANDIDATES = (
+    'arial.ttf',
+    'DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/TTF/DejaVuSans.ttf',
+    '/Library/Fonts/Arial.ttf',
+    'C:/Windows/Fonts/arial.ttf'
+)
+
+# BGR colours per threat level (case-insensitive)
+THREAT_COLORS = {
+    'critical': (0, 0, 255),
+    'high': (0, 0, 255),
+    'medium': (0, 165, 255),
+    'low': (0, 255, 0)
+}
+DEFAULT_COLOR = (255, 255, 255)
+PREDICTION_COLOR = (255, 0, 255)
+
+# Sets the common height of all sprites, so glyphs line up with the label they follow
+LINE_REFERENCE = 'Agjy|0.9'
+LABEL_PADDING = 2
+
+
+def threat_color(threat_level):
+    return THREAT_COLORS.get(str(threat_level).lower(), DEFAULT_COLOR)
+
+
+def load_font(size=14, font_path=None):
+    """Load a TrueType font once, falling back to PIL's default font"""
+    for candidate in ((font_path,) if font_path else ()) + FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(candidate, size)
+        except (OSError, IOError):
+            continue
+    return ImageFont.load_default()
+
+
+class AnnotationRenderer:
+    """Draws boxes and cached label sprites on reused frame buffers
+
+    Args:
+        font_size: Label font size in pixels
+        font_path: Preferred TrueType font
+        buffers: Number of output buffers rotated by begin(); with two, the
+            previous annotated frame stays intact while the next is drawn
+        max_sprites: Label sprites kept in the LRU cache
+    """
+
+    def __init__(self, font_size=14, font_path=None, buffers=2, max_sprites=2048):
+        self.font = load_font(font_size, font_path)
+        self.max_sprites = max_sprites
+        self._sprites = OrderedDict()  # (text, color, padding) -> BGR sprite
+        self._lock = threading.Lock()
+        self._buffers = [None] * max(1, buffers)
+        self._next_buffer = 0
+
+        _, self._text_top, _, self._text_bottom = self.font.getbbox(LINE_REFERENCE)
+
+        self.sprite_hits = 0
+        self.sprite_misses = 0
+
+    def begin(self, frame):
+        """Copy a frame into the next reused buffer and return it for drawing"""
+        index = self._next_buffer
+        self._next_buffer = (index + 1) % len(self._buffers)
+        buffer = self._buffers[index]
+        if buffer is None or buffer.shape != frame.shape or buffer.dtype != frame.dtype:
+            buffer = self._buffers[index] = np.empty(frame.shape, dtype=frame.dtype)
+        np.copyto(buffer, frame)
+        return buffer
+
+    def sprite(self, text, color, padding=(LABEL_PADDING, LABEL_PADDING)):
+        """Label sprite: text on a filled box of the given BGR colour
+
+        Args:
+            padding: (left, right) padding in pixels; the box is always padded
+                by LABEL_PADDING above and below
+        """
+        key = (text, color, padding)
+        with self._lock:
+            sprite = self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+                self.sprite_hits += 1
+                return sprite
+            self.sprite_misses += 1
+
+        sprite = self._render_sprite(text, color, padding)
+        with self._lock:
+            self._sprites[key] = sprite
+            while len(self._sprites) > self.max_sprites:
+                self._sprites.popitem(last=False)
+        return sprite
+
+    def glyph(self, char, color):
+        """Sprite of one character without horizontal padding, to follow a label sprite"""
+        return self.sprite(char, color, padding=(0, 0))
+
+    def _render_sprite(self, text, color, padding):
+        pad_left, pad_right = padding
+        width = pad_left + int(np.ceil(self.font.getlength(text))) + pad_right
+        height = self._text_bottom - self._text_top + 2 * LABEL_PADDING
+        blue, green, red = color
+        # Dark text on bright boxes, white text on dark ones
+        luminance = 0.299 * red + 0.587 * green + 0.114 * blue
+        text_color = (0, 0, 0) if luminance > 150 else (255, 255, 255)
+
+        image = Image.new('RGB', (width, height), (red, green, blue))
+        ImageDraw.Draw(image).text((pad_left, LABEL_PADDING - self._text_top), text, font=self.font, fill=text_color)
+        sprite = np.array(image)[:, :, ::-1]
+        sprite = np.ascontiguousarray(sprite)
+        sprite.setflags(write=False)
+        return sprite
+
+    def draw_label(self, image, text, x, y, color, above=True, suffix=None):
+        """Blit a label sprite with its top-left corner at (x, y), or its bottom-left if above
+
+        A suffix (e.g. a confidence) follows the text as a run of cached glyph
+        sprites, so labels that only differ in it share one text sprite.
+        """
+        if suffix:
+            sprites = [self.sprite(text, color, padding=(LABEL_PADDING, 0))]
+            sprites.extend(self.glyph(char, color) for char in suffix)
+            sprites.append(self.sprite('', color, padding=(0, LABEL_PADDING)))
+        else:
+            sprites = [self.sprite(text, color)]
+        sprite_height = sprites[0].shape[0]
+        x = int(x)
+        y = int(y) - sprite_height if above else int(y)
+        if y < 0 and above:
+            y = 0
+        for sprite in sprites:
+            self._blit(image, sprite, x, y)
+            x += sprite.shape[1]
+        return image
+
+    @staticmethod
+    def _blit(image, sprite, x, y):
+        # Clip the sprite to the image
+        sprite_height, sprite_width = sprite.shape[:2]
+        height, width = image.shape[:2]
+        x1, y1 = max(0, x), max(0, y)
+        x2, y2 = min(width, x + sprite_width), min(height, y + sprite_height)
+        if x1 < x2 and y1 < y2:
+            image[y1:y2, x1:x2] = sprite[y1 - y:y2 - y, x1 - x:x2 - x]
+
+    @staticmethod
+    def draw_box(image, bbox, color, thickness=2):
+        x1, y1, x2, y2 = (int(v) for v in bbox[:4])
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, thickness)
+        return image
+
+    @staticmethod
+    def draw_dashed_line(image, start, end, color, thickness=1, dash=6):
+        """cv2 has no dashed line style, so draw every other segment"""
+        start = np.asarray(start, dtype=np.float32)
+        end = np.asarray(end, dtype=np.float32)
+        length = float(np.linalg.norm(end - start))
+        if length < 1.0:
+            return image
+        steps = max(1, int(length // dash))
+        points = start + (end - start) * (np.arange(steps + 1)[:, None] / steps)
+        for segment_start, segment_end in zip(points[0::2], points[1::2]):
+            cv2.line(image, tuple(int(v) for v in segment_start), tuple(int(v) for v in segment_end),
+                     color, thickness)
+        return image
+
+    def draw_detections(self, image, detections, show_confidence=True):
+        """Draw inference service detections (bbox, class_name, confidence, threat_level) in place"""
+        for detection in detections:
+            color = threat_color(detection.get('threat_level'))
+            bbox = detection['bbox']
+            self.draw_box(image, bbox, color, 2)
+            confidence = f" {detection['confidence']:.2f}" if show_confidence else None
+            self.draw_label(image, detection['class_name'], bbox[0], bbox[1], color, suffix=confidence)
+        return image
+
+    def get_stats(self):
+        return {
+            'cached_sprites': len(self._sprites),
+            'sprite_hits': self.sprite_hits,
+            'sprite_misses': self.sprite_misses
+        }
+
+
+def encode_jpeg(image, quality=90):
+    """JPEG-encode a BGR image"""
+    ok, encoded = cv2.imencode('.jpg', image, [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return encoded.tobytes()
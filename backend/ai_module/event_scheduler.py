@@ -0,0 +1,231 @@
+"""
+Event-driven scheduling for AdvancedMilitaryAI's background threat assessment.
+
+Producers (sensor updates, the tracker creating tracks) call
+``EventScheduler.notify(kind)``; the worker thread sleeps on a condition
+variable until an event arrives or the next timer is due, so an idle system
+does no work and a new event is handled immediately instead of after a
+polling sleep. Events of the same kind that arrive while the worker is busy
+or within ``coalesce_window`` of each other are merged into one run of
+their handler.
+
+Periodic work (full threat analysis, event checks, swarm sharing) runs on a
+hashed timer wheel: timers are bucketed by due tick, so scheduling and
+expiring one is O(1) no matter how many are pending.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class TimerWheel:
+    """Hashed timing wheel of one-shot timers
+
+    Args:
+        tick: Resolution in seconds; timers fire on the first tick at or after
+            their deadline
+        slots: Buckets in the wheel; timers further than slots * tick ahead
+            wait for extra rotations
+    """
+
+    def __init__(self, tick=0.05, slots=256, now=None):
+        self.tick = tick
+        self._slots = [[] for _ in range(slots)]
+        self._current = self._tick_of(time.monotonic() if now is None else now)  # last expired tick
+        self._timers = {}  # name -> (due tick, sequence) of the pending timers
+        self._sequence = 0
+
+    def _tick_of(self, now):
+        return math.floor(now / self.tick + 1e-9)
+
+    def schedule(self, name, delay, now=None):
+        """(Re)schedule timer ``name`` to fire ``delay`` seconds from now"""
+        now = time.monotonic() if now is None else now
+        due_tick = max(math.ceil((now + max(delay, 0.0)) / self.tick - 1e-9), self._current + 1)
+        self._sequence += 1
+        self._timers[name] = (due_tick, self._sequence)
+        self._slots[due_tick % len(self._slots)].append((due_tick, name, self._sequence))
+
+    def cancel(self, name):
+        # Entries left in the slots are skipped once their sequence no longer matches
+        return self._timers.pop(name, None) is not None
+
+    def advance(self, now=None):
+        """Expire every timer due by ``now``
+
+        Returns:
+            list: Names of the expired timers, earliest tick first
+        """
+        now = time.monotonic() if now is None else now
+        target = self._tick_of(now)
+        if target - self._current > len(self._slots):
+            # Asleep for more than a rotation: each slot only needs one visit
+            ticks = range(target - len(self._slots) + 1, target + 1)
+        else:
+            ticks = range(self._current + 1, target + 1)
+
+        expired = []
+        for current in ticks:
+            slot = self._slots[current % len(self._slots)]
+            if not slot:
+                continue
+            pending = []
+            for entry in slot:
+                due_tick, name, sequence = entry
+                if due_tick > target:
+                    pending.append(entry)  # a later rotation
+                elif self._timers.get(name) == (due_tick, sequence):
+                    del self._timers[name]
+                    expired.append(name)
+            slot[:] = pending
+        self._current = max(self._current, target)
+        return expired
+
+    def next_deadline(self):
+        """Time (monotonic seconds) of the earliest tick with a pending timer, or None"""
+        due_tick = min((due_tick for due_tick, _ in self._timers.values()), default=None)
+        return None if due_tick is None else due_tick * self.tick
+
+    def __contains__(self, name):
+        return name in self._timers
+
+    def __len__(self):
+        return len(self._timers)
+
+
+class EventScheduler:
+    """Runs handlers on notified events and periodic timers in one worker thread
+
+    Args:
+        coalesce_window: Seconds to keep collecting events after the first
+            one of a burst before handling them
+        tick: Timer wheel resolution in seconds
+        on_error: Called with (task name, exception) when a handler raises
+    """
+
+    def __init__(self, coalesce_window=0.02, tick=0.05, on_error=None):
+        self.coalesce_window = coalesce_window
+        self.on_error = on_error
+
+        self._condition = threading.Condition()
+        self._pending = OrderedDict()  # event kind -> time of the first unhandled notify
+        self._handlers = {}  # event kind -> callable
+        self._periodic = {}  # timer name -> (callable, interval or callable returning it)
+        self._wheel = TimerWheel(tick=tick)
+        self._running = True  # until stop(); run() returns as soon as it is cleared
+
+        # Statistics
+        self.events = {}  # kind -> notifications received
+        self.runs = {}  # event kind or timer name -> handler runs
+        self.coalesced = 0
+        self.wakeups = 0
+        self.latency_total = 0.0  # notify -> handler start, summed over runs
+        self.latency_max = 0.0
+
+    def on(self, kind, handler):
+        """Handle events of a kind"""
+        self._handlers[kind] = handler
+
+    def every(self, name, interval, handler, delay=None):
+        """Run a handler periodically
+
+        Args:
+            name: Timer name
+            interval: Seconds between runs, or a callable returning them
+                (re-evaluated after every run, for adaptive rates)
+            handler: Callable run on the worker thread
+            delay: Seconds until the first run (one interval if omitted)
+        """
+        with self._condition:
+            self._periodic[name] = (handler, interval)
+            self._wheel.schedule(name, self._interval(interval) if delay is None else delay)
+            self._condition.notify()
+
+    def defer(self, name, delay):
+        """Move a periodic timer's next run ``delay`` seconds from now"""
+        with self._condition:
+            if name in self._periodic:
+                self._wheel.schedule(name, delay)
+                self._condition.notify()
+
+    def notify(self, kind):
+        """Signal an event (thread safe, never blocks on handlers)"""
+        with self._condition:
+            self.events[kind] = self.events.get(kind, 0) + 1
+            if kind in self._pending:
+                self.coalesced += 1
+                return
+            self._pending[kind] = time.monotonic()
+            self._condition.notify()
+
+    @staticmethod
+    def _interval(interval):
+        return interval() if callable(interval) else interval
+
+    def run(self):
+        """Worker loop; returns after stop()"""
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    deadline = self._wheel.next_deadline()
+                    if deadline is not None and deadline <= time.monotonic():
+                        break
+                    self._condition.wait(None if deadline is None else deadline - time.monotonic())
+                if not self._running:
+                    return
+                self.wakeups += 1
+
+                # Let the rest of a burst arrive before handling it
+                if self._pending and self.coalesce_window:
+                    settle = next(iter(self._pending.values())) + self.coalesce_window
+                    while self._running and time.monotonic() < settle:
+                        self._condition.wait(settle - time.monotonic())
+                events, self._pending = self._pending, OrderedDict()
+                due = self._wheel.advance()
+
+            started = time.monotonic()
+            for kind, notified_at in events.items():
+                handler = self._handlers.get(kind)
+                if handler is not None:
+                    latency = started - notified_at
+                    self.latency_total += latency
+                    self.latency_max = max(self.latency_max, latency)
+                    self._call(kind, handler)
+            for name in due:
+                handler, interval = self._periodic[name]
+                self._call(name, handler)
+                with self._condition:
+                    if name not in self._wheel:  # the handler may have rescheduled itself
+                        self._wheel.schedule(name, self._interval(interval))
+
+    def _call(self, name, handler):
+        self.runs[name] = self.runs.get(name, 0) + 1
+        try:
+            handler()
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(name, e)
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+
+    @property
+    def running(self):
+        return self._running
+
+    def get_stats(self):
+        handled = sum(self.runs.get(kind, 0) for kind in self._handlers)
+        return {
+            'running': self._running,
+            'events': dict(self.events),
+            'runs': dict(self.runs),
+            'coalesced_events': self.coalesced,
+            'wakeups': self.wakeups,
+            'pending_timers': len(self._wheel),
+            'avg_event_latency_ms': self.latency_total / handled * 1000 if handled else 0.0,
+            'max_event_latency_ms': self.latency_max * 1000
+        }
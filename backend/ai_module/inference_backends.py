@@ -0,0 +1,337 @@
+"""
+Pluggable inference backends for YOLOv8 detectors.
+
+Every backend turns a list of BGR frames into one (N, 6) array per frame with
+rows of x1, y1, x2, y2, confidence, class_id in original frame coordinates, so
+callers share the same post-processing whatever runtime executes the model:
+
+- ultralytics: PyTorch .pt weights through ultralytics.YOLO
+- onnx: ONNX Runtime CPU session on an exported .onnx model
+- openvino: OpenVINO CPU runtime on an exported *_openvino_model directory or .xml
+
+The exported-model backends do their own letterboxing and NMS and never import
+torch, which keeps cold-start time and memory down on CPU-only hosts.
+"""
+
+import ast
+import logging
+import os
+
+import numpy as np
+
+from letterbox import letterbox, scale_boxes
+
+logger = logging.getLogger(__name__)
+
+BACKEND_NAMES = ('ultralytics', 'onnx', 'openvino')
+
+
+def non_max_suppression(boxes, scores, class_ids, iou_threshold=0.7, max_det=300, metric='iou'):
+    """Class-aware NMS over xyxy boxes
+
+    Args:
+        metric: 'iou' (intersection over union) or 'ios' (intersection over
+            the smaller box, which also suppresses boxes cut off at tile edges)
+
+    Returns:
+        np.ndarray: Indices of the kept boxes, highest score first
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Offset boxes per class so boxes of different classes never overlap
+    offsets = class_ids.astype(np.float32)[:, None] * (float(boxes.max()) + 1.0)
+    shifted = boxes + offsets
+    x1, y1, x2, y2 = shifted[:, 0], shifted[:, 1], shifted[:, 2], shifted[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+    while order.size > 0 and len(keep) < max_det:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        inter_w = (np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest])).clip(0)
+        inter_h = (np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest])).clip(0)
+        intersection = inter_w * inter_h
+        if metric == 'ios':
+            denominator = np.minimum(areas[best], areas[rest])
+        else:
+            denominator = areas[best] + areas[rest] - intersection
+        iou = np.where(denominator > 0, intersection / np.maximum(denominator, 1e-9), 0.0)
+        order = rest[iou <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+
+class InferenceBackend:
+    """Base class for inference backends"""
+
+    name = 'base'
+    # Whether one instance may serve concurrent calls from several threads
+    thread_safe = False
+
+    def __init__(self, model_path, imgsz=640, conf=0.25, iou=0.7, threads=None):
+        self.model_path = model_path
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.threads = threads
+        self.names = {}
+
+    def predict(self, frames, imgsz=None):
+        """Detect objects in a list of BGR frames
+
+        Returns:
+            list: One (N, 6) float32 array per frame in original coordinates
+        """
+        raise NotImplementedError
+
+    def predict_letterboxed(self, tensor):
+        """Detect objects in an (N, S, S, 3) tensor of already letterboxed frames
+
+        Boxes are returned in letterboxed (tensor) coordinates.
+        """
+        return self.predict(list(tensor), imgsz=tensor.shape[1])
+
+    def warmup(self, runs=1):
+        """Run dummy inferences so the first real request doesn't pay allocation and JIT costs"""
+        frame = np.full((self.imgsz, self.imgsz, 3), 114, dtype=np.uint8)
+        for _ in range(max(0, int(runs))):
+            self.predict([frame])
+
+    def parameter_bytes(self):
+        """Size of the model weights held in memory, if the runtime exposes it"""
+        return None
+
+    def info(self):
+        """Describe the loaded model"""
+        return {
+            'backend': self.name,
+            'model_path': self.model_path,
+            'imgsz': self.imgsz,
+            'threads': self.threads,
+            'num_classes': len(self.names)
+        }
+
+
+class UltralyticsBackend(InferenceBackend):
+    """PyTorch weights served through ultralytics.YOLO"""
+
+    name = 'ultralytics'
+
+    def __init__(self, model_path, imgsz=640, conf=0.25, iou=0.7, threads=None):
+        super().__init__(model_path, imgsz, conf, iou, threads)
+        import torch
+        from ultralytics import YOLO
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = YOLO(model_path)
+        self.names = dict(self.model.names) if isinstance(self.model.names, dict) else dict(enumerate(self.model.names))
+
+    def predict(self, frames, imgsz=None):
+        results = self.model(frames, imgsz=imgsz or self.imgsz, conf=self.conf, iou=self.iou, verbose=False)
+        arrays = []
+        for result in results:
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                arrays.append(np.empty((0, 6), dtype=np.float32))
+                continue
+            data = boxes.data
+            if hasattr(data, 'cpu'):
+                data = data.cpu().numpy()
+            arrays.append(data)
+        return arrays
+
+    def parameter_bytes(self):
+        return sum(p.numel() * p.element_size() for p in self.model.model.parameters())
+
+
+class ExportedModelBackend(InferenceBackend):
+    """Shared pre/post-processing for exported YOLOv8 graphs
+
+    Subclasses provide ``_run(batch)`` mapping an (N, 3, S, S) float32 input to
+    the raw (N, 4 + num_classes, anchors) YOLOv8 output.
+    """
+
+    # Batch size the graph accepts; None means dynamic
+    max_batch = None
+
+    def predict(self, frames, imgsz=None):
+        size = self.imgsz
+        tensor = np.empty((len(frames), size, size, 3), dtype=np.uint8)
+        metas = []
+        for slot, frame in enumerate(frames):
+            _, ratio, pad = letterbox(frame, size, out=tensor[slot])
+            metas.append((ratio, pad, frame.shape))
+
+        arrays = self.predict_letterboxed(tensor)
+        return [scale_boxes(data, ratio, pad, shape) for data, (ratio, pad, shape) in zip(arrays, metas)]
+
+    def predict_letterboxed(self, tensor):
+        if tensor.shape[1] != self.imgsz:
+            # Graph input size differs from the tensor: re-letterbox each frame
+            return self.predict(list(tensor))
+
+        # BGR HWC uint8 -> RGB CHW float32 in [0, 1]
+        batch = np.ascontiguousarray(tensor[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32)
+        batch /= 255.0
+
+        step = self.max_batch or len(batch)
+        outputs = [self._run(batch[start:start + step]) for start in range(0, len(batch), step)]
+        output = np.concatenate(outputs, axis=0) if len(outputs) > 1 else outputs[0]
+        return [self._decode(prediction) for prediction in output]
+
+    def _run(self, batch):
+        raise NotImplementedError
+
+    def _decode(self, prediction):
+        """Turn one (4 + num_classes, anchors) output into filtered, NMS'd detections"""
+        prediction = prediction.T  # (anchors, 4 + num_classes)
+        class_scores = prediction[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(class_ids)), class_ids]
+
+        mask = scores > self.conf
+        if not mask.any():
+            return np.empty((0, 6), dtype=np.float32)
+        xywh = prediction[mask, :4]
+        scores = scores[mask]
+        class_ids = class_ids[mask]
+
+        boxes = np.empty_like(xywh)
+        boxes[:, 0] = xywh[:, 0] - xywh[:, 2] / 2
+        boxes[:, 1] = xywh[:, 1] - xywh[:, 3] / 2
+        boxes[:, 2] = xywh[:, 0] + xywh[:, 2] / 2
+        boxes[:, 3] = xywh[:, 1] + xywh[:, 3] / 2
+
+        keep = non_max_suppression(boxes, scores, class_ids, self.iou)
+        return np.column_stack([boxes[keep], scores[keep], class_ids[keep]]).astype(np.float32)
+
+    @staticmethod
+    def _parse_names(raw_names):
+        """Parse the class-name metadata written by ultralytics exports"""
+        if not raw_names:
+            return {}
+        if isinstance(raw_names, str):
+            try:
+                raw_names = ast.literal_eval(raw_names)
+            except (ValueError, SyntaxError):
+                return {}
+        if isinstance(raw_names, (list, tuple)):
+            raw_names = dict(enumerate(raw_names))
+        return {int(k): v for k, v in raw_names.items()}
+
+
+class OnnxRuntimeBackend(ExportedModelBackend):
+    """Exported .onnx model on the ONNX Runtime CPU provider"""
+
+    name = 'onnx'
+    thread_safe = True  # InferenceSession.run is safe to call concurrently
+
+    def __init__(self, model_path, imgsz=640, conf=0.25, iou=0.7, threads=None):
+        super().__init__(model_path, imgsz, conf, iou, threads)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch_dim, _, height, _ = model_input.shape
+        if isinstance(height, int):
+            self.imgsz = height
+        self.max_batch = batch_dim if isinstance(batch_dim, int) else None
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = self._parse_names(metadata.get('names'))
+
+    def _run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVINOBackend(ExportedModelBackend):
+    """Exported OpenVINO IR model on the OpenVINO CPU plugin"""
+
+    name = 'openvino'
+    thread_safe = False  # each worker needs its own infer request
+
+    def __init__(self, model_path, imgsz=640, conf=0.25, iou=0.7, threads=None):
+        super().__init__(model_path, imgsz, conf, iou, threads)
+        try:
+            from openvino import Core
+        except ImportError:
+            from openvino.runtime import Core
+
+        xml_path = model_path
+        if os.path.isdir(model_path):
+            xml_files = [f for f in os.listdir(model_path) if f.endswith('.xml')]
+            if not xml_files:
+                raise FileNotFoundError(f"No OpenVINO .xml model found in {model_path}")
+            xml_path = os.path.join(model_path, xml_files[0])
+
+        core = Core()
+        model = core.read_model(xml_path)
+        config = {'INFERENCE_NUM_THREADS': threads} if threads else {}
+        self.compiled_model = core.compile_model(model, 'CPU', config)
+        self.output = self.compiled_model.output(0)
+
+        input_shape = self.compiled_model.input(0).get_partial_shape()
+        if input_shape[2].is_static:
+            self.imgsz = input_shape[2].get_length()
+        self.max_batch = input_shape[0].get_length() if input_shape[0].is_static else None
+
+        self.names = self._load_names(os.path.dirname(xml_path))
+
+    def _load_names(self, model_dir):
+        # ultralytics writes class names to metadata.yaml next to the IR files
+        metadata_path = os.path.join(model_dir, 'metadata.yaml')
+        if not os.path.exists(metadata_path):
+            return {}
+        try:
+            import yaml
+            with open(metadata_path) as f:
+                return self._parse_names(yaml.safe_load(f).get('names'))
+        except Exception as e:
+            logger.warning(f"Could not read OpenVINO metadata: {e}")
+            return {}
+
+    def _run(self, batch):
+        return self.compiled_model([batch])[self.output]
+
+
+BACKENDS = {
+    'ultralytics': UltralyticsBackend,
+    'onnx': OnnxRuntimeBackend,
+    'openvino': OpenVINOBackend
+}
+
+
+def resolve_backend_name(model_path, backend='auto'):
+    """Pick a backend from the model file when backend is 'auto'"""
+    backend = (backend or 'auto').lower()
+    if backend in ('torch', 'pytorch'):
+        backend = 'ultralytics'
+    if backend != 'auto':
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKEND_NAMES}")
+        return backend
+
+    path = model_path.rstrip('/\\')
+    if path.endswith('.onnx'):
+        return 'onnx'
+    if path.endswith('.xml') or path.endswith('_openvino_model'):
+        return 'openvino'
+    return 'ultralytics'
+
+
+def create_backend(model_path, backend='auto', threads=None, imgsz=640, conf=0.25, iou=0.7):
+    """Load a model with the requested (or auto-detected) backend"""
+    name = resolve_backend_name(model_path, backend)
+    logger.info(f"Loading {model_path} with the {name} backend (threads={threads or 'default'})")
+    return BACKENDS[name](model_path, imgsz=imgsz, conf=conf, iou=iou, threads=threads)
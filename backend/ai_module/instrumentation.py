@@ -0,0 +1,171 @@
+"""
+Per-stage latency instrumentation for hot paths.
+
+Stages are timed with the monotonic performance counter, either as a
+``with instrumentation.span('stage'):`` block or, for code that should not
+be re-indented, with ``started = instrumentation.clock()`` followed by
+``instrumentation.record_since('stage', started)``. Each stage keeps its
+last ``capacity`` durations in a ring buffer (p50/p95/p99 over that window)
+plus cumulative count and sum, exported as JSON by ``get_stats`` and as a
+Prometheus summary by ``prometheus``.
+
+Recording can be switched on and off at runtime. While disabled, ``span``
+returns a shared no-op context manager and ``clock`` returns None, so an
+instrumented call site costs one attribute check.
+
+The process-wide instance is ``instrumentation``; set AI_INSTRUMENTATION=1
+to enable it at startup.
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _prometheus_value(value):
+    return 'NaN' if value != value else repr(float(value))
+
+
+class _Span:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stage.record(time.perf_counter() - self.started)
+        return False
+
+
+class StageHistogram:
+    """Durations of one stage: the last ``capacity`` in a ring buffer, plus totals"""
+
+    def __init__(self, capacity=1024):
+        self.durations = np.zeros(capacity)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.durations[self.count % len(self.durations)] = seconds
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def window(self):
+        with self._lock:
+            return self.durations[:min(self.count, len(self.durations))].copy()
+
+    def quantiles(self, quantiles=QUANTILES):
+        """Duration quantiles (seconds) over the ring buffer, NaN before the first record"""
+        window = self.window()
+        if not len(window):
+            return [float('nan')] * len(quantiles)
+        return np.quantile(window, quantiles).tolist()
+
+
+class Instrumentation:
+    """Registry of stage histograms
+
+    Args:
+        enabled: Record from the start
+        capacity: Durations kept per stage for the quantiles
+    """
+
+    def __init__(self, enabled=False, capacity=1024):
+        self.enabled = enabled
+        self.capacity = capacity
+        self._stages = {}  # name -> StageHistogram
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        histogram = self._stages.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._stages.setdefault(name, StageHistogram(self.capacity))
+        return histogram
+
+    def span(self, name):
+        """Context manager timing its block as stage ``name`` (no-op when disabled)"""
+        if not self.enabled:
+            return NOOP_SPAN
+        return _Span(self.stage(name))
+
+    def clock(self):
+        """Start time for record_since, or None when disabled"""
+        return time.perf_counter() if self.enabled else None
+
+    def record_since(self, name, started):
+        """Record the time since a clock() reading as stage ``name``"""
+        if started is not None:
+            self.stage(name).record(time.perf_counter() - started)
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+    def get_stats(self):
+        """Per stage: count, mean, max and p50/p95/p99 over the recent window, in milliseconds"""
+        stages = {}
+        for name, histogram in sorted(self._stages.items()):
+            if not histogram.count:
+                continue
+            p50, p95, p99 = histogram.quantiles()
+            stages[name] = {
+                'count': histogram.count,
+                'mean_ms': histogram.total / histogram.count * 1000 if histogram.count else 0.0,
+                'max_ms': histogram.max * 1000,
+                'p50_ms': p50 * 1000,
+                'p95_ms': p95 * 1000,
+                'p99_ms': p99 * 1000,
+                'window': min(histogram.count, self.capacity)
+            }
+        return {'enabled': self.enabled, 'capacity': self.capacity, 'stages': stages}
+
+    def prometheus(self, metric='ai_stage_duration_seconds'):
+        """Stage durations in the Prometheus text exposition format, as a summary"""
+        lines = [
+            f'# HELP {metric} Duration of instrumented processing stages',
+            f'# TYPE {metric} summary'
+        ]
+        for name, histogram in sorted(self._stages.items()):
+            label = name.replace('\\', '\\\\').replace('"', '\\"')
+            for quantile, value in zip(QUANTILES, histogram.quantiles()):
+                lines.append(f'{metric}{{stage="{label}",quantile="{quantile}"}} {_prometheus_value(value)}')
+            lines.append(f'{metric}_sum{{stage="{label}"}} {_prometheus_value(histogram.total)}')
+            lines.append(f'{metric}_count{{stage="{label}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+instrumentation = Instrumentation(enabled=os.getenv('AI_INSTRUMENTATION', '0').lower() in ('1', 'true', 'yes'))
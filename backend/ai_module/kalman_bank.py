@@ -0,0 +1,145 @@
+"""
+Batched constant-velocity Kalman filters for many tracked obstacles.
+
+A KalmanBank keeps the states and covariances of all obstacles in stacked
+numpy arrays (one row per obstacle) instead of one filterpy KalmanFilter per
+obstacle, so predict, update and path rollout for every obstacle are a few
+array operations. State per obstacle is [position, velocity] in ``dim``
+dimensions; only positions are measured.
+
+Used by AdvancedMilitaryAI.predict_obstacle_path and by the mission
+planner's dynamic replanning.
+"""
+
+import numpy as np
+
+
+class KalmanBank:
+    """Constant-velocity Kalman filters for many objects, stepped together
+
+    Args:
+        dim: Spatial dimensions (state is 2 * dim: positions then velocities)
+        dt: Default time step of predict()
+        process_noise: Diagonal of the process noise covariance Q
+        measurement_noise: Diagonal of the measurement noise covariance R
+        initial_uncertainty: Diagonal of a new object's state covariance P
+        capacity: Rows allocated up front (doubled when full)
+    """
+
+    def __init__(self, dim=3, dt=1.0, process_noise=0.01, measurement_noise=0.1,
+                 initial_uncertainty=1000.0, capacity=64):
+        self.dim = dim
+        self.dt = dt
+        self.Q = np.eye(2 * dim) * process_noise
+        self.R = np.eye(dim) * measurement_noise
+        self.initial_uncertainty = initial_uncertainty
+
+        self._index = {}  # object id -> row
+        self._free = []
+        self.x = np.zeros((0, 2 * dim))
+        self.P = np.zeros((0, 2 * dim, 2 * dim))
+        self._grow(capacity)
+
+    def _grow(self, rows):
+        old = len(self.x)
+        x = np.zeros((rows, 2 * self.dim))
+        P = np.zeros((rows, 2 * self.dim, 2 * self.dim))
+        x[:old] = self.x
+        P[:old] = self.P
+        self.x, self.P = x, P
+        self._free.extend(range(rows - 1, old - 1, -1))
+
+    def transition(self, dt):
+        """State transition matrix F for a time step"""
+        F = np.eye(2 * self.dim)
+        F[:self.dim, self.dim:] = np.eye(self.dim) * dt
+        return F
+
+    def rows(self, ids, positions=None, velocities=None):
+        """Rows of objects, adding missing ones with the given initial state
+
+        Args:
+            ids: Object ids
+            positions, velocities: (N, dim) initial state for objects not yet
+                in the bank (zeros if omitted)
+
+        Returns:
+            np.ndarray: (N,) row indices
+        """
+        rows = np.empty(len(ids), dtype=np.int64)
+        for i, obj_id in enumerate(ids):
+            row = self._index.get(obj_id)
+            if row is None:
+                if not self._free:
+                    self._grow(2 * len(self.x))
+                row = self._index[obj_id] = self._free.pop()
+                self.x[row] = 0.0
+                if positions is not None:
+                    self.x[row, :self.dim] = positions[i]
+                if velocities is not None:
+                    self.x[row, self.dim:] = velocities[i]
+                self.P[row] = np.eye(2 * self.dim) * self.initial_uncertainty
+            rows[i] = row
+        return rows
+
+    def set_state(self, rows, positions, velocities):
+        """Overwrite positions and velocities (covariances are kept)"""
+        self.x[rows, :self.dim] = positions
+        self.x[rows, self.dim:] = velocities
+
+    def predict(self, rows=None, dt=None):
+        """Advance the given rows (all objects if None) by one time step"""
+        rows = self.all_rows() if rows is None else rows
+        F = self.transition(self.dt if dt is None else dt)
+        self.x[rows] = self.x[rows] @ F.T
+        self.P[rows] = F @ self.P[rows] @ F.T + self.Q
+
+    def update(self, rows, measurements):
+        """Correct the given rows with (N, dim) position measurements"""
+        dim = self.dim
+        x, P = self.x[rows], self.P[rows]
+        residual = np.asarray(measurements, dtype=np.float64) - x[:, :dim]
+        S = P[:, :dim, :dim] + self.R
+        # K = P H^T S^-1 with H selecting the positions; S and P are symmetric,
+        # so K^T = S^-1 (H P) is one batched solve
+        K = np.linalg.solve(S, P[:, :dim, :]).transpose(0, 2, 1)
+        self.x[rows] = x + (K @ residual[..., None])[..., 0]
+        self.P[rows] = P - K @ P[:, :dim, :]
+
+    def rollout(self, rows, time_horizon, dt=0.5):
+        """Future positions under constant velocity
+
+        Returns:
+            np.ndarray: (N, steps, dim) positions at dt, 2 dt, ... up to time_horizon
+        """
+        steps = int(time_horizon / dt)
+        offsets = np.arange(1, steps + 1) * dt
+        x = self.x[rows]
+        return x[:, None, :self.dim] + offsets[None, :, None] * x[:, None, self.dim:]
+
+    def remove(self, obj_id):
+        row = self._index.pop(obj_id, None)
+        if row is None:
+            return False
+        self._free.append(row)
+        return True
+
+    def all_rows(self):
+        return np.fromiter(self._index.values(), dtype=np.int64, count=len(self._index))
+
+    def entry_bytes(self):
+        """Memory of one object's state and covariance"""
+        return self.x[0].nbytes + self.P[0].nbytes
+
+    def __contains__(self, obj_id):
+        return obj_id in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def get_stats(self):
+        return {
+            'objects': len(self._index),
+            'allocated': len(self.x),
+            'memory_bytes': self.x.nbytes + self.P.nbytes
+        }
@@ -0,0 +1,72 @@
+"""
+Letterbox preprocessing shared by the inference service, the inference
+backends and the training tools.
+
+Frames are resized with their aspect ratio preserved and padded to a square
+model input, and detections are mapped back to original frame coordinates.
+"""
+
+import cv2
+import numpy as np
+
+PAD_COLOR = (114, 114, 114)  # YOLOv8 letterbox padding
+
+
+def letterbox(frame, size=640, out=None, color=PAD_COLOR):
+    """Resize and pad a frame into a size x size model input
+
+    Args:
+        frame: HxWx3 uint8 frame
+        size: Side of the square model input
+        out: Optional preallocated size x size x 3 array to write into
+            (e.g. one slot of a batch tensor)
+        color: Padding color
+
+    Returns:
+        tuple: (letterboxed frame, scale ratio, (pad_x, pad_y))
+    """
+    height, width = frame.shape[:2]
+    ratio = min(size / height, size / width)
+    new_width = int(round(width * ratio))
+    new_height = int(round(height * ratio))
+    pad_x = (size - new_width) // 2
+    pad_y = (size - new_height) // 2
+
+    if out is None:
+        out = np.empty((size, size, 3), dtype=np.uint8)
+
+    # Only the border needs padding; the resized frame covers the rest
+    out[:pad_y] = color
+    out[pad_y + new_height:] = color
+    out[pad_y:pad_y + new_height, :pad_x] = color
+    out[pad_y:pad_y + new_height, pad_x + new_width:] = color
+
+    if (new_width, new_height) != (width, height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    out[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = frame
+
+    return out, ratio, (pad_x, pad_y)
+
+
+def scale_boxes(boxes, ratio, pad, frame_shape):
+    """Map xyxy boxes from letterboxed coordinates back to the original frame
+
+    Args:
+        boxes: (N, >=4) array whose first four columns are x1, y1, x2, y2;
+            modified in place
+        ratio: Scale ratio returned by letterbox
+        pad: (pad_x, pad_y) returned by letterbox
+        frame_shape: Shape of the original frame
+
+    Returns:
+        The boxes array
+    """
+    if len(boxes) == 0:
+        return boxes
+    pad_x, pad_y = pad
+    boxes[:, [0, 2]] -= pad_x
+    boxes[:, [1, 3]] -= pad_y
+    boxes[:, :4] /= ratio
+    boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, frame_shape[1])
+    boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, frame_shape[0])
+    return boxes
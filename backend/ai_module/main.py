@@ -1,9 +1,10 @@
 from fastapi import FastAPI, File, UploadFile, Form, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Dict, Any
 from datetime import datetime
 import numpy as np
-from ultralytics import YOLO
 from PIL import Image
 import io
 import os
@@ -11,12 +12,16 @@ import shutil
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from database import Base, engine, SessionLocal, Detection, DetectedObject, get_db
+from model_registry import model_registry
+from instrumentation import instrumentation
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 app = FastAPI(title="Military Asset Detection AI")
 
-# Load YOLOv8 model (pretrained for demonstration)
-model = YOLO("yolov8m.pt")  # You can replace with your custom .pt file
+# YOLOv8 model (pretrained for demonstration), shared through the model registry
+# and loaded on the first request
+model = model_registry.acquire(os.getenv("MODEL_PATH", "yolov8m.pt"), lazy=True)  # You can replace with your custom .pt file
 
 # Example class mapping and threat levels (expand as needed)
 CLASS_MAP = {
@@ -82,25 +87,17 @@ async def analyze(
     image_path = os.path.join(save_dir, image_filename)
     image.save(image_path)
 
-    # Run YOLO inference
-    results = model(image)
+    # Run YOLO inference (backends take BGR frames)
+    results = model.predict([np.array(image)[:, :, ::-1]])[0]
+    yolo_names = model.names
     detected_objects = []
     db_objects = []
-    for r in results[0].boxes:
-        class_id = int(r.cls)
-        # Use model.names if available, else fallback
-        yolo_names = getattr(model, 'names', None)
-        if yolo_names is None and hasattr(model, 'model') and hasattr(model.model, 'names'):
-            yolo_names = model.model.names
-        if isinstance(yolo_names, dict):
-            yolo_class = yolo_names.get(class_id, str(class_id))
-        elif isinstance(yolo_names, list):
-            yolo_class = yolo_names[class_id] if class_id < len(yolo_names) else str(class_id)
-        else:
-            yolo_class = str(class_id)
+    for x1, y1, x2, y2, conf, cls in results.tolist():
+        class_id = int(cls)
+        yolo_class = yolo_names.get(class_id, str(class_id))
         military_type = YOLO_TO_MILITARY.get(yolo_class, yolo_class.capitalize() if yolo_class else "Unknown")
-        confidence = float(r.conf)
-        bbox = r.xyxy.tolist()[0]
+        confidence = float(conf)
+        bbox = [x1, y1, x2, y2]
         threat_level = THREAT_LEVELS.get(military_type, "Low")
         detected_objects.append(DetectedObject(
             type=military_type or "Unknown",
@@ -144,19 +141,12 @@ async def analyze(
 async def describe_image(file: UploadFile = File(...)):
     image_bytes = await file.read()
     image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    results = model(image)
+    results = model.predict([np.array(image)[:, :, ::-1]])[0]
     class_counts = {}
-    yolo_names = getattr(model, 'names', None)
-    if yolo_names is None and hasattr(model, 'model') and hasattr(model.model, 'names'):
-        yolo_names = model.model.names
-    for r in results[0].boxes:
-        class_id = int(r.cls)
-        if isinstance(yolo_names, dict):
-            class_name = yolo_names.get(class_id, str(class_id))
-        elif isinstance(yolo_names, list):
-            class_name = yolo_names[class_id] if class_id < len(yolo_names) else str(class_id)
-        else:
-            class_name = str(class_id)
+    yolo_names = model.names
+    for cls in results[:, 5].tolist():
+        class_id = int(cls)
+        class_name = yolo_names.get(class_id, str(class_id))
         class_counts[class_name] = class_counts.get(class_name, 0) + 1
     if not class_counts:
         description = "No known objects detected in the image."
@@ -190,6 +180,66 @@ async def get_detections(limit: int = 10, db: AsyncSession = Depends(get_db)):
         })
     return output
 
+@app.get("/models")
+def models():
+    """Loaded models and their memory usage"""
+    return model_registry.get_stats()
+
+def get_advanced_ai():
+    """The AdvancedMilitaryAI instance, imported on first use
+
+    Importing advanced_ai loads its models and starts the background threat
+    assessment, so it only happens once a request needs it.
+    """
+    from advanced_ai import advanced_ai
+    return advanced_ai
+
+# classify_threat_realtime is not reentrant (one detector, motion gates and
+# tracker state per instance), so every call runs on this one thread
+advanced_ai_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="advanced-ai")
+
+def classify_frame(frame, stream_id):
+    return get_advanced_ai().classify_threat_realtime(frame, stream_id=stream_id)
+
+@app.post("/assess")
+async def assess(file: UploadFile = File(...), stream_id: str = Form("default")):
+    """Real-time threat classification of a frame with AdvancedMilitaryAI
+
+    Runs classify_threat_realtime, whose stage latencies are what
+    /instrumentation and /metrics report. Concurrent requests are
+    classified one at a time.
+    """
+    image_bytes = await file.read()
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    frame = np.ascontiguousarray(np.array(image)[:, :, ::-1])  # BGR, as the camera frames are
+    loop = asyncio.get_running_loop()
+    detections = await loop.run_in_executor(advanced_ai_executor, classify_frame, frame, stream_id)
+    return jsonable_encoder(
+        {"stream_id": stream_id, "detections": detections},
+        custom_encoder={np.generic: lambda value: value.item(), np.ndarray: lambda array: array.tolist()}
+    )
+
+@app.get("/instrumentation")
+def instrumentation_stats():
+    """Per-stage latency (count, mean, max, p50/p95/p99) of instrumented hot paths"""
+    return instrumentation.get_stats()
+
+@app.post("/instrumentation")
+def configure_instrumentation(enabled: bool, reset: bool = False):
+    """Switch stage timing on or off at runtime, optionally clearing recorded stages"""
+    if reset:
+        instrumentation.reset()
+    if enabled:
+        instrumentation.enable()
+    else:
+        instrumentation.disable()
+    return instrumentation.get_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Stage latencies in the Prometheus text exposition format"""
+    return PlainTextResponse(instrumentation.prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 def health():
     return {"status": "ok"} 
\ No newline at end of file
@@ -0,0 +1,287 @@
+"""
+Process-wide registry of loaded detection models.
+
+The inference service, the detection API (main.py) and AdvancedMilitaryAI each
+need a YOLO detector; loading through the registry means a weight file is read
+once per process and shared by everyone asking for it.
+
+- Models load lazily, on the first call that actually needs them
+- Handles are reference counted; a model is freed when its last handle is released
+- ``swap`` hot-swaps a name to new weights: the replacement is loaded and
+  warmed up first, then every handle switches to it on its next call
+- ``get_stats`` reports load time and memory usage per model
+
+Replicas let callers that need separate instances of the same weights (e.g.
+inference workers on a backend that is not thread safe) share the bookkeeping:
+replica 0 is the shared instance, other replica numbers get their own copy.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from inference_backends import create_backend, resolve_backend_name
+
+logger = logging.getLogger(__name__)
+
+
+def current_rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def model_file_bytes(model_path):
+    """Size of a weight file, or of every file in an exported model directory"""
+    if os.path.isdir(model_path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, files in os.walk(model_path)
+            for name in files
+        )
+    if os.path.exists(model_path):
+        return os.path.getsize(model_path)
+    return None
+
+
+class ModelEntry:
+    """A loaded model and its bookkeeping"""
+
+    def __init__(self, model_path, backend, replica, model, load_time, rss_delta):
+        self.model_path = model_path
+        self.backend = backend
+        self.replica = replica
+        self.model = model
+        self.load_time = load_time
+        self.rss_delta = rss_delta
+        self.file_bytes = model_file_bytes(model_path)
+        self.loaded_at = time.time()
+        self.warmed_up = False
+
+    def info(self, refcount):
+        parameter_bytes = self.model.parameter_bytes()
+        return {
+            'model_path': self.model_path,
+            'backend': self.backend,
+            'replica': self.replica,
+            'refcount': refcount,
+            'warmed_up': self.warmed_up,
+            'load_time_ms': self.load_time * 1000,
+            'loaded_at': self.loaded_at,
+            'memory': {
+                'file_mb': self.file_bytes / 1e6 if self.file_bytes is not None else None,
+                'parameters_mb': parameter_bytes / 1e6 if parameter_bytes is not None else None,
+                # RSS growth while the model loaded; approximate when other threads allocate meanwhile
+                'rss_delta_mb': self.rss_delta / 1e6 if self.rss_delta is not None else None
+            }
+        }
+
+
+class ModelHandle:
+    """Reference to a registered model that follows hot swaps
+
+    Attribute access is forwarded to the current model, so a handle can be used
+    wherever a backend is expected (``handle.predict(frames)``, ``handle.names``).
+    The model is loaded on first use if it was acquired lazily.
+    """
+
+    def __init__(self, registry, name, replica=0):
+        self._registry = registry
+        self.key = name
+        self.replica = replica
+        self._released = False
+
+    @property
+    def model(self):
+        if self._released:
+            raise RuntimeError(f"Model handle for '{self.key}' has been released")
+        return self._registry.get(self.key, self.replica)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._registry.release(self.key, self.replica)
+
+    def __getattr__(self, attr):
+        return getattr(self.model, attr)
+
+    def __repr__(self):
+        return f"ModelHandle(key={self.key!r}, replica={self.replica})"
+
+
+class ModelRegistry:
+    def __init__(self, backend='auto', threads=None):
+        self.default_backend = backend
+        self.threads = threads
+        self._lock = threading.RLock()
+        # Loads are serialized so per-model RSS deltas are meaningful
+        self._load_lock = threading.Lock()
+        self._aliases = {}  # name -> (model_path, backend)
+        self._entries = {}  # (model_path, backend, replica) -> ModelEntry
+        self._refs = {}  # (name, replica) -> handle count
+
+    def configure(self, backend=None, threads=None):
+        """Set the defaults used for models loaded from now on"""
+        if backend is not None:
+            self.default_backend = backend
+        if threads is not None:
+            self.threads = threads
+
+    def register(self, name, model_path, backend=None):
+        """Point a name at a weight file without loading it"""
+        with self._lock:
+            self._aliases[name] = (model_path, resolve_backend_name(model_path, backend or self.default_backend))
+
+    def _resolve(self, name, backend=None):
+        with self._lock:
+            if name not in self._aliases:
+                # Unregistered names are weight paths
+                self.register(name, name, backend)
+            return self._aliases[name]
+
+    def _entry_key(self, name, replica):
+        model_path, backend = self._resolve(name)
+        return (model_path, backend, replica)
+
+    def _load(self, key):
+        model_path, backend, replica = key
+        with self._load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                return entry
+
+            rss_before = current_rss_bytes()
+            start_time = time.perf_counter()
+            model = create_backend(model_path, backend, threads=self.threads)
+            load_time = time.perf_counter() - start_time
+            rss_after = current_rss_bytes()
+            rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+
+            entry = ModelEntry(model_path, backend, replica, model, load_time, rss_delta)
+            with self._lock:
+                self._entries[key] = entry
+            logger.info(f"Loaded {model_path} ({backend}, replica {replica}) in {load_time * 1000:.0f} ms")
+            return entry
+
+    def get(self, name, replica=0, backend=None):
+        """Return the model for a name, loading it on first use"""
+        self._resolve(name, backend)
+        key = self._entry_key(name, replica)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            entry = self._load(key)
+        return entry.model
+
+    def acquire(self, name, replica=0, backend=None, lazy=False, warmup_runs=0):
+        """Take a reference to a model
+
+        Args:
+            name: Registered name or weight path
+            replica: 0 for the shared instance, other numbers for private copies
+            backend: Backend for unregistered paths (defaults to the registry default)
+            lazy: Defer loading until the handle is first used
+            warmup_runs: Dummy inferences to run after loading (ignored when lazy)
+
+        Returns:
+            ModelHandle: Release it when done so the model can be freed
+        """
+        self._resolve(name, backend)
+        with self._lock:
+            self._refs[(name, replica)] = self._refs.get((name, replica), 0) + 1
+        handle = ModelHandle(self, name, replica)
+        if not lazy:
+            self.get(name, replica)
+            if warmup_runs:
+                self.warmup(name, replica, warmup_runs)
+        return handle
+
+    def release(self, name, replica=0):
+        """Drop a reference; the model is freed once nothing refers to it"""
+        with self._lock:
+            ref_key = (name, replica)
+            count = self._refs.get(ref_key, 0) - 1
+            if count > 0:
+                self._refs[ref_key] = count
+                return
+            self._refs.pop(ref_key, None)
+            self._unload_if_unused(self._entry_key(name, replica))
+
+    def _refcount(self, key):
+        return sum(
+            count for (name, replica), count in self._refs.items()
+            if self._entry_key(name, replica) == key
+        )
+
+    def _unload_if_unused(self, key):
+        if key in self._entries and self._refcount(key) == 0:
+            del self._entries[key]
+            logger.info(f"Unloaded {key[0]} ({key[1]}, replica {key[2]})")
+
+    def warmup(self, name, replica=0, runs=1):
+        """Run dummy inferences on a model, loading it first if needed"""
+        model = self.get(name, replica)
+        start_time = time.perf_counter()
+        model.warmup(runs)
+        with self._lock:
+            entry = self._entries.get(self._entry_key(name, replica))
+            if entry is not None:
+                entry.warmed_up = True
+        logger.info(f"Warmed up {name} (replica {replica}) with {runs} run(s) in "
+                    f"{(time.perf_counter() - start_time) * 1000:.0f} ms")
+
+    def swap(self, name, model_path, backend=None, warmup_runs=1):
+        """Hot-swap a name to new weights
+
+        Every replica currently loaded for the name is loaded from the new
+        weights (and warmed up) before handles switch over, so callers never
+        see a cold or half-loaded model. Calls already running on the old model
+        finish on it; the old model is freed when no other name uses it.
+        """
+        new_backend = resolve_backend_name(model_path, backend or self.default_backend)
+        with self._lock:
+            old_path, old_backend = self._resolve(name)
+            replicas = sorted(
+                replica for (path, entry_backend, replica) in self._entries
+                if (path, entry_backend) == (old_path, old_backend)
+                and self._refs.get((name, replica))
+            ) or [0]
+
+        for replica in replicas:
+            entry = self._load((model_path, new_backend, replica))
+            if warmup_runs:
+                entry.model.warmup(warmup_runs)
+                entry.warmed_up = True
+
+        with self._lock:
+            old_keys = [(old_path, old_backend, replica) for replica in replicas]
+            self._aliases[name] = (model_path, new_backend)
+            for key in old_keys:
+                self._unload_if_unused(key)
+        logger.info(f"Swapped '{name}' from {old_path} to {model_path}")
+
+    def loaded(self, name, replica=0):
+        """Whether a model is currently in memory"""
+        with self._lock:
+            return self._entry_key(name, replica) in self._entries
+
+    def get_stats(self):
+        """Per-model load and memory statistics"""
+        with self._lock:
+            models = [entry.info(self._refcount(key)) for key, entry in self._entries.items()]
+            return {
+                'names': {name: {'model_path': path, 'backend': backend}
+                          for name, (path, backend) in self._aliases.items()},
+                'models': models,
+                'loaded_models': len(models),
+                'process_rss_mb': (current_rss_bytes() or 0) / 1e6
+            }
+
+
+# Shared by every module in the process
+model_registry = ModelRegistry()
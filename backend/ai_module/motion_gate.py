@@ -0,0 +1,203 @@
+"""
+Motion gating for per-stream detection.
+
+A loitering drone or a static camera sees the same scene for long stretches,
+and running the detector on every frame mostly re-finds the same objects. A
+MotionGate compares each frame against the scene the last detections were
+computed on (cheap downscaled frame differencing or MOG2 background
+subtraction) and decides what the detector has to do:
+
+- ``full``: run on the whole frame (first frame, large change, periodic refresh)
+- ``reuse``: nothing changed, keep the previous detections
+- ``regions``: run only on the padded bounding boxes of the changed areas
+"""
+
+import cv2
+import numpy as np
+
+FULL = 'full'
+REUSE = 'reuse'
+REGIONS = 'regions'
+
+
+class MotionDecision:
+    def __init__(self, action, regions=None, changed_fraction=0.0):
+        self.action = action
+        # [x1, y1, x2, y2] integer boxes in frame coordinates (REGIONS only)
+        self.regions = regions or []
+        self.changed_fraction = changed_fraction
+
+    def __repr__(self):
+        return f"MotionDecision({self.action}, regions={len(self.regions)}, changed={self.changed_fraction:.4f})"
+
+
+def merge_boxes(boxes):
+    """Merge overlapping [x1, y1, x2, y2] boxes until none overlap"""
+    boxes = [list(box) for box in boxes]
+    merged = True
+    while merged and len(boxes) > 1:
+        merged = False
+        result = []
+        while boxes:
+            box = boxes.pop()
+            i = 0
+            while i < len(boxes):
+                other = boxes[i]
+                if box[0] <= other[2] and other[0] <= box[2] and box[1] <= other[3] and other[1] <= box[3]:
+                    box = [min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3])]
+                    boxes.pop(i)
+                    merged = True
+                else:
+                    i += 1
+            result.append(box)
+        boxes = result
+    return boxes
+
+
+class MotionGate:
+    """Decides, frame by frame, how much of a stream needs detection
+
+    Args:
+        method: 'diff' (frame differencing against the last detected scene)
+            or 'mog2' (OpenCV MOG2 background subtraction)
+        analysis_width: Width frames are downscaled to before comparing
+        pixel_threshold: Grey-level difference that counts as change ('diff')
+        min_changed_fraction: Changed area below this is treated as noise
+        full_frame_fraction: Changed area above this runs full detection
+        max_regions: More changed regions than this runs full detection
+        region_padding: Context added around each changed region, as a
+            fraction of its size (plus min_region_size / 4 pixels)
+        min_region_size: Smallest side of a region sent to the detector
+        refresh_interval: Run full detection at least every N frames
+    """
+
+    def __init__(self, method='diff', analysis_width=320, pixel_threshold=25,
+                 min_changed_fraction=0.001, full_frame_fraction=0.3, max_regions=4,
+                 region_padding=0.5, min_region_size=96, refresh_interval=30):
+        if method not in ('diff', 'mog2'):
+            raise ValueError(f"Unknown motion gating method '{method}', expected 'diff' or 'mog2'")
+        self.method = method
+        self.analysis_width = analysis_width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.full_frame_fraction = full_frame_fraction
+        self.max_regions = max_regions
+        self.region_padding = region_padding
+        self.min_region_size = min_region_size
+        self.refresh_interval = refresh_interval
+
+        self.reference = None  # downscaled grey scene the current detections describe
+        self.frame_shape = None
+        self.frames_since_full = 0
+        self.subtractor = None
+        self._pending = None  # (downscaled frame, scale) awaiting commit_regions
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+        self.decisions = {FULL: 0, REUSE: 0, REGIONS: 0}
+
+    def reset(self):
+        self.reference = None
+        self.subtractor = None
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.analysis_width / width)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if scale < 1.0:
+            gray = cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(gray, (5, 5), 0), scale
+
+    def _change_mask(self, small):
+        if self.method == 'mog2':
+            if self.subtractor is None:
+                self.subtractor = cv2.createBackgroundSubtractorMOG2(history=200, detectShadows=False)
+            mask = self.subtractor.apply(small)
+        else:
+            diff = cv2.absdiff(small, self.reference)
+            _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel)
+        return cv2.dilate(mask, self._kernel, iterations=2)
+
+    def _full(self, small, changed_fraction=1.0):
+        self.reference = small
+        self.frames_since_full = 0
+        self.decisions[FULL] += 1
+        return MotionDecision(FULL, changed_fraction=changed_fraction)
+
+    def update(self, frame):
+        """Decide what detection a new frame needs
+
+        Call commit_regions() after detecting on the returned regions so the
+        reference scene reflects them.
+        """
+        small, scale = self._prepare(frame)
+        self.frames_since_full += 1
+
+        if self.reference is None or frame.shape != self.frame_shape:
+            self.frame_shape = frame.shape
+            if self.method == 'mog2':
+                self._change_mask(small)  # seed the background model
+            return self._full(small)
+
+        if self.frames_since_full >= self.refresh_interval:
+            if self.method == 'mog2':
+                self._change_mask(small)
+            return self._full(small)
+
+        mask = self._change_mask(small)
+        changed_fraction = cv2.countNonZero(mask) / mask.size
+        if changed_fraction < self.min_changed_fraction:
+            self.decisions[REUSE] += 1
+            return MotionDecision(REUSE, changed_fraction=changed_fraction)
+        if changed_fraction > self.full_frame_fraction:
+            return self._full(small, changed_fraction)
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        height, width = frame.shape[:2]
+        regions = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            regions.append(self._pad([x / scale, y / scale, (x + w) / scale, (y + h) / scale], width, height))
+        regions = merge_boxes(regions)
+
+        region_area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        if len(regions) > self.max_regions or region_area > self.full_frame_fraction * width * height:
+            return self._full(small, changed_fraction)
+
+        self._pending = (small, scale)
+        self.decisions[REGIONS] += 1
+        return MotionDecision(REGIONS, regions, changed_fraction)
+
+    def _pad(self, box, width, height):
+        x1, y1, x2, y2 = box
+        pad_x = (x2 - x1) * self.region_padding + self.min_region_size / 4
+        pad_y = (y2 - y1) * self.region_padding + self.min_region_size / 4
+        x1, y1, x2, y2 = x1 - pad_x, y1 - pad_y, x2 + pad_x, y2 + pad_y
+
+        # Grow small regions to the minimum size the detector sees reliably
+        grow_x = max(0.0, self.min_region_size - (x2 - x1)) / 2
+        grow_y = max(0.0, self.min_region_size - (y2 - y1)) / 2
+        return [
+            int(max(0, x1 - grow_x)), int(max(0, y1 - grow_y)),
+            int(min(width, np.ceil(x2 + grow_x))), int(min(height, np.ceil(y2 + grow_y)))
+        ]
+
+    def commit_regions(self, regions):
+        """Fold the re-detected regions of the last frame into the reference scene"""
+        if self._pending is None or self.reference is None:
+            return
+        small, scale = self._pending
+        for x1, y1, x2, y2 in regions:
+            sx1, sy1 = int(x1 * scale), int(y1 * scale)
+            sx2, sy2 = int(np.ceil(x2 * scale)), int(np.ceil(y2 * scale))
+            self.reference[sy1:sy2, sx1:sx2] = small[sy1:sy2, sx1:sx2]
+        self._pending = None
+
+    def get_stats(self):
+        total = sum(self.decisions.values())
+        return {
+            'method': self.method,
+            'frames': total,
+            'decisions': dict(self.decisions),
+            'detector_skip_rate': self.decisions[REUSE] / total if total else 0.0
+        }
@@ -0,0 +1,230 @@
+"""
+Spatial index for neighbour queries over tracked objects.
+
+SpatialGrid buckets 2-D points into square cells and is updated
+incrementally: a point only changes bucket when it crosses a cell border, so
+keeping it current every frame costs O(moved points). Radius queries only
+visit the cells the radius can reach, which makes pairwise neighbour
+searches (formation detection) roughly linear in the number of objects
+instead of quadratic.
+"""
+
+import math
+from collections import defaultdict
+
+import numpy as np
+
+
+class SpatialGrid:
+    """Uniform grid over 2-D points keyed by object id
+
+    Args:
+        cell_size: Side of a grid cell, in the points' units; queries are
+            cheapest with radii up to about one cell
+    """
+
+    def __init__(self, cell_size=100.0):
+        self.cell_size = float(cell_size)
+        self._cells = defaultdict(set)  # (column, row) -> ids
+        self._points = {}  # id -> (x, y, cell)
+        self.moves = 0
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def update(self, ids, positions):
+        """Insert or move points; positions are (N, 2) x, y"""
+        for obj_id, (x, y) in zip(ids, np.asarray(positions, dtype=np.float64).reshape(-1, 2).tolist()):
+            cell = self._cell(x, y)
+            previous = self._points.get(obj_id)
+            if previous is None or previous[2] != cell:
+                if previous is not None:
+                    self._discard(obj_id, previous[2])
+                self._cells[cell].add(obj_id)
+                self.moves += 1
+            self._points[obj_id] = (x, y, cell)
+
+    def _discard(self, obj_id, cell):
+        members = self._cells[cell]
+        members.discard(obj_id)
+        if not members:
+            del self._cells[cell]
+
+    def remove(self, obj_id):
+        point = self._points.pop(obj_id, None)
+        if point is None:
+            return False
+        self._discard(obj_id, point[2])
+        return True
+
+    def position(self, obj_id):
+        point = self._points.get(obj_id)
+        return None if point is None else point[:2]
+
+    def neighbors(self, obj_id, radius):
+        """Ids within radius of a stored point (excluding itself)"""
+        x, y, (column, row) = self._points[obj_id]
+        reach = math.ceil(radius / self.cell_size)
+        radius_sq = radius * radius
+        found = []
+        for dc in range(-reach, reach + 1):
+            for dr in range(-reach, reach + 1):
+                for other in self._cells.get((column + dc, row + dr), ()):
+                    if other == obj_id:
+                        continue
+                    ox, oy, _ = self._points[other]
+                    if (ox - x) ** 2 + (oy - y) ** 2 <= radius_sq:
+                        found.append(other)
+        return found
+
+    def pairs_within(self, radius, ids=None):
+        """All pairs of points at most radius apart
+
+        Points are sorted by cell, and for each cell offset in half of the
+        neighbourhood the candidate partners of every point are one
+        contiguous run of that order, found with searchsorted; candidates are
+        then filtered by distance in one array operation.
+
+        Args:
+            radius: Distance threshold
+            ids: Optional set restricting the search to these ids
+
+        Returns:
+            list: (id_a, id_b) pairs, each pair once
+        """
+        keys = list(self._points) if ids is None else [obj_id for obj_id in self._points if obj_id in ids]
+        if len(keys) < 2:
+            return []
+        points = np.array([self._points[obj_id][:2] for obj_id in keys], dtype=np.float64)
+        cells = np.array([self._points[obj_id][2] for obj_id in keys], dtype=np.int64)
+
+        reach = math.ceil(radius / self.cell_size)
+        cells -= cells.min(axis=0)
+        stride = int(cells[:, 1].max()) + 2 * reach + 1
+        cell_keys = cells[:, 0] * stride + cells[:, 1]
+        order = np.argsort(cell_keys, kind='stable')
+        sorted_keys = cell_keys[order]
+        radius_sq = radius * radius
+
+        first, second = [], []
+        # (0, 0) plus half of the other offsets, so every pair of cells is visited once
+        offsets = [(dc, dr) for dc in range(-reach, reach + 1) for dr in range(-reach, reach + 1)
+                   if (dc, dr) >= (0, 0)]
+        for dc, dr in offsets:
+            target = cell_keys + dc * stride + dr
+            lo = np.searchsorted(sorted_keys, target, side='left')
+            counts = np.searchsorted(sorted_keys, target, side='right') - lo
+            total = int(counts.sum())
+            if not total:
+                continue
+            a = np.repeat(np.arange(len(keys)), counts)
+            run_start = np.repeat(np.cumsum(counts) - counts, counts)
+            b = order[np.repeat(lo, counts) + np.arange(total) - run_start]
+            if (dc, dr) == (0, 0):
+                keep = a < b
+                a, b = a[keep], b[keep]
+            close = ((points[a] - points[b]) ** 2).sum(axis=1) <= radius_sq
+            first.append(a[close])
+            second.append(b[close])
+
+        first = np.concatenate(first).tolist() if first else []
+        second = np.concatenate(second).tolist() if second else []
+        return [(keys[a], keys[b]) for a, b in zip(first, second)]
+
+    def clusters(self, radius, ids=None, min_size=2):
+        """Groups of points connected by chains of neighbours within radius
+
+        Equivalent to DBSCAN with eps=radius and min_samples=2.
+
+        Returns:
+            list: Lists of ids, one per group of at least min_size points
+        """
+        parent = {}
+
+        def find(obj_id):
+            root = obj_id
+            while parent[root] != root:
+                root = parent[root]
+            while obj_id != root:  # path compression
+                parent[obj_id], obj_id = root, parent[obj_id]
+            return root
+
+        for a, b in self.pairs_within(radius, ids):
+            parent.setdefault(a, a)
+            parent.setdefault(b, b)
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+        groups = defaultdict(list)
+        for obj_id in parent:
+            groups[find(obj_id)].append(obj_id)
+        return [group for group in groups.values() if len(group) >= min_size]
+
+    def __contains__(self, obj_id):
+        return obj_id in self._points
+
+    def __len__(self):
+        return len(self._points)
+
+    def get_stats(self):
+        return {
+            'points': len(self._points),
+            'occupied_cells': len(self._cells),
+            'cell_size': self.cell_size,
+            'cell_moves': self.moves
+        }
+
+
+def alignment_groups(ids, velocities, max_angle=30.0, min_speed=0.5):
+    """Groups of objects moving in the same direction
+
+    Groups are formed greedily in input order: each moving object not yet
+    grouped collects every other ungrouped moving object within max_angle of
+    its own direction. Directions are sorted by heading, so an object's
+    candidates are one angular window found with searchsorted rather than a
+    row of an all-pairs cosine matrix; the exact cosine test is then applied
+    to the window only.
+
+    Args:
+        ids: Object ids
+        velocities: (N, 2) velocity vectors
+        max_angle: Largest direction difference (degrees) within a group
+        min_speed: Slower objects are treated as stationary and never grouped
+
+    Returns:
+        list: Lists of ids, each with at least two objects
+    """
+    velocities = np.asarray(velocities, dtype=np.float64).reshape(-1, 2)
+    if len(velocities) < 2:
+        return []
+    speeds = np.hypot(velocities[:, 0], velocities[:, 1])
+    moving = np.flatnonzero(speeds >= min_speed)
+    if len(moving) < 2:
+        return []
+    directions = velocities[moving] / speeds[moving, None]
+    min_cos = np.cos(np.radians(max_angle))
+
+    # Headings sorted and wrapped once around, so every window is contiguous
+    headings = np.arctan2(directions[:, 1], directions[:, 0])
+    order = np.argsort(headings, kind='stable')
+    sorted_headings = np.concatenate([headings[order] - 2 * np.pi, headings[order], headings[order] + 2 * np.pi])
+    wrapped = np.concatenate([order, order, order])
+    margin = np.radians(max_angle) + 1e-6  # the window is a superset; the cosine test decides
+
+    lo = np.searchsorted(sorted_headings, headings - margin, side='left')
+    hi = np.searchsorted(sorted_headings, headings + margin, side='right')
+
+    groups = []
+    available = np.ones(len(moving), dtype=bool)
+    for i in range(len(moving)):
+        if not available[i]:
+            continue
+        candidates = np.unique(wrapped[lo[i]:hi[i]])
+        candidates = candidates[available[candidates] & (candidates != i)]
+        candidates = candidates[directions[candidates] @ directions[i] > min_cos]
+        if len(candidates):
+            members = np.concatenate([[i], candidates])
+            groups.append([ids[j] for j in moving[members].tolist()])
+            available[members] = False
+    return groups
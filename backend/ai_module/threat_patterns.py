@@ -0,0 +1,115 @@
+"""
+Incremental per-type threat statistics over a window of threat history.
+
+ThreatPatternStats is fed each threat assessment as it is appended to the
+threat history and keeps, per threat type, the running count, the number of
+escalations (a threat whose level is higher than the previous one of its
+type) and the sum of threat levels. Entries older than the window are
+evicted the same way, so reading the patterns costs O(threat types) however
+long the window is, instead of a re-scan and sort of the whole history.
+"""
+
+from collections import deque
+
+THREAT_LEVEL_VALUES = {'LOW': 0, 'MEDIUM': 1, 'HIGH': 2}
+
+
+class _TypeStats:
+    __slots__ = ('levels', 'timestamps', 'escalations', 'level_sum')
+
+    def __init__(self):
+        self.levels = deque()  # level values, oldest first
+        self.timestamps = deque()
+        self.escalations = 0  # consecutive pairs in levels where the level went up
+        self.level_sum = 0
+
+
+class ThreatPatternStats:
+    """Running threat pattern statistics over the last ``window`` assessments
+
+    Args:
+        window: Threat history entries (assessments) kept in the statistics
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._entries = deque()  # per entry: the threat types it added, in order
+        self._types = {}  # threat type -> _TypeStats
+        self.evicted_entries = 0
+
+    @classmethod
+    def from_history(cls, historical_data, window=None):
+        """Statistics of a threat history list in one pass"""
+        stats = cls(window=window if window is not None else max(len(historical_data), 1))
+        for history in historical_data:
+            stats.add(history.get('threats', []), history.get('timestamp', 0))
+        return stats
+
+    def add(self, threats, timestamp):
+        """Append one assessment's threats, evicting the oldest beyond the window"""
+        added = []
+        for threat in threats:
+            threat_type = threat.get('type', 'unknown')
+            stats = self._types.get(threat_type)
+            if stats is None:
+                stats = self._types[threat_type] = _TypeStats()
+            level = THREAT_LEVEL_VALUES.get(threat.get('threat_level', 'LOW'), 0)
+            if stats.levels and level > stats.levels[-1]:
+                stats.escalations += 1
+            stats.levels.append(level)
+            stats.timestamps.append(timestamp)
+            stats.level_sum += level
+            added.append(threat_type)
+        self._entries.append(added)
+
+        while len(self._entries) > self.window:
+            self._evict()
+
+    def _evict(self):
+        for threat_type in self._entries.popleft():
+            stats = self._types[threat_type]
+            level = stats.levels.popleft()
+            stats.timestamps.popleft()
+            stats.level_sum -= level
+            if stats.levels and stats.levels[0] > level:
+                stats.escalations -= 1
+            if not stats.levels:
+                del self._types[threat_type]
+        self.evicted_entries += 1
+
+    def pattern(self, threat_type):
+        """Pattern of one threat type, or None with fewer than 2 threats in the window"""
+        stats = self._types.get(threat_type)
+        if stats is None or len(stats.levels) < 2:
+            return None
+        count = len(stats.levels)
+        return {
+            'count': count,
+            # How often threats of this type escalate
+            'escalation_rate': stats.escalations / (count - 1),
+            # Number of detections as a proxy for how long threats of this type last
+            'persistence': min(1.0, count / 10),
+            'avg_threat_level': stats.level_sum / count,
+            'last_seen': stats.timestamps[-1]
+        }
+
+    def patterns(self):
+        """Patterns of every threat type with at least 2 threats in the window"""
+        patterns = {}
+        for threat_type in self._types:
+            pattern = self.pattern(threat_type)
+            if pattern is not None:
+                patterns[threat_type] = pattern
+        return patterns
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_stats(self):
+        return {
+            'entries': len(self._entries),
+            'window': self.window,
+            'threat_types': len(self._types),
+            'threats': sum(len(stats.levels) for stats in self._types.values()),
+            'evicted_entries': self.evicted_entries
+        }
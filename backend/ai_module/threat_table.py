@@ -0,0 +1,256 @@
+"""
+Compiled threat scoring for AdvancedMilitaryAI.determine_threat_level.
+
+A threat score is a class base score scaled by confidence, then by source,
+behavior and movement-pattern multipliers, then adjusted by contextual rules
+(time of day, mission, environment) and capped at 1.0. ThreatTable memoizes
+the multipliers of each (class, source, behavior, pattern) combination and
+compiles the contextual rules of each class into a short list of steps for
+the current context, recompiled only when the context changes. Scores are
+computed with the same operations in the same order as the rules are
+written, so the levels are exactly those of the uncompiled rules.
+
+``ThreatTable.levels`` scores a whole frame of detections with numpy.
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Military-specific threat classification
+HIGH_THREAT_CLASSES = frozenset(['tank', 'military_vehicle', 'armed_person', 'missile', 'aircraft', 'drone', 'weapon'])
+MEDIUM_THREAT_CLASSES = frozenset(['person', 'vehicle', 'truck', 'boat', 'helicopter'])
+LOW_THREAT_CLASSES = frozenset(['civilian', 'animal', 'bicycle', 'car'])
+UNKNOWN_CLASS_SCORE = 0.2  # Unknown classes get a moderate-low score
+
+SOURCE_MULTIPLIERS = {
+    'visual': 1.0,
+    'thermal': 1.2,  # Thermal detections are more significant
+    'radar': 1.1,    # Radar detections are also more significant
+    'lidar': 1.0,
+    'acoustic': 0.9   # Acoustic detections are less reliable
+}
+
+BEHAVIOR_MULTIPLIERS = {
+    'stationary': 0.8,
+    'moving': 1.0,
+    'approaching': 1.3,
+    'fleeing': 1.1,
+    'circling': 1.2,
+    'erratic': 1.4,
+    'aggressive': 1.6
+}
+
+PATTERN_MULTIPLIERS = {
+    'linear': 1.0,
+    'random': 0.9,
+    'circular': 1.1,
+    'zigzag': 1.3,  # Evasive movement
+    'coordinated': 1.5  # Coordinated with other objects
+}
+
+HIGH_THRESHOLD = 0.7
+MEDIUM_THRESHOLD = 0.4
+LEVELS = ('LOW', 'MEDIUM', 'HIGH')
+
+
+def class_score(class_name):
+    if class_name in HIGH_THREAT_CLASSES:
+        return 0.7
+    if class_name in MEDIUM_THREAT_CLASSES:
+        return 0.4
+    if class_name in LOW_THREAT_CLASSES:
+        return 0.1
+    return UNKNOWN_CLASS_SCORE
+
+
+def contextual_steps(class_name, night_time, mission_context, environment_context):
+    """Contextual rules of a class in a context, as (multiplier, floor) steps
+
+    A step either multiplies the score (floor None) or raises it to at least
+    the floor (multiplier 1.0), applied in order.
+    """
+    steps = []
+    if class_name == 'person':
+        # Person at night is more suspicious
+        if night_time:
+            steps.append((1.2, None))
+        # In high-security missions, unknown persons are higher threats
+        if mission_context in ['high_security', 'restricted_area']:
+            steps.append((1.3, None))
+
+    elif class_name == 'vehicle':
+        # Vehicles at night in certain contexts are more suspicious
+        if night_time and mission_context in ['border_patrol', 'high_security']:
+            steps.append((1.3, None))
+
+    elif class_name == 'drone':
+        # Enemy drones are always high threat in any context
+        steps.append((1.0, 0.7))
+        # In no-fly zones, any drone is high threat
+        if mission_context in ['no_fly_zone', 'restricted_airspace']:
+            steps.append((1.0, 0.8))
+
+    elif class_name == 'aircraft':
+        # Low-flying aircraft in restricted areas are higher threat
+        if mission_context in ['restricted_airspace', 'high_security']:
+            steps.append((1.4, None))
+
+    # In urban environments, reduce threat level of common objects
+    if environment_context == 'urban' and class_name in ['person', 'car', 'bicycle']:
+        steps.append((0.8, None))
+    # In military zones, increase threat level of all objects
+    elif environment_context == 'military_zone':
+        steps.append((1.2, None))
+    # In border areas, increase threat level of vehicles and groups
+    elif environment_context == 'border' and class_name in ['vehicle', 'truck', 'group']:
+        steps.append((1.3, None))
+
+    return tuple(steps)
+
+
+class ThreatTable:
+    """Memoized threat scoring
+
+    Args:
+        max_entries: Memoized (class, source, behavior, pattern) combinations
+            kept before the memo is reset
+        clock_check_interval: Longest time (seconds) the night-time flag is
+            reused without reading the wall clock
+    """
+
+    def __init__(self, max_entries=4096, clock_check_interval=60.0):
+        self.max_entries = max_entries
+        self.clock_check_interval = clock_check_interval
+        self._factors = {}  # (class, source, behavior, pattern) -> multipliers
+        self._steps = {}  # (context, class) -> contextual steps
+        self._context = (False, 'idle', None)  # (night time, mission, environment)
+        self._night_time = False
+        self._clock_expires = 0.0
+        self.context_changes = 0
+
+    def night_time(self):
+        """Whether it is night (before 06:00 or after 20:59), read from the clock at most once per hour or interval"""
+        now = time.monotonic()
+        if now >= self._clock_expires:
+            current = datetime.now()
+            self._night_time = current.hour < 6 or current.hour > 20
+            next_hour = current.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            self._clock_expires = now + min((next_hour - current).total_seconds(), self.clock_check_interval)
+        return self._night_time
+
+    def set_context(self, night_time, mission_context, environment_context):
+        """Switch the context the contextual rules are compiled for"""
+        context = (night_time, mission_context, environment_context)
+        if context != self._context:
+            self._context = context
+            self._steps = {}
+            self.context_changes += 1
+
+    def factors(self, class_name, source='visual', behavior=None, movement_pattern=None):
+        """(class score, source, behavior, pattern multipliers) of a combination"""
+        key = (class_name, source, behavior, movement_pattern)
+        factors = self._factors.get(key)
+        if factors is None:
+            if len(self._factors) >= self.max_entries:
+                self._factors = {}
+            factors = self._factors[key] = (
+                class_score(class_name),
+                SOURCE_MULTIPLIERS.get(source, 1.0),
+                1.0 if behavior is None else BEHAVIOR_MULTIPLIERS.get(behavior, 1.0),
+                1.0 if movement_pattern is None else PATTERN_MULTIPLIERS.get(movement_pattern, 1.0)
+            )
+        return factors
+
+    def steps(self, class_name):
+        """Contextual steps of a class in the current context"""
+        context = self._context
+        steps = self._steps.get((context, class_name))
+        if steps is None:
+            steps = self._steps[(context, class_name)] = contextual_steps(class_name, *context)
+        return steps
+
+    def apply_context(self, class_name, base_score):
+        """Contextual adjustments and the 1.0 cap on a score"""
+        for multiplier, floor in self.steps(class_name):
+            base_score = base_score * multiplier if floor is None else max(base_score, floor)
+        return min(1.0, base_score)
+
+    def score(self, class_name, confidence, source='visual', behavior=None, movement_pattern=None):
+        base, source_multiplier, behavior_multiplier, pattern_multiplier = self.factors(
+            class_name, source, behavior, movement_pattern
+        )
+        # Scale by confidence, but maintain at least 50% of base score
+        threat_score = base * (0.5 + 0.5 * min(1.0, confidence))
+        threat_score *= source_multiplier
+        threat_score *= behavior_multiplier
+        threat_score *= pattern_multiplier
+        return self.apply_context(class_name, threat_score)
+
+    def level(self, class_name, confidence, source='visual', behavior=None, movement_pattern=None):
+        threat_score = self.score(class_name, confidence, source, behavior, movement_pattern)
+        if threat_score >= HIGH_THRESHOLD:
+            return 'HIGH'
+        elif threat_score >= MEDIUM_THRESHOLD:
+            return 'MEDIUM'
+        return 'LOW'
+
+    def scores(self, class_names, confidences, sources='visual', behaviors=None, movement_patterns=None):
+        """Scores of many detections at once
+
+        Args:
+            class_names: Detected classes
+            confidences: Detection confidences
+            sources, behaviors, movement_patterns: One value for all
+                detections or a sequence with one per detection
+
+        Returns:
+            np.ndarray: (N,) threat scores
+        """
+        count = len(class_names)
+        if not count:
+            return np.zeros(0)
+        sources = [sources] * count if sources is None or isinstance(sources, str) else sources
+        behaviors = [behaviors] * count if behaviors is None or isinstance(behaviors, str) else behaviors
+        patterns = [movement_patterns] * count if movement_patterns is None or isinstance(movement_patterns, str) \
+            else movement_patterns
+
+        factors = np.array([self.factors(*key) for key in zip(class_names, sources, behaviors, patterns)])
+        confidences = np.minimum(1.0, np.asarray(confidences, dtype=np.float64))
+        scores = factors[:, 0] * (0.5 + 0.5 * confidences)
+        scores *= factors[:, 1]
+        scores *= factors[:, 2]
+        scores *= factors[:, 3]
+
+        # Contextual steps, padded to the longest with no-op steps
+        steps = [self.steps(class_name) for class_name in class_names]
+        for k in range(max(len(class_steps) for class_steps in steps)):
+            multipliers = np.ones(count)
+            floors = np.full(count, -np.inf)
+            for i, class_steps in enumerate(steps):
+                if k < len(class_steps):
+                    multiplier, floor = class_steps[k]
+                    multipliers[i] = multiplier
+                    if floor is not None:
+                        floors[i] = floor
+            scores = np.maximum(scores * multipliers, floors)
+        return np.minimum(1.0, scores)
+
+    def levels(self, class_names, confidences, sources='visual', behaviors=None, movement_patterns=None):
+        """Threat levels of many detections at once (see scores)"""
+        scores = self.scores(class_names, confidences, sources, behaviors, movement_patterns)
+        indices = (scores >= MEDIUM_THRESHOLD).astype(np.int64) + (scores >= HIGH_THRESHOLD)
+        return [LEVELS[index] for index in indices.tolist()]
+
+    def get_stats(self):
+        return {
+            'memoized_combinations': len(self._factors),
+            'compiled_context_rules': len(self._steps),
+            'context': {
+                'night_time': self._context[0],
+                'mission': self._context[1],
+                'environment': self._context[2]
+            },
+            'context_changes': self.context_changes
+        }
@@ -0,0 +1,136 @@
+"""
+Tiled inference for high-resolution drone imagery.
+
+Feeding a 4K aerial frame to YOLOv8 at 640px shrinks small targets to a few
+pixels. Tiled inference cuts the frame into overlapping tiles at (close to)
+native resolution, runs all tiles as one batch, shifts the boxes back to frame
+coordinates and merges duplicates from the overlaps with cross-tile NMS.
+"""
+
+import numpy as np
+
+from inference_backends import non_max_suppression
+
+MAX_TILES = 64  # guards against tiny tile sizes on huge frames
+
+
+def tile_grid(width, height, tile_size=640, overlap=0.2):
+    """Overlapping tiles covering a frame
+
+    Tiles are tile_size x tile_size (smaller only when the frame is); the last
+    row and column are shifted inwards to end exactly at the frame edge.
+
+    Returns:
+        list: [x1, y1, x2, y2] integer tile boxes
+    """
+    if tile_size <= 0:
+        raise ValueError("tile_size must be positive")
+    if not 0.0 <= overlap < 1.0:
+        raise ValueError("tile overlap must be in [0, 1)")
+
+    stride = max(1, int(tile_size * (1.0 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+
+    return [
+        [x, y, min(x + tile_size, width), min(y + tile_size, height)]
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+
+def plan_tiles(width, height, tile_size=640, overlap=0.2, max_tiles=MAX_TILES):
+    """Tile grid for a frame, rejecting tilings with too many tiles
+
+    Raises ValueError for invalid tile parameters.
+    """
+    tiles = tile_grid(width, height, tile_size, overlap)
+    if len(tiles) > max_tiles:
+        raise ValueError(
+            f"{len(tiles)} tiles of {tile_size}px needed for a {width}x{height} frame "
+            f"(limit {max_tiles}); use a larger tile_size"
+        )
+    return tiles
+
+
+def tiled_predict(model, frame, tile_size=640, overlap=0.2, iou_threshold=0.5,
+                  include_full_frame=True, max_tiles=MAX_TILES):
+    """Detect objects in a frame tile by tile
+
+    Args:
+        model: Inference backend (``predict(frames)`` returning (N, 6) arrays)
+        frame: HxWx3 BGR frame
+        tile_size: Side of the square tiles, in frame pixels
+        overlap: Fraction of a tile shared with its neighbours
+        iou_threshold: Overlap (intersection over the smaller box) above which
+            boxes of the same class from different tiles are merged
+        include_full_frame: Also run the downscaled full frame in the same
+            batch, so objects larger than a tile are still found whole
+        max_tiles: Upper bound on tiles per frame
+
+    Returns:
+        np.ndarray: (N, 6) x1, y1, x2, y2, confidence, class_id in frame coordinates
+    """
+    tiles, crops = tile_crops(frame, tile_size, overlap, include_full_frame, max_tiles)
+    # One forward pass over every tile
+    return merge_tiles(tiles, model.predict(crops), iou_threshold)
+
+
+def tile_crops(frame, tile_size=640, overlap=0.2, include_full_frame=True, max_tiles=MAX_TILES):
+    """Tiles of a frame and their crops (views), for detection by any batching
+
+    With include_full_frame (and more than one tile) the whole frame is the
+    last crop. Raises ValueError for invalid tile parameters.
+
+    Returns:
+        tuple: ([x1, y1, x2, y2] tile boxes, crops)
+    """
+    height, width = frame.shape[:2]
+    tiles = plan_tiles(width, height, tile_size, overlap, max_tiles)
+    if len(tiles) == 1:
+        return tiles, [frame]
+
+    crops = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+    if include_full_frame:
+        crops.append(frame)
+        tiles = tiles + [[0, 0, width, height]]
+    return tiles, crops
+
+
+def merge_tiles(tiles, arrays, iou_threshold=0.5):
+    """Detections of the crops from tile_crops merged into frame coordinates
+
+    Args:
+        tiles: Tile boxes from tile_crops
+        arrays: (N, 6) detections of each crop, in crop coordinates
+        iou_threshold: See tiled_predict
+
+    Returns:
+        np.ndarray: (N, 6) x1, y1, x2, y2, confidence, class_id in frame coordinates
+    """
+    if len(tiles) == 1:
+        return arrays[0]
+
+    shifted = []
+    for (x1, y1, _, _), data in zip(tiles, arrays):
+        if len(data) == 0:
+            continue
+        data = np.array(data, dtype=np.float32, copy=True)
+        data[:, [0, 2]] += x1
+        data[:, [1, 3]] += y1
+        shifted.append(data)
+    if not shifted:
+        return np.empty((0, 6), dtype=np.float32)
+
+    detections = np.concatenate(shifted, axis=0)
+    # Intersection over the smaller box also merges partial boxes cut at tile edges
+    keep = non_max_suppression(
+        detections[:, :4], detections[:, 4], detections[:, 5].astype(np.int64),
+        iou_threshold, max_det=1000, metric='ios'
+    )
+    return detections[keep]
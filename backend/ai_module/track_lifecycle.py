@@ -0,0 +1,138 @@
+"""
+Lifecycle management for per-track state in AdvancedMilitaryAI.
+
+Track state is spread over several structures (track store ring buffers,
+Kalman filters, active track dicts). TrackLifecycle records when each id was
+last seen and evicts it from every registered structure together: when the
+tracker drops it, when it has not been seen for ``ttl`` seconds, or, least
+recently seen first, when there are more than ``max_tracks`` ids or their
+estimated memory exceeds ``max_memory_bytes``.
+
+One lifecycle covers one id space: structures keyed by different kinds of
+ids (tracks, obstacles) are registered with separate lifecycles, so equal
+ids of different kinds are never confused and each kind has its own caps.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+LOST = 'lost'
+TTL = 'ttl'
+CAPACITY = 'capacity'
+MEMORY = 'memory'
+
+
+def array_bytes(obj):
+    """Bytes held by the numpy arrays among an object's attributes (e.g. a KalmanFilter)"""
+    return sum(value.nbytes for value in vars(obj).values() if isinstance(value, np.ndarray))
+
+
+class TrackLifecycle:
+    """Evicts per-track state from every registered structure
+
+    Args:
+        ttl: Seconds without an observation after which an id is evicted
+        max_tracks: Ids kept at most; the least recently seen are evicted first
+        max_memory_bytes: Cap on the estimated memory of all registered state
+        memory_check_interval: Seconds between memory estimates, which visit every id
+        lock: Reentrant lock held while evicting, shared with the registered
+            structures' readers (a new one if omitted)
+    """
+
+    def __init__(self, ttl=300.0, max_tracks=2000, max_memory_bytes=64 * 1024 * 1024,
+                 memory_check_interval=1.0, lock=None):
+        self.ttl = ttl
+        self.max_tracks = max_tracks
+        self.max_memory_bytes = max_memory_bytes
+        self.memory_check_interval = memory_check_interval
+
+        self._last_seen = OrderedDict()  # id -> monotonic time, least recently seen first
+        self._structures = OrderedDict()  # name -> (remove(id), size(id) or None)
+        self._lock = lock if lock is not None else threading.RLock()
+        self._last_memory_check = 0.0
+        self.estimated_memory_bytes = 0
+
+        self.evictions = {LOST: 0, TTL: 0, CAPACITY: 0, MEMORY: 0}
+
+    def register(self, name, remove, size=None):
+        """Add a structure holding per-id state
+
+        Args:
+            name: Structure name (for stats)
+            remove: Callable dropping an id's state; missing ids must be ignored
+            size: Optional callable estimating the bytes an id holds in the structure
+        """
+        self._structures[name] = (remove, size)
+
+    def touch(self, key, now=None):
+        """Record that an id was just seen"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._last_seen[key] = now
+            self._last_seen.move_to_end(key)
+
+    def forget(self, key, reason=LOST):
+        """Drop an id from every registered structure"""
+        with self._lock:
+            self._last_seen.pop(key, None)
+            for remove, _ in self._structures.values():
+                remove(key)
+            self.evictions[reason] += 1
+
+    def entry_bytes(self, key):
+        return sum(size(key) for _, size in self._structures.values() if size is not None)
+
+    def sweep(self, now=None):
+        """Evict expired ids, then the least recently seen beyond the caps
+
+        Returns:
+            int: Number of ids evicted
+        """
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        with self._lock:
+            # Oldest first, so expired ids are all at the front
+            while self._last_seen:
+                key, last_seen = next(iter(self._last_seen.items()))
+                if now - last_seen <= self.ttl:
+                    break
+                self.forget(key, TTL)
+                evicted += 1
+
+            while len(self._last_seen) > self.max_tracks:
+                self.forget(next(iter(self._last_seen)), CAPACITY)
+                evicted += 1
+
+            if now - self._last_memory_check >= self.memory_check_interval:
+                self._last_memory_check = now
+                sizes = OrderedDict((key, self.entry_bytes(key)) for key in self._last_seen)
+                total = sum(sizes.values())
+                for key, size in sizes.items():
+                    if total <= self.max_memory_bytes:
+                        break
+                    self.forget(key, MEMORY)
+                    total -= size
+                    evicted += 1
+                self.estimated_memory_bytes = total
+        return evicted
+
+    def __contains__(self, key):
+        return key in self._last_seen
+
+    def __len__(self):
+        return len(self._last_seen)
+
+    def get_stats(self):
+        return {
+            'tracked_ids': len(self._last_seen),
+            'structures': list(self._structures),
+            'evictions': dict(self.evictions),
+            'total_evictions': sum(self.evictions.values()),
+            'estimated_memory_bytes': self.estimated_memory_bytes,
+            'ttl': self.ttl,
+            'max_tracks': self.max_tracks,
+            'max_memory_bytes': self.max_memory_bytes
+        }
@@ -0,0 +1,354 @@
+"""
+Array-backed track history for AdvancedMilitaryAI.
+
+Every track owns one row of a set of preallocated numpy ring buffers
+(timestamps, bbox, position, velocity, confidence, class id), so recording an
+observation is a handful of array writes instead of a new dict plus a list
+re-slice, and behaviour queries read contiguous arrays. Missing values (a
+radar track without a box, a visual track without a position) are NaN.
+
+Every method holds the store's lock, so the tracker can record observations
+while the background threat assessment reads. A reader that filters ids and
+then reads them (length() then recent_centers()) holds ``lock`` around both.
+"""
+
+import threading
+
+import numpy as np
+
+
+class TrackWindow:
+    """Chronological slice of one track's history, oldest first
+
+    Supports len(), slicing (another TrackWindow) and indexing/iteration
+    (history entries as dicts), so it can stand in for the old list of dicts.
+    """
+
+    __slots__ = ('timestamps', 'bbox', 'position', 'velocity', 'confidence', 'class_id', 'class_names')
+
+    def __init__(self, timestamps, bbox, position, velocity, confidence, class_id, class_names):
+        self.timestamps = timestamps
+        self.bbox = bbox
+        self.position = position
+        self.velocity = velocity
+        self.confidence = confidence
+        self.class_id = class_id
+        self.class_names = class_names
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Build a window from a list of history dicts (bbox/position/timestamp/...)"""
+        class_names = []
+        class_ids = np.full(len(entries), -1, dtype=np.int32)
+        for i, entry in enumerate(entries):
+            name = entry.get('type')
+            if name is not None:
+                if name not in class_names:
+                    class_names.append(name)
+                class_ids[i] = class_names.index(name)
+
+        timestamps = np.array([entry.get('timestamp', np.nan) for entry in entries], dtype=np.float64)
+        confidence = np.array([entry.get('confidence') if entry.get('confidence') is not None else np.nan
+                               for entry in entries], dtype=np.float32)
+        return cls(
+            timestamps,
+            pad_rows([entry.get('bbox') for entry in entries], 4),
+            pad_rows([entry.get('position') for entry in entries], 3),
+            pad_rows([entry.get('velocity') for entry in entries], 3),
+            confidence, class_ids, class_names
+        )
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def _slice(self, index):
+        return TrackWindow(self.timestamps[index], self.bbox[index], self.position[index],
+                           self.velocity[index], self.confidence[index], self.class_id[index],
+                           self.class_names)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._slice(index)
+        return self.entry(index)
+
+    def __iter__(self):
+        return (self.entry(i) for i in range(len(self)))
+
+    def entry(self, index):
+        """One observation as a history dict (None for missing values)"""
+        def value(array):
+            row = array[index]
+            row = row[~np.isnan(row)]  # planar positions have no z
+            return row.tolist() if len(row) else None
+
+        class_id = int(self.class_id[index])
+        confidence = float(self.confidence[index])
+        return {
+            'timestamp': float(self.timestamps[index]),
+            'bbox': value(self.bbox),
+            'position': value(self.position),
+            'velocity': value(self.velocity),
+            'confidence': None if np.isnan(confidence) else confidence,
+            'type': self.class_names[class_id] if class_id >= 0 else None
+        }
+
+    def centers(self, use_position=False):
+        """(N, 2) box centres; rows without a box are NaN, or the position's x, y if use_position"""
+        centers = (self.bbox[:, :2] + self.bbox[:, 2:]) / 2
+        if use_position:
+            missing = np.isnan(centers).any(axis=1)
+            centers[missing] = self.position[missing, :2]
+        return centers
+
+
+class TrackStore:
+    """Ring-buffered observation history for many tracks
+
+    Args:
+        capacity: Observations kept per track; older ones are overwritten
+        initial_tracks: Track rows allocated up front (doubled when full)
+        lock: Reentrant lock to share with other per-track state (a new one if omitted)
+    """
+
+    def __init__(self, capacity=100, initial_tracks=32, lock=None):
+        self.capacity = capacity
+        self.lock = lock if lock is not None else threading.RLock()
+        self._rows = {}  # track_id -> row
+        self._free_rows = []
+        self._class_ids = {}  # class name -> class id
+        self.class_names = []
+        self._latest = {}  # track_id -> threat_level/source of the last observation
+        self._allocated = 0
+        self._grow(initial_tracks)
+
+    def _grow(self, rows):
+        old = self._allocated
+        shapes = {
+            'timestamps': ((), np.float64),
+            'bbox': ((4,), np.float32),
+            'position': ((3,), np.float64),
+            'velocity': ((3,), np.float32),
+            'confidence': ((), np.float32),
+            'class_id': ((), np.int32)
+        }
+        for name, (tail, dtype) in shapes.items():
+            fill = -1 if dtype == np.int32 else np.nan
+            array = np.full((rows, self.capacity) + tail, fill, dtype=dtype)
+            if old:
+                array[:old] = getattr(self, name)
+            setattr(self, name, array)
+        heads = np.zeros(rows, dtype=np.int64)
+        counts = np.zeros(rows, dtype=np.int64)
+        if old:
+            heads[:old] = self.heads
+            counts[:old] = self.counts
+        self.heads, self.counts = heads, counts
+        self._free_rows.extend(range(rows - 1, old - 1, -1))
+        self._allocated = rows
+
+    def _row(self, track_id):
+        row = self._rows.get(track_id)
+        if row is None:
+            if not self._free_rows:
+                self._grow(self._allocated * 2)
+            row = self._free_rows.pop()
+            self._rows[track_id] = row
+            self.heads[row] = 0
+            self.counts[row] = 0
+        return row
+
+    def _class_id_of(self, class_name):
+        if class_name is None:
+            return -1
+        class_id = self._class_ids.get(class_name)
+        if class_id is None:
+            class_id = self._class_ids[class_name] = len(self.class_names)
+            self.class_names.append(class_name)
+        return class_id
+
+    def append(self, track_id, timestamp, bbox=None, position=None, velocity=None, confidence=None,
+               class_name=None, threat_level=None, source=None):
+        """Record one observation of a track"""
+        self.extend(timestamp, [track_id], [bbox], [position], [velocity], [confidence],
+                    [class_name], [threat_level], [source])
+
+    def extend(self, timestamp, track_ids, bboxes, positions=None, velocities=None, confidences=None,
+               class_names=None, threat_levels=None, sources=None):
+        """Record one observation for each of several tracks with one write per buffer
+
+        Per-track value lists are aligned with track_ids; None entries (or a
+        None list) mean the value is missing.
+        """
+        with self.lock:
+            count = len(track_ids)
+            if not count:
+                return
+            missing = [None] * count
+            rows = np.fromiter((self._row(track_id) for track_id in track_ids), dtype=np.int64, count=count)
+            slots = self.heads[rows]
+
+            self.timestamps[rows, slots] = timestamp
+            self.bbox[rows, slots] = pad_rows(bboxes, 4)
+            self.position[rows, slots] = pad_rows(positions or missing, 3)
+            self.velocity[rows, slots] = pad_rows(velocities or missing, 3)
+            self.confidence[rows, slots] = [np.nan if value is None else value for value in confidences or missing]
+            self.class_id[rows, slots] = [self._class_id_of(name) for name in class_names or missing]
+            self.heads[rows] = (slots + 1) % self.capacity
+            self.counts[rows] = np.minimum(self.counts[rows] + 1, self.capacity)
+            for track_id, threat_level, source in zip(track_ids, threat_levels or missing, sources or missing):
+                self._latest[track_id] = {'threat_level': threat_level, 'source': source}
+
+    def window(self, track_id, max_length=None):
+        """Most recent observations of a track as a TrackWindow (None for unknown tracks)"""
+        with self.lock:
+            row = self._rows.get(track_id)
+            if row is None:
+                return None
+            count = int(self.counts[row])
+            if max_length is not None:
+                count = min(count, max_length)
+            index = (self.heads[row] - count + np.arange(count)) % self.capacity
+            return TrackWindow(
+                self.timestamps[row, index], self.bbox[row, index], self.position[row, index],
+                self.velocity[row, index], self.confidence[row, index], self.class_id[row, index],
+                self.class_names
+            )
+
+    def recent_centers(self, track_ids, length, use_position=False):
+        """Last `length` box centres of several tracks at once
+
+        Missing observations (and slots before a short track's first one) are
+        NaN and moved to the front, so each row's valid centres are contiguous,
+        oldest first, and end at the last column.
+
+        Returns:
+            tuple: ((T, length, 2) centres, (T, length) timestamps)
+        """
+        with self.lock:
+            rows = np.fromiter((self._rows[track_id] for track_id in track_ids), dtype=np.int64,
+                               count=len(track_ids))
+            offsets = np.arange(-length, 0)
+            index = (self.heads[rows, None] + offsets) % self.capacity
+            bbox = self.bbox[rows[:, None], index].astype(np.float64)
+            centers = (bbox[..., :2] + bbox[..., 2:]) / 2
+            if use_position:
+                no_box = np.isnan(centers).any(axis=-1)
+                centers[no_box] = self.position[rows[:, None], index][no_box][:, :2]
+            timestamps = self.timestamps[rows[:, None], index]
+
+            missing = np.isnan(centers).any(axis=-1) | (offsets < -self.counts[rows, None])
+            centers[missing] = np.nan
+            timestamps[missing] = np.nan
+            order = np.argsort(~missing, axis=1, kind='stable')
+            return np.take_along_axis(centers, order[..., None], axis=1), np.take_along_axis(timestamps, order, axis=1)
+
+    def latest(self, track_id):
+        """Last observation of a track as a history dict, with its threat level and source"""
+        with self.lock:
+            window = self.window(track_id, 1)
+            if not window:
+                return None
+            entry = window.entry(0)
+            entry.update(self._latest.get(track_id, {}))
+            return entry
+
+    def length(self, track_id):
+        with self.lock:
+            row = self._rows.get(track_id)
+            return 0 if row is None else int(self.counts[row])
+
+    def remove(self, track_id):
+        with self.lock:
+            row = self._rows.pop(track_id, None)
+            if row is None:
+                return False
+            self._latest.pop(track_id, None)
+            self.counts[row] = 0
+            self._free_rows.append(row)
+            return True
+
+    def track_ids(self):
+        with self.lock:
+            return list(self._rows)
+
+    def __contains__(self, track_id):
+        with self.lock:
+            return track_id in self._rows
+
+    def __len__(self):
+        with self.lock:
+            return len(self._rows)
+
+    def memory_bytes(self):
+        with self.lock:
+            return sum(getattr(self, name).nbytes for name in
+                       ('timestamps', 'bbox', 'position', 'velocity', 'confidence', 'class_id', 'heads', 'counts'))
+
+    def row_bytes(self):
+        """Buffer memory held by one track"""
+        with self.lock:
+            return self.memory_bytes() // self._allocated
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'tracks': len(self._rows),
+                'allocated_tracks': self._allocated,
+                'capacity_per_track': self.capacity,
+                'memory_bytes': self.memory_bytes()
+            }
+
+
+def pad_rows(values, width):
+    """List of sequences (or None) -> (N, width) float array, NaN where missing"""
+    if all(value is None for value in values):
+        return np.full((len(values), width), np.nan)
+    try:
+        rows = np.asarray(values, dtype=np.float64)
+        if rows.shape == (len(values), width):
+            return rows
+    except (TypeError, ValueError):
+        pass  # ragged, or some values missing
+    rows = np.full((len(values), width), np.nan)
+    for i, value in enumerate(values):
+        if value is not None:
+            value = list(value)[:width]
+            rows[i, :len(value)] = value
+    return rows
+
+
+def movement_statistics(centers):
+    """Speed and turning statistics of (T, L, 2) centre sequences
+
+    NaN centres are ignored; each row's valid centres must be contiguous (as
+    returned by TrackStore.recent_centers). Turns between consecutive steps
+    where either step is zero are left out.
+
+    Returns:
+        dict of (T,) arrays: points, avg_speed, max_speed, max_acceleration,
+        avg_direction_change, max_direction_change (degrees)
+    """
+    steps = np.diff(centers, axis=1)
+    speeds = np.hypot(steps[..., 0], steps[..., 1])
+    valid = ~np.isnan(speeds)
+    step_counts = valid.sum(axis=1)
+    speeds_or_zero = np.where(valid, speeds, 0.0)
+
+    accelerations = np.abs(np.diff(speeds, axis=1))
+    accelerations = np.where(np.isnan(accelerations), 0.0, accelerations)
+
+    magnitudes = speeds_or_zero[:, :-1] * speeds_or_zero[:, 1:]
+    turning = magnitudes > 0
+    dots = (steps[:, :-1] * steps[:, 1:]).sum(axis=-1)
+    cos_angles = np.where(turning, dots / np.where(turning, magnitudes, 1.0), 1.0)
+    angles = np.where(turning, np.degrees(np.arccos(np.clip(cos_angles, -1.0, 1.0))), 0.0)
+    turn_counts = turning.sum(axis=1)
+
+    return {
+        'points': (~np.isnan(centers).any(axis=-1)).sum(axis=1),
+        'avg_speed': speeds_or_zero.sum(axis=1) / np.maximum(step_counts, 1),
+        'max_speed': speeds_or_zero.max(axis=1, initial=0.0),
+        'max_acceleration': accelerations.max(axis=1, initial=0.0),
+        'avg_direction_change': angles.sum(axis=1) / np.maximum(turn_counts, 1),
+        'max_direction_change': angles.max(axis=1, initial=0.0)
+    }
@@ -0,0 +1,132 @@
+"""
+Track-to-detection association for multi-object tracking.
+
+IoU between every track and every detection is computed as one numpy
+matrix, pairs below the IoU gate are ruled out, and the remaining pairs are
+matched with an optimal (Hungarian) assignment, so the result no longer
+depends on the order tracks are visited in.
+
+For the Kalman tracker mode each track also carries a constant-velocity
+filter over its box (SORT-style state: centre, area and aspect ratio plus
+their velocities), so tracks are matched at the position they are predicted
+to be at in the new frame rather than where they were last seen.
+"""
+
+import numpy as np
+from filterpy.kalman import KalmanFilter
+from scipy.optimize import linear_sum_assignment
+
+# Cost given to gated-out pairs; anything above 1 - min_iou is never accepted
+INFEASIBLE = 1e6
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU of two sets of xyxy boxes
+
+    Args:
+        boxes_a: (N, 4) array
+        boxes_b: (M, 4) array
+
+    Returns:
+        np.ndarray: (N, M) IoU values in [0, 1]
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+
+    inter_w = (np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2]) -
+               np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])).clip(0)
+    inter_h = (np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3]) -
+               np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])).clip(0)
+    intersection = inter_w * inter_h
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+def assign(cost, gate):
+    """Optimal assignment on a cost matrix, keeping only pairs with cost below gate
+
+    Returns:
+        tuple: (matches as (row, col) array, unmatched rows, unmatched cols)
+    """
+    rows, cols = cost.shape
+    if rows == 0 or cols == 0:
+        return np.empty((0, 2), dtype=np.int64), np.arange(rows), np.arange(cols)
+
+    feasible = cost < gate
+    # Rows and columns without any feasible pair can't match; leave them out of the solve
+    candidate_rows = np.flatnonzero(feasible.any(axis=1))
+    candidate_cols = np.flatnonzero(feasible.any(axis=0))
+    matches = np.empty((0, 2), dtype=np.int64)
+    if len(candidate_rows) and len(candidate_cols):
+        sub_cost = np.where(feasible, cost, INFEASIBLE)[np.ix_(candidate_rows, candidate_cols)]
+        row_idx, col_idx = linear_sum_assignment(sub_cost)
+        accepted = sub_cost[row_idx, col_idx] < gate
+        matches = np.column_stack([candidate_rows[row_idx[accepted]], candidate_cols[col_idx[accepted]]])
+
+    unmatched_rows = np.setdiff1d(np.arange(rows), matches[:, 0])
+    unmatched_cols = np.setdiff1d(np.arange(cols), matches[:, 1])
+    return matches, unmatched_rows, unmatched_cols
+
+
+def associate(track_boxes, detection_boxes, min_iou=0.3):
+    """Match tracks to detections by IoU
+
+    Pairs overlapping by min_iou or less are gated out; the rest are matched
+    to maximize total IoU.
+
+    Returns:
+        tuple: (matches as (track index, detection index) array,
+                unmatched track indices, unmatched detection indices)
+    """
+    iou = iou_matrix(track_boxes, detection_boxes)
+    return assign(1.0 - iou, 1.0 - min_iou)
+
+
+def box_to_measurement(bbox):
+    """[x1, y1, x2, y2] -> [cx, cy, area, aspect ratio] column vector"""
+    x1, y1, x2, y2 = (float(v) for v in bbox[:4])
+    width, height = max(x2 - x1, 1e-6), max(y2 - y1, 1e-6)
+    return np.array([[x1 + width / 2], [y1 + height / 2], [width * height], [width / height]])
+
+
+def state_to_box(state):
+    """Kalman state (cx, cy, area, aspect ratio, ...) -> [x1, y1, x2, y2]"""
+    cx, cy, area, ratio = (float(v) for v in np.ravel(state)[:4])
+    width = float(np.sqrt(max(area, 0.0) * max(ratio, 1e-6)))
+    height = area / width if width > 0 else 0.0
+    return [cx - width / 2, cy - height / 2, cx + width / 2, cy + height / 2]
+
+
+def create_box_filter(bbox):
+    """Constant-velocity Kalman filter over a box, one step per frame
+
+    State: [cx, cy, area, aspect ratio, vx, vy, v_area]; the aspect ratio is
+    assumed constant. Noise settings follow SORT.
+    """
+    kf = KalmanFilter(dim_x=7, dim_z=4)
+    kf.F = np.eye(7)
+    kf.F[0, 4] = kf.F[1, 5] = kf.F[2, 6] = 1.0
+    kf.H = np.eye(4, 7)
+    kf.R[2:, 2:] *= 10.0
+    kf.P[4:, 4:] *= 1000.0  # velocities are unknown at first
+    kf.P *= 10.0
+    kf.Q[-1, -1] *= 0.01
+    kf.Q[4:, 4:] *= 0.01
+    kf.x[:4] = box_to_measurement(bbox)
+    return kf
+
+
+def predict_box(kf):
+    """Advance a box filter by one frame and return the predicted box"""
+    if kf.x[2, 0] + kf.x[6, 0] <= 0:
+        kf.x[6, 0] = 0.0  # don't let the area shrink below zero
+    kf.predict()
+    return state_to_box(kf.x)
+
+
+def update_box(kf, bbox):
+    """Correct a box filter with a matched detection"""
+    kf.update(box_to_measurement(bbox))
@@ -14,6 +14,9 @@ import numpy as np
 from sklearn.model_selection import train_test_split
 import json
 import logging
+import random
+
+from letterbox import letterbox
 
 # Configure logging
 logging.basicConfig(
@@ -216,6 +219,174 @@ class MilitaryModelTrainer:
         self.logger.info(f"Model exported to: {export_path}")
         return export_path
     
+    def load_calibration_images(self, calibration_size=200, images_dir='datasets/military_assets/images/train'):
+        """Sample training images for INT8 calibration"""
+        image_extensions = {'.jpg', '.jpeg', '.png', '.bmp'}
+        images = sorted(p for p in Path(images_dir).glob('*') if p.suffix.lower() in image_extensions)
+        if not images:
+            return []
+        
+        # Fixed seed so repeated quantization runs calibrate on the same sample
+        return random.Random(42).sample(images, min(calibration_size, len(images)))
+    
+    def quantize_model(self, model_path=None, calibration_size=200, max_map50_drop=0.02, exclude_head=True):
+        """Export an INT8 quantized ONNX model calibrated on training images
+        
+        The FP32 model is exported to ONNX, statically quantized with ONNX Runtime
+        (QDQ format, per-channel weights) using a sample of the training set for
+        activation ranges, and both models are validated to compare mAP50.
+        
+        Args:
+            model_path: Trained .pt weights (defaults to best.pt)
+            calibration_size: Number of training images used for calibration
+            max_map50_drop: Largest acceptable absolute mAP50 drop versus FP32
+            exclude_head: Keep the detection head in FP32, which preserves box
+                regression accuracy at a small speed cost
+            
+        Returns:
+            dict: Accuracy report, or None if quantization could not run
+        """
+        if model_path is None:
+            model_path = f"{self.config['output_path']}/military_detector/weights/best.pt"
+        
+        if not os.path.exists(model_path):
+            self.logger.error(f"Model not found: {model_path}")
+            return None
+        
+        try:
+            import onnx
+            from onnxruntime.quantization import (
+                CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType, quantize_static
+            )
+            from onnxruntime.quantization.shape_inference import quant_pre_process
+        except ImportError as e:
+            self.logger.error(f"INT8 quantization requires onnx and onnxruntime: {e}")
+            return None
+        
+        calibration_images = self.load_calibration_images(calibration_size)
+        if not calibration_images:
+            self.logger.error("No training images found for INT8 calibration")
+            return None
+        
+        img_size = self.config['img_size']
+        self.logger.info(f"Exporting FP32 ONNX model for quantization ({img_size}px, dynamic batch)...")
+        fp32_path = YOLO(model_path).export(format='onnx', imgsz=img_size, dynamic=True, simplify=True)
+        
+        base_path = os.path.splitext(fp32_path)[0]
+        prep_path = f"{base_path}_prep.onnx"
+        int8_path = f"{base_path}_int8.onnx"
+        
+        # Shape inference and graph cleanup recommended before static quantization
+        quant_pre_process(fp32_path, prep_path)
+        
+        fp32_model = onnx.load(prep_path)
+        input_name = fp32_model.graph.input[0].name
+        
+        nodes_to_exclude = []
+        if exclude_head:
+            # ultralytics names nodes after their module path; the Detect head is the last module
+            module_ids = [int(node.name.split('/')[1].split('.')[1])
+                          for node in fp32_model.graph.node
+                          if node.name.startswith('/model.') and node.name.split('/')[1].split('.')[1].isdigit()]
+            if module_ids:
+                head_prefix = f"/model.{max(module_ids)}/"
+                nodes_to_exclude = [node.name for node in fp32_model.graph.node if node.name.startswith(head_prefix)]
+        
+        class YoloCalibrationReader(CalibrationDataReader):
+            """Feed letterboxed training images to the calibrator one at a time"""
+            def __init__(self, image_paths):
+                self.image_paths = iter(image_paths)
+            
+            def get_next(self):
+                for image_path in self.image_paths:
+                    frame = cv2.imread(str(image_path))
+                    if frame is None:
+                        continue
+                    tensor, _, _ = letterbox(frame, img_size)
+                    # BGR HWC uint8 -> RGB NCHW float32 in [0, 1]
+                    tensor = tensor[:, :, ::-1].transpose(2, 0, 1)[np.newaxis].astype(np.float32) / 255.0
+                    return {input_name: tensor}
+                return None
+        
+        self.logger.info(
+            f"Calibrating INT8 model on {len(calibration_images)} images "
+            f"({len(nodes_to_exclude)} head nodes kept in FP32)..."
+        )
+        quantize_static(
+            prep_path,
+            int8_path,
+            YoloCalibrationReader(calibration_images),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            calibrate_method=CalibrationMethod.MinMax,
+            nodes_to_exclude=nodes_to_exclude
+        )
+        os.remove(prep_path)
+        
+        # Carry over the class-name metadata the inference backends read
+        int8_model = onnx.load(int8_path)
+        del int8_model.metadata_props[:]
+        int8_model.metadata_props.extend(onnx.load(fp32_path).metadata_props)
+        onnx.save(int8_model, int8_path)
+        
+        self.logger.info(f"INT8 model saved to: {int8_path}")
+        return self.compare_quantized_accuracy(model_path, int8_path, fp32_path, max_map50_drop)
+    
+    def compare_quantized_accuracy(self, model_path, int8_path, fp32_onnx_path=None, max_map50_drop=0.02):
+        """Compare mAP50 of a quantized model against the FP32 weights and save a report"""
+        fp32_evaluation = self.evaluate_model(model_path)
+        if fp32_evaluation is None:
+            return None
+        
+        self.logger.info("Evaluating INT8 model...")
+        int8_metrics = YOLO(int8_path, task='detect').val(
+            data='datasets/military_assets/dataset.yaml',
+            imgsz=self.config['img_size'],
+            batch=1
+        )
+        int8_results = {
+            'mAP50': float(int8_metrics.box.map50),
+            'mAP50-95': float(int8_metrics.box.map),
+            'precision': float(int8_metrics.box.mp),
+            'recall': float(int8_metrics.box.mr)
+        }
+        
+        fp32_map50 = fp32_evaluation['metrics']['mAP50']
+        map50_drop = fp32_map50 - int8_results['mAP50']
+        
+        report = {
+            'fp32_model': model_path,
+            'int8_model': int8_path,
+            'fp32': fp32_evaluation['metrics'],
+            'int8': int8_results,
+            'mAP50_drop': map50_drop,
+            'mAP50_relative_drop': map50_drop / fp32_map50 if fp32_map50 > 0 else 0.0,
+            'max_map50_drop': max_map50_drop,
+            'accepted': map50_drop <= max_map50_drop,
+            'size_mb': {
+                'int8': os.path.getsize(int8_path) / 1e6
+            }
+        }
+        if fp32_onnx_path and os.path.exists(fp32_onnx_path):
+            report['fp32_onnx_model'] = fp32_onnx_path
+            report['size_mb']['fp32'] = os.path.getsize(fp32_onnx_path) / 1e6
+        
+        with open(f"{self.config['output_path']}/quantization_report.json", 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        if report['accepted']:
+            self.logger.info(
+                f"INT8 mAP50 = {int8_results['mAP50']:.3f} (FP32 {fp32_map50:.3f}, drop {map50_drop:.3f})"
+            )
+        else:
+            self.logger.warning(
+                f"INT8 mAP50 drop {map50_drop:.3f} exceeds {max_map50_drop:.3f}; "
+                "keep serving the FP32 model or recalibrate with more images"
+            )
+        return report
+    
     def create_inference_script(self):
         """Create inference script for the trained model"""
         inference_script = '''#!/usr/bin/env python3
@@ -324,6 +495,11 @@ if __name__ == '__main__':
                        help='Prepare dataset from raw images and labels')
     parser.add_argument('--images', help='Path to images directory')
     parser.add_argument('--labels', help='Path to labels directory')
+    parser.add_argument('--quantize', action='store_true',
+                       help='Export an INT8 quantized ONNX model from trained weights')
+    parser.add_argument('--model', help='Path to trained weights to quantize (defaults to best.pt)')
+    parser.add_argument('--calibration-size', type=int, default=200,
+                       help='Number of training images used for INT8 calibration')
     
     args = parser.parse_args()
     
@@ -338,5 +514,14 @@ if __name__ == '__main__':
             print("Dataset prepared successfully!")
         else:
             print("Dataset preparation failed!")
+    elif args.quantize:
+        trainer = MilitaryModelTrainer()
+        report = trainer.quantize_model(args.model, calibration_size=args.calibration_size)
+        if report:
+            print(f"INT8 model: {report['int8_model']}")
+            print(f"mAP50 FP32 {report['fp32']['mAP50']:.3f} -> INT8 {report['int8']['mAP50']:.3f}")
+            print("Serve it with MODEL_PATH=<int8 model> INFERENCE_BACKEND=onnx")
+        else:
+            print("INT8 quantization failed!")
     else:
         main() 
\ No newline at end of file
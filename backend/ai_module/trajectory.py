@@ -0,0 +1,123 @@
+"""
+Vectorized future-position prediction for many tracks.
+
+Takes the recent centres of all tracks as one (T, L, 2) array (NaN for
+missing points, valid points contiguous at the end, as returned by
+TrackStore.recent_centers) and predicts every track's path in one pass with
+either motion model:
+
+- ``cv``: constant velocity. The velocity is the mean of the finite-difference
+  velocities between consecutive points; the prediction starts at the last
+  point.
+- ``ca``: constant acceleration, a least-squares quadratic fit of position
+  over time anchored at the last timestamp (needs 4 points; tracks with
+  fewer fall back to ``cv``).
+
+Each predicted point comes with a 2x2 position covariance and an
+uncertainty radius (``n_sigma`` standard deviations along the major axis),
+so consumers can draw uncertainty cones around the path.
+"""
+
+import numpy as np
+
+CONSTANT_VELOCITY = 'cv'
+CONSTANT_ACCELERATION = 'ca'
+MODELS = (CONSTANT_VELOCITY, CONSTANT_ACCELERATION)
+
+
+def covariance_radius(covariance, n_sigma=2.0):
+    """n_sigma times the standard deviation along the major axis of (..., 2, 2) covariances"""
+    a, b, c = covariance[..., 0, 0], covariance[..., 0, 1], covariance[..., 1, 1]
+    major = (a + c) / 2 + np.sqrt(((a - c) / 2) ** 2 + b ** 2)
+    return n_sigma * np.sqrt(np.maximum(major, 0.0))
+
+
+def _weighted_covariance(residuals, weights, dof):
+    """(T, 2, 2) covariance of (T, L, 2) residuals over the weighted points"""
+    residuals = np.where(weights[..., None] > 0, residuals, 0.0)
+    return np.einsum('tl,tli,tlj->tij', weights, residuals, residuals) / np.maximum(dof, 1)[:, None, None]
+
+
+def _constant_velocity(centers, timestamps, valid, offsets):
+    dt = np.diff(timestamps, axis=1)
+    steps = np.diff(centers, axis=1)
+    moving = valid[:, 1:] & valid[:, :-1] & (dt > 0)
+    samples = moving.sum(axis=1)
+    velocities = np.where(moving[..., None], steps / np.where(moving, dt, 1.0)[..., None], 0.0)
+    velocity = velocities.sum(axis=1) / np.maximum(samples, 1)[:, None]
+
+    last_position = centers[:, -1]
+    last_time = timestamps[:, -1]
+    positions = last_position[:, None, :] + offsets[None, :, None] * velocity[:, None, :]
+
+    # Uncertainty: scatter of the points about the fitted line, plus the
+    # standard error of the mean velocity growing with the horizon
+    weights = valid.astype(np.float64)
+    fitted = last_position[:, None, :] + (np.nan_to_num(timestamps) - last_time[:, None])[..., None] * velocity[:, None, :]
+    position_covariance = _weighted_covariance(np.nan_to_num(centers) - fitted, weights, valid.sum(axis=1) - 2)
+    velocity_residuals = np.where(moving[..., None], velocities - velocity[:, None, :], 0.0)
+    velocity_covariance = _weighted_covariance(velocity_residuals, moving.astype(np.float64), samples - 1)
+    velocity_covariance /= np.maximum(samples, 1)[:, None, None]
+    covariance = position_covariance[:, None] + (offsets ** 2)[None, :, None, None] * velocity_covariance[:, None]
+
+    return positions, covariance, samples > 0
+
+
+def _constant_acceleration(centers, timestamps, valid, offsets):
+    weights = valid.astype(np.float64)
+    tau = np.where(valid, timestamps - timestamps[:, -1:], 0.0)
+    design = np.stack([np.ones_like(tau), tau, tau ** 2 / 2], axis=-1)  # (T, L, 3)
+    normal = np.einsum('tl,tli,tlj->tij', weights, design, design)
+    normal_inverse = np.linalg.pinv(normal)
+    targets = np.where(valid[..., None], centers, 0.0)
+    coefficients = normal_inverse @ np.einsum('tl,tli,tlj->tij', weights, design, targets)  # (T, 3, 2)
+
+    basis = np.stack([np.ones_like(offsets), offsets, offsets ** 2 / 2], axis=-1)  # (S, 3)
+    positions = np.einsum('si,tij->tsj', basis, coefficients)
+
+    # Residual covariance scaled by the variance of the fitted curve at each offset
+    residual_covariance = _weighted_covariance(targets - design @ coefficients, weights, valid.sum(axis=1) - 3)
+    leverage = np.einsum('si,tij,sj->ts', basis, normal_inverse, basis)
+    covariance = (residual_covariance[:, None] * (1.0 + leverage)[..., None, None])
+
+    span = np.where(valid, tau, 0.0).min(axis=1) < 0  # distinct timestamps to fit against
+    return positions, covariance, (valid.sum(axis=1) >= 4) & span
+
+
+def predict_trajectories(centers, timestamps, time_horizon=5.0, steps=10, model=CONSTANT_VELOCITY, n_sigma=2.0):
+    """Predict future positions of many tracks at once
+
+    Args:
+        centers: (T, L, 2) recent positions, NaN where missing; each row's
+            valid points contiguous at the end, oldest first
+        timestamps: (T, L) times of the positions (seconds)
+        time_horizon: Seconds to predict ahead
+        steps: Number of predicted points, evenly spaced up to time_horizon
+        model: 'cv' (constant velocity) or 'ca' (constant acceleration)
+        n_sigma: Standard deviations covered by the uncertainty radius
+
+    Returns:
+        dict: 'positions' (T, steps, 2), 'times' (T, steps), 'covariance'
+        (T, steps, 2, 2), 'radius' (T, steps) and 'valid' (T,), False for
+        tracks with fewer than 3 usable points
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown motion model '{model}', expected one of {MODELS}")
+    centers = np.asarray(centers, dtype=np.float64)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    valid = ~np.isnan(centers).any(axis=-1) & ~np.isnan(timestamps)
+    offsets = np.arange(1, steps + 1) * (time_horizon / steps)
+
+    positions, covariance, usable = _constant_velocity(centers, timestamps, valid, offsets)
+    if model == CONSTANT_ACCELERATION:
+        ca_positions, ca_covariance, ca_usable = _constant_acceleration(centers, timestamps, valid, offsets)
+        positions = np.where(ca_usable[:, None, None], ca_positions, positions)
+        covariance = np.where(ca_usable[:, None, None, None], ca_covariance, covariance)
+
+    return {
+        'positions': positions,
+        'times': timestamps[:, -1:] + offsets[None, :],
+        'covariance': covariance,
+        'radius': covariance_radius(covariance, n_sigma),
+        'valid': usable & (valid.sum(axis=1) >= 3)
+    }
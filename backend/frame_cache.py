@@ -0,0 +1,131 @@
+"""
+Detection result cache for the AI inference service.
+
+Static cameras resend near-identical frames; caching detections under a
+perceptual hash of the downscaled frame (plus the sending drone) lets those
+frames skip inference entirely. Entries expire after ``ttl`` seconds so a
+scene that changes slowly is still re-detected regularly, and the cache is
+bounded with LRU eviction.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def difference_hash(frame, hash_size=16):
+    """Difference hash (dHash) of a BGR or grayscale frame
+
+    The frame is shrunk to hash_size x hash_size gradients, so sensor noise and
+    recompression leave the hash unchanged while moved or new objects flip bits.
+
+    Returns:
+        int: hash_size * hash_size bit hash
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distance(hash_a, hash_b):
+    return bin(hash_a ^ hash_b).count('1')
+
+
+class FrameResultCache:
+    def __init__(self, max_size=256, ttl=2.0, hash_size=16, max_distance=0):
+        # max_size == 0 disables the cache
+        self.max_size = max(0, int(max_size))
+        self.ttl = float(ttl)
+        self.hash_size = int(hash_size)
+        # Hashes within this many differing bits count as the same scene
+        self.max_distance = max(0, int(max_distance))
+        self._entries = OrderedDict()  # ((drone_id, variant), frame hash) -> (expiry, detections)
+        self._lock = threading.Lock()
+
+        # Cache statistics exposed on /stats
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def key(self, frame, drone_id=None, variant=None):
+        """Cache key for a frame; computing it costs one downscale
+
+        Results of different inference settings for the same frame (e.g. a
+        tiling) are kept apart by ``variant``.
+        """
+        return ((drone_id, variant), difference_hash(frame, self.hash_size))
+
+    def get(self, key):
+        """Cached detections for a key (a deep copy), or None"""
+        now = time.monotonic()
+        with self._lock:
+            match = self._entries.get(key)
+            if match is None and self.max_distance:
+                match_key = self._nearest(key)
+                if match_key is not None:
+                    key, match = match_key, self._entries[match_key]
+            if match is not None:
+                expiry, detections = match
+                if expiry < now:
+                    del self._entries[key]
+                    self.expired += 1
+                    match = None
+                else:
+                    self._entries.move_to_end(key)
+            if match is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # Callers decorate results in place (descriptions), so never hand out the cached lists
+        return copy.deepcopy(detections)
+
+    def _nearest(self, key):
+        scope, frame_hash = key
+        best_key, best_distance = None, self.max_distance + 1
+        for cached_key in self._entries:
+            if cached_key[0] != scope:
+                continue
+            distance = hamming_distance(frame_hash, cached_key[1])
+            if distance < best_distance:
+                best_key, best_distance = cached_key, distance
+        return best_key
+
+    def put(self, key, detections):
+        """Cache detections for a key"""
+        entry = (time.monotonic() + self.ttl, copy.deepcopy(detections))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'max_size': self.max_size,
+            'ttl_s': self.ttl,
+            'max_distance': self.max_distance,
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'expired': self.expired,
+            'evictions': self.evictions
+        }
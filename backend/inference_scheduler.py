@@ -0,0 +1,259 @@
+"""
+Dynamic micro-batching scheduler for the AI inference service.
+
+Frames submitted from any endpoint (REST, WebSocket or the backend bridge)
+are queued and grouped into batches of up to ``max_batch_size`` frames,
+waiting at most ``max_wait_ms`` for a batch to fill. Each batch runs as one
+forward pass and the per-frame results are handed back to the awaiting callers.
+
+Forward passes run on an InferenceWorkerPool so the event loop stays free for
+health checks and WebSocket traffic. The queue is bounded: when it is full,
+submissions fail fast with InferenceQueueFull instead of piling up latency.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the inference queue cannot accept more frames"""
+
+
+class InferenceWorkerPool(ThreadPoolExecutor):
+    """Thread pool where every worker owns its own model instance.
+
+    YOLO predictors keep per-call state and are not safe to share between
+    threads, so each worker builds a model with ``model_factory`` when it starts.
+    """
+
+    def __init__(self, model_factory, workers=1):
+        self.model_factory = model_factory
+        self.workers = max(1, int(workers))
+        self._local = threading.local()
+        super().__init__(
+            max_workers=self.workers,
+            thread_name_prefix='inference-worker',
+            initializer=self._init_worker
+        )
+
+    def _init_worker(self):
+        logger.info(f"Initializing model for {threading.current_thread().name}")
+        self._local.model = self.model_factory()
+
+    @property
+    def model(self):
+        """Model owned by the calling worker thread (None outside the pool)"""
+        return getattr(self._local, 'model', None)
+
+
+class BatchScheduler:
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=5.0,
+                 executor=None, max_queue_size=0):
+        # run_batch(frames) -> list of results, one per frame, in order
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        # Executor running the forward passes; one batch in flight per worker
+        self.executor = executor
+        self.max_concurrent_batches = getattr(executor, 'workers', 1)
+        self.max_queue_size = max(0, int(max_queue_size))  # 0 means unbounded
+        self.loop = None
+        self.queue = None
+        self._slots = None
+        self._task = None
+        self._inflight = set()
+
+        # Scheduler statistics exposed on /stats
+        self.rejected_frames = 0
+        self.batches_run = 0
+        self.frames_processed = 0
+        self.largest_batch = 0
+        self.total_inference_time = 0.0
+
+    def start(self):
+        """Start the batching loop on the running event loop"""
+        if self._task is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._task = self.loop.create_task(self._run())
+        logger.info(
+            f"Batch scheduler started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:.1f}, workers={self.max_concurrent_batches}, "
+            f"max_queue_size={self.max_queue_size or 'unbounded'})"
+        )
+
+    async def stop(self):
+        """Stop the batching loop and fail any frames still queued"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        inflight = list(self._inflight)
+        for task in inflight:
+            task.cancel()
+        # Each cancelled batch fails its callers' futures before finishing
+        await asyncio.gather(*inflight, return_exceptions=True)
+
+        while not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batch scheduler stopped"))
+
+    @property
+    def running(self):
+        return self._task is not None
+
+    async def submit(self, frame):
+        """Queue a frame for the next batch and wait for its result
+
+        Raises InferenceQueueFull when the queue is at capacity.
+        """
+        if self._task is None:
+            raise RuntimeError("Batch scheduler is not running")
+        future = self.loop.create_future()
+        try:
+            self.queue.put_nowait((frame, future))
+        except asyncio.QueueFull:
+            self.rejected_frames += 1
+            raise InferenceQueueFull(
+                f"Inference queue is full ({self.max_queue_size} frames pending)"
+            )
+        return await future
+
+    async def submit_many(self, frames):
+        """Queue several frames (e.g. the tiles of one image) and wait for all results
+
+        The frames are admitted together or not at all: InferenceQueueFull is
+        raised unless the queue has room for every one of them.
+        """
+        if self._task is None:
+            raise RuntimeError("Batch scheduler is not running")
+        if self.max_queue_size and self.max_queue_size - self.queue.qsize() < len(frames):
+            self.rejected_frames += len(frames)
+            raise InferenceQueueFull(
+                f"Inference queue cannot take {len(frames)} frames "
+                f"({self.queue.qsize()} of {self.max_queue_size} pending)"
+            )
+        futures = []
+        for frame in frames:
+            future = self.loop.create_future()
+            self.queue.put_nowait((frame, future))
+            futures.append(future)
+        try:
+            return await asyncio.gather(*futures)
+        except BaseException:
+            # Frames of a failed or abandoned request are skipped by _collect_batch
+            for future in futures:
+                future.cancel()
+            raise
+
+    def submit_threadsafe(self, frame):
+        """Queue a frame from a non-event-loop thread.
+
+        Returns a concurrent.futures.Future resolving to the frame's result.
+        """
+        return asyncio.run_coroutine_threadsafe(self.submit(frame), self.loop)
+
+    async def _collect_batch(self):
+        """Wait for the first frame, then gather more until the batch is full or the wait expires"""
+        batch = [await self.queue.get()]
+        deadline = self.loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Take everything that is already queued without waiting
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+
+            timeout = deadline - self.loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Callers that gave up (e.g. disconnected WebSocket) don't need inference
+        return [(frame, future) for frame, future in batch if not future.cancelled()]
+
+    async def _run(self):
+        while True:
+            # Wait for a free worker before collecting, so frames keep
+            # accumulating into larger batches while every worker is busy
+            await self._slots.acquire()
+            try:
+                batch = await self._collect_batch()
+            except BaseException:
+                self._slots.release()
+                raise
+            if not batch:
+                self._slots.release()
+                continue
+            task = self.loop.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch):
+        try:
+            await self._run_batch(batch)
+        finally:
+            self._slots.release()
+
+    async def _run_batch(self, batch):
+        frames = [frame for frame, _ in batch]
+        start_time = time.perf_counter()
+        try:
+            # The forward pass blocks, so keep it off the event loop
+            results = await self.loop.run_in_executor(self.executor, self.run_batch, frames)
+        except asyncio.CancelledError:
+            # stop() cancelled the batch mid forward pass; its callers must not wait forever
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Batch scheduler stopped"))
+            raise
+        except Exception as e:
+            logger.error(f"Batch inference error: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches_run += 1
+        self.frames_processed += len(frames)
+        self.largest_batch = max(self.largest_batch, len(frames))
+        self.total_inference_time += time.perf_counter() - start_time
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def get_stats(self):
+        """Get scheduler statistics"""
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'workers': self.max_concurrent_batches,
+            'max_queue_size': self.max_queue_size,
+            'queued_frames': self.queue.qsize() if self.queue is not None else 0,
+            'batches_in_flight': len(self._inflight),
+            'rejected_frames': self.rejected_frames,
+            'batches_run': self.batches_run,
+            'frames_processed': self.frames_processed,
+            'average_batch_size': self.frames_processed / self.batches_run if self.batches_run else 0.0,
+            'largest_batch': self.largest_batch,
+            'average_batch_latency_ms': (
+                self.total_inference_time / self.batches_run * 1000 if self.batches_run else 0.0
+            )
+        }
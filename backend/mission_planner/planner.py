@@ -7,10 +7,15 @@ from pydantic import BaseModel
 from typing import List, Tuple, Dict, Any, Optional
 import numpy as np
 import json
+import os
+import sys
 import time
 import random
 from datetime import datetime
-from filterpy.kalman import KalmanFilter
+
+# Batched obstacle Kalman filters are shared with the AI module
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ai_module'))
+from kalman_bank import KalmanBank
 
 app = FastAPI()
 
@@ -63,44 +68,11 @@ class MissionPlanner:
     def __init__(self):
         self.maps = {}  # 3D maps by drone_id
         self.paths = {}  # Current paths by drone_id
-        self.obstacle_filters = {}  # Kalman filters for tracking moving obstacles
+        # Kalman filters for tracking moving obstacles, stepped together
+        # State per obstacle: [x, y, z, vx, vy, vz], time step 0.1 s
+        self.obstacle_bank = KalmanBank(dim=3, dt=0.1)
         self.mission_states = {}  # Current mission state by drone_id
         self.weather_conditions = {}  # Current weather by drone_id
-    
-    def get_or_create_obstacle_filter(self, obstacle_id):
-        """Get existing Kalman filter or create a new one for this obstacle"""
-        if obstacle_id not in self.obstacle_filters:
-            # Create Kalman Filter for this obstacle
-            # State: [x, y, z, vx, vy, vz]
-            kf = KalmanFilter(dim_x=6, dim_z=3)
-            kf.x = np.zeros(6)  # Initial state
-            
-            # State transition matrix (position updated by velocity)
-            dt = 0.1  # Time step
-            kf.F = np.array([
-                [1., 0., 0., dt, 0., 0.],
-                [0., 1., 0., 0., dt, 0.],
-                [0., 0., 1., 0., 0., dt],
-                [0., 0., 0., 1., 0., 0.],
-                [0., 0., 0., 0., 1., 0.],
-                [0., 0., 0., 0., 0., 1.]
-            ])
-            
-            # Measurement function (measures position only)
-            kf.H = np.array([
-                [1., 0., 0., 0., 0., 0.],
-                [0., 1., 0., 0., 0., 0.],
-                [0., 0., 1., 0., 0., 0.]
-            ])
-            
-            # Covariance matrices
-            kf.P *= 1000.  # Initial uncertainty
-            kf.R = np.eye(3) * 0.1  # Measurement uncertainty
-            kf.Q = np.eye(6) * 0.01  # Process uncertainty
-            
-            self.obstacle_filters[obstacle_id] = kf
-        
-        return self.obstacle_filters[obstacle_id]
 
 # Initialize mission planner
 mission_planner = MissionPlanner()
@@ -230,35 +202,27 @@ def dynamic_replan(req: DynamicPathRequest):
     
     # Process obstacles and predict their future positions
     future_obstacle_positions = []
-    for obstacle in req.obstacles:
-        if 'id' in obstacle and 'position' in obstacle and 'velocity' in obstacle:
-            obstacle_id = obstacle['id']
-            position = np.array(obstacle['position'])
-            velocity = np.array(obstacle['velocity'])
-            
-            # Update Kalman filter with new measurement
-            kf = mission_planner.get_or_create_obstacle_filter(obstacle_id)
-            kf.x[:3] = position  # Update position
-            kf.x[3:] = velocity  # Update velocity
-            kf.predict()
-            
-            # Predict future positions
-            future_positions = []
-            state = kf.x.copy()
-            dt = 0.5  # Time step for prediction (seconds)
-            steps = int(req.time_horizon / dt)
-            
-            for _ in range(steps):
-                # Simple linear prediction
-                state[0] += state[3] * dt  # x += vx * dt
-                state[1] += state[4] * dt  # y += vy * dt
-                state[2] += state[5] * dt  # z += vz * dt
-                future_positions.append(state[:3].copy())
-            
+    tracked = [obstacle for obstacle in req.obstacles
+               if 'id' in obstacle and 'position' in obstacle and 'velocity' in obstacle]
+    if tracked:
+        obstacle_ids = [obstacle['id'] for obstacle in tracked]
+        positions = np.array([obstacle['position'] for obstacle in tracked], dtype=float)
+        velocities = np.array([obstacle['velocity'] for obstacle in tracked], dtype=float)
+        
+        # Update the Kalman filters of all obstacles with the new measurements at once
+        bank = mission_planner.obstacle_bank
+        rows = bank.rows(obstacle_ids)
+        bank.set_state(rows, positions, velocities)
+        bank.predict(rows)
+        
+        # Predict future positions (linear, 0.5 s per step)
+        future_positions = bank.rollout(rows, req.time_horizon, dt=0.5)
+        
+        for obstacle, path in zip(tracked, future_positions):
             future_obstacle_positions.append({
-                "obstacle_id": obstacle_id,
-                "current_position": position.tolist(),
-                "future_positions": [pos.tolist() for pos in future_positions]
+                "obstacle_id": obstacle['id'],
+                "current_position": list(obstacle['position']),
+                "future_positions": path.tolist()
             })
     
     # Generate new path avoiding predicted obstacle positions
@@ -0,0 +1,243 @@
+"""
+Annotated MJPEG streams for the AI inference service.
+
+Each drone streams frames in; the service detects on them, draws the
+detections directly on a reused frame buffer (with the shared annotation
+renderer from ai_module/annotation.py) and pushes JPEG-encoded
+frames to every viewer as a multipart/x-mixed-replace response, which
+browsers and video players render as live video.
+
+JPEG encoding runs on a per-stream encoder thread so the event loop only
+queues frames. Both the encoder and slow viewers always get the latest frame:
+stale frames are dropped rather than queued behind.
+
+Streams are created by a drone's ingest and removed, encoder thread
+included, once they have had neither an ingest nor a viewer for the
+manager's idle timeout.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BOUNDARY = 'frame'
+MEDIA_TYPE = f'multipart/x-mixed-replace; boundary={BOUNDARY}'
+
+
+class MJPEGStream:
+    """Annotated frame stream of one drone"""
+
+    def __init__(self, drone_id, loop, renderer, quality=80):
+        self.drone_id = drone_id
+        self.loop = loop
+        self.renderer = renderer  # AnnotationRenderer shared by all streams
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
+
+        # Triple buffering: the ingest side annotates into a free buffer while
+        # the encoder reads another and a third may be waiting to be encoded
+        self._buffers = [None, None, None]
+        self._pending = None  # index of the newest annotated buffer
+        self._encoding = None  # index of the buffer being encoded
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+        self._viewers = set()  # asyncio.Queue(maxsize=1) per viewer
+        self.latest_jpeg = None
+        self.ingests = 0  # open ingest connections
+        self.idle_since = None  # monotonic time the stream last became idle
+        self.on_idle = None  # called with the stream when its last viewer leaves
+
+        # Stream statistics
+        self.frames_in = 0
+        self.frames_encoded = 0
+        self.frames_dropped = 0
+        self.encode_time = 0.0
+        self.last_frame_at = None
+
+    @property
+    def viewers(self):
+        return len(self._viewers)
+
+    @property
+    def idle(self):
+        """Whether the stream has neither an ingest nor a viewer"""
+        return not self.ingests and not self._viewers
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._encode_loop, name=f'mjpeg-encoder-{self.drone_id}', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        for queue in list(self._viewers):
+            self._offer(queue, None)  # ends the viewer's response
+
+    def publish(self, frame, detections):
+        """Annotate a frame and queue it for encoding (called on the event loop)
+
+        The frame is copied into a reused buffer, so the caller keeps ownership.
+        Frames are dropped without annotation while nobody is watching.
+        """
+        self.frames_in += 1
+        self.last_frame_at = time.time()
+        if not self._viewers:
+            return
+
+        with self._condition:
+            index = next(i for i in range(3) if i != self._pending and i != self._encoding)
+            if self._pending is not None:
+                self.frames_dropped += 1  # encoder fell behind; only the newest frame matters
+        buffer = self._buffers[index]
+        if buffer is None or buffer.shape != frame.shape:
+            buffer = self._buffers[index] = np.empty_like(frame)
+        np.copyto(buffer, frame)
+        self.renderer.draw_detections(buffer, detections)
+
+        with self._condition:
+            self._pending = index
+            self._condition.notify()
+
+    def _encode_loop(self):
+        while True:
+            with self._condition:
+                while self._running and self._pending is None:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                index, self._pending = self._pending, None
+                self._encoding = index
+
+            start_time = time.perf_counter()
+            ok, encoded = cv2.imencode('.jpg', self._buffers[index], self.encode_params)
+            self.encode_time += time.perf_counter() - start_time
+
+            with self._condition:
+                self._encoding = None
+            if not ok:
+                logger.warning(f"JPEG encoding failed for drone {self.drone_id}")
+                continue
+
+            self.frames_encoded += 1
+            jpeg = encoded.tobytes()
+            self.loop.call_soon_threadsafe(self._deliver, jpeg)
+
+    def _deliver(self, jpeg):
+        self.latest_jpeg = jpeg
+        for queue in self._viewers:
+            self._offer(queue, jpeg)
+
+    @staticmethod
+    def _offer(queue, item):
+        # Keep only the newest frame for viewers that haven't caught up
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+    async def frames(self):
+        """Multipart body chunks for one viewer, until the stream stops or the viewer leaves"""
+        if not self._running:
+            return
+        queue = asyncio.Queue(maxsize=1)
+        self._viewers.add(queue)
+        try:
+            if self.latest_jpeg is not None:
+                queue.put_nowait(self.latest_jpeg)
+            while True:
+                jpeg = await queue.get()
+                if jpeg is None:
+                    return
+                yield (
+                    f'--{BOUNDARY}\r\n'
+                    f'Content-Type: image/jpeg\r\n'
+                    f'Content-Length: {len(jpeg)}\r\n\r\n'
+                ).encode() + jpeg + b'\r\n'
+        finally:
+            self._viewers.discard(queue)
+            if self.idle and self.on_idle is not None:
+                self.on_idle(self)
+
+    def get_stats(self):
+        return {
+            'drone_id': self.drone_id,
+            'viewers': self.viewers,
+            'ingests': self.ingests,
+            'frames_in': self.frames_in,
+            'frames_encoded': self.frames_encoded,
+            'frames_dropped': self.frames_dropped,
+            'average_encode_ms': self.encode_time / self.frames_encoded * 1000 if self.frames_encoded else 0.0,
+            'last_frame_at': self.last_frame_at
+        }
+
+
+class MJPEGStreamManager:
+    """Annotated streams by drone id
+
+    Args:
+        renderer: AnnotationRenderer shared by all streams
+        quality: JPEG quality
+        idle_timeout: Seconds a stream is kept without an ingest or a viewer
+    """
+
+    def __init__(self, renderer, quality=80, idle_timeout=60.0):
+        self.renderer = renderer
+        self.quality = quality
+        self.idle_timeout = idle_timeout
+        self.streams = {}
+        self.streams_removed = 0
+
+    def open(self, drone_id, loop=None):
+        """Stream for a drone's ingest, created (with its encoder thread) on first use
+
+        Every open() is paired with a close() when the ingest ends.
+        """
+        stream = self.streams.get(drone_id)
+        if stream is None:
+            stream = MJPEGStream(drone_id, loop or asyncio.get_running_loop(), self.renderer, self.quality)
+            stream.on_idle = self._schedule_removal
+            stream.start()
+            self.streams[drone_id] = stream
+        stream.ingests += 1
+        return stream
+
+    def close(self, stream):
+        """End one ingest of a stream"""
+        stream.ingests -= 1
+        if stream.idle:
+            self._schedule_removal(stream)
+
+    def get(self, drone_id):
+        """Stream of a drone for viewers, or None if the drone has not streamed"""
+        return self.streams.get(drone_id)
+
+    def _schedule_removal(self, stream):
+        stream.idle_since = time.monotonic()
+        stream.loop.call_later(self.idle_timeout, self._remove_if_idle, stream, stream.idle_since)
+
+    def _remove_if_idle(self, stream, idle_since):
+        # Skipped if the stream was used again (or went idle again later) meanwhile
+        if stream.idle and stream.idle_since == idle_since and self.streams.get(stream.drone_id) is stream:
+            del self.streams[stream.drone_id]
+            stream.stop()
+            self.streams_removed += 1
+
+    def stop(self):
+        for stream in self.streams.values():
+            stream.stop()
+        self.streams.clear()
+
+    def get_stats(self):
+        return {drone_id: stream.get_stats() for drone_id, stream in self.streams.items()}